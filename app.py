@@ -4,12 +4,22 @@ import os
 import json
 import yaml
 import streamlit as st
+import numpy as np
 import pandas as pd
 import streamlit_authenticator as stauth
 
 from storage.cache_factory import get_cache
-from core.engine import normalize_price_series, run_backtest
+from storage.result_cache import ResultCache, series_version
+from core.engine import normalize_price_series
+from core.features import FEATURES
+from core.pipeline import StageGraph
+from core.tracing import span, start_trace
 from core.calendar import scale_amount_for_schedule
+from core.rolling import rolling_start_analysis
+from core.montecarlo import percentile_bands, run_monte_carlo
+from core.portfolio import CASH_MODES, run_portfolio
+from core.optimize import OBJECTIVES, optimize
+from core.models import StrategyConfig
 
 
 def load_yaml(path: str) -> dict:
@@ -32,6 +42,7 @@ registry = load_yaml(CFG_REGISTRY)
 
 DB_PATH = cfg['storage']['cache_db_path']
 EXPORTS_DIR = cfg['storage']['exports_dir']
+TRACE_LOG = cfg['storage'].get('trace_log_path') or None
 
 ensure_dirs(os.path.dirname(DB_PATH))
 ensure_dirs(EXPORTS_DIR)
@@ -78,23 +89,23 @@ if st.sidebar.button("🗑️ Clear All Cache"):
     st.rerun()
 
 
+# ========== TRACING ==========
+# The toggles live in the debug section below; their session-state values are
+# already set when the script reruns, so spans cover the whole rerun. The
+# trace is active in this rerun's context only, so sessions never mix spans;
+# it is kept in session state so a rerun cut short by st.stop() still ends it.
+stale_trace = st.session_state.pop('rerun_trace', None)
+if stale_trace is not None:
+    stale_trace.end()
+rerun_trace = None
+if st.session_state.get('trace_rerun'):
+    rerun_trace = start_trace(label=f"dashboard:{name}", memory=bool(st.session_state.get('trace_memory')))
+    st.session_state['rerun_trace'] = rerun_trace
+
 # ========== INITIALIZE CACHE ==========
-cache = get_cache(DB_PATH)
+cache = get_cache(DB_PATH, price_store_dir=cfg['storage'].get('price_store_dir') or None)
 cache.init_db(SCHEMA_SQL)
 
-# ========== CACHE BUSTER ==========
-if st.sidebar.checkbox("🔧 Debug & Clear Cache"):
-    st.sidebar.write(f"**Cache type:** {type(cache).__name__}")
-    if st.sidebar.button("🗑️ Clear ALL Cache"):
-        st.cache_data.clear()
-        st.session_state.clear()
-        st.rerun()
-    
-    # Show raw sources
-    raw_sources = cache.list_sources_for_index(index_id, series_type)
-    st.sidebar.write("**Raw sources from DB:**", raw_sources)
-
-
 st.title('Dip-SIP — Triggers + Backtest')
 
 indices = registry['indices']
@@ -108,7 +119,13 @@ with st.sidebar:
     st.header('Data source')
     series_type = st.selectbox('Series type', ['TRI', 'PRICE'], index=0)
 
-    sources = cache.list_sources_for_index(index_id, series_type)
+    # One catalog query gives the sources and each series' coverage/update stamp
+    catalog = cache.list_catalog()
+    series_rows = catalog[
+        (catalog['index_id'].str.lower() == index_id.lower())
+        & (catalog['series_type'].str.lower() == series_type.lower())
+    ].set_index('source_id')
+    sources = series_rows.index.tolist()
     if sources:
         source_id = st.selectbox('Cached source', sources)
     else:
@@ -157,6 +174,34 @@ with st.sidebar:
     tcost_bps = st.number_input('Transaction cost (bps per buy)', min_value=0.0, value=float(dflt['transaction_cost_bps']), step=1.0)
     cash_rate = st.number_input('Cash bucket annual return (%)', min_value=0.0, value=float(dflt['cash_rate_annual'] * 100.0), step=0.25) / 100.0
 
+    st.header('Charts')
+    show_xirr_curve = st.checkbox('Show XIRR over time', value=False)
+    ledger_view = st.radio('Ledger view', ['Last 250 rows', 'Contribution days', 'Dip-trigger days'], index=0)
+
+# ========== CACHE BUSTER ==========
+debug = st.sidebar.checkbox("🔧 Debug & Clear Cache")
+debug_box = st.sidebar.container()
+if debug:
+    debug_box.write(f"**Cache type:** {type(cache).__name__}")
+    if hasattr(cache, 'stats'):
+        debug_box.write("**Tiered cache:**", cache.stats())
+    price_store = getattr(getattr(cache, 'mirror', cache), 'price_store', None)
+    if price_store is not None:
+        debug_box.write("**Price store:**", price_store.stats())
+    debug_box.write("**Feature cache:**", FEATURES.stats())
+    debug_box.write("**Backtest result cache:**", ResultCache().stats())
+    debug_box.checkbox("⏱️ Trace this rerun", key='trace_rerun')
+    debug_box.checkbox("Track peak memory (slower)", key='trace_memory')
+    if TRACE_LOG:
+        debug_box.checkbox(f"Append spans to {TRACE_LOG}", key='trace_to_log')
+    if debug_box.button("🗑️ Clear ALL Cache"):
+        st.cache_data.clear()
+        st.session_state.clear()
+        st.rerun()
+
+    # Show raw sources
+    debug_box.write("**Series catalog:**", series_rows.reset_index())
+
 
 def parse_float_list(s: str) -> list[float]:
     return [float(x.strip()) for x in str(s).split(',') if x.strip()]
@@ -168,13 +213,6 @@ if not source_id:
     st.info('Open Data Manager → upload CSV into cache, then come back here.')
     st.stop()
 
-prices_df = cache.load_prices(index_id, series_type, source_id)
-if prices_df.empty:
-    st.warning('Cached data is empty. Please re-upload in Data Manager.')
-    st.stop()
-
-prices_series = normalize_price_series(prices_df, 'date', 'close')
-amount_per_contrib = scale_amount_for_schedule(monthly_amount, schedule)
 thresholds = parse_float_list(thresholds_str)
 deploy = parse_float_list(deploy_str)
 
@@ -182,20 +220,139 @@ if len(thresholds) != len(deploy):
     st.error('Thresholds and deploy fractions must have the same length.')
     st.stop()
 
-summary, ledger = run_backtest(
-    prices=prices_series,
+amount_per_contrib = scale_amount_for_schedule(monthly_amount, schedule)
+results = ResultCache(cache, max_disk_bytes=int(cfg['storage'].get('result_cache_max_mb', 256)) * 1024 * 1024)
+
+# ========== STAGE GRAPH ==========
+# load -> normalize -> features / simulate -> summarize -> render; each stage is
+# memoized on its own params plus its upstream keys, so a widget change reruns
+# only the stages downstream of it.
+DD_LOOKBACKS = (63, 126, 252, 504)
+LEDGER_VIEWS = {
+    'Last 250 rows': lambda df: df.tail(250),
+    'Contribution days': lambda df: df[df['contribution'] > 0],
+    'Dip-trigger days': lambda df: df[df['dip_trigger_buy'] > 0],
+}
+
+
+def stage_load(index_id, series_type, source_id, data_version):
+    # Pre-normalized (memory-mapped when the price store is on) where the backend offers it
+    if hasattr(cache, 'load_price_series'):
+        return cache.load_price_series(index_id, series_type, source_id)
+    return cache.load_prices(index_id, series_type, source_id)
+
+
+def stage_normalize(prices):
+    if prices.empty:
+        return None
+    if isinstance(prices, pd.Series):
+        return prices
+    return normalize_price_series(prices, 'date', 'close')
+
+
+def stage_features(prices, lookback):
+    lookbacks = sorted({*DD_LOOKBACKS, int(lookback)})
+    dd = FEATURES.features(prices, lookbacks)
+    return {w: float(dd[w][0][-1]) for w in lookbacks}
+
+
+def stage_simulate(prices, index_id, series_type, source_id, schedule, amount_per_contrib, lookback,
+                   base_fraction, thresholds, deploy, allow_daily, tcost_bps, cash_rate, running_xirr):
+    return results.run(
+        prices,
+        index_id=index_id,
+        series_type=series_type,
+        source_id=source_id,
+        schedule=schedule,
+        amount_per_contrib=amount_per_contrib,
+        lookback_days=int(lookback),
+        base_fraction=float(base_fraction),
+        thresholds_pct=list(thresholds),
+        deploy_fractions=list(deploy),
+        allow_daily_dip_buys=bool(allow_daily),
+        transaction_cost_bps=float(tcost_bps),
+        cash_rate_annual=float(cash_rate),
+        running_xirr=bool(running_xirr),
+    )
+
+
+def stage_summarize(run, drawdowns):
+    summary, ledger = run
+    last = ledger.iloc[-1]
+    latest = {
+        'date': str(last['date']),
+        'drawdown_pct': float(last['drawdown_pct']),
+        'dip_cash': float(last['dip_cash']),
+        'suggested_buy': float(last['dip_base_buy'] + last['dip_trigger_buy']),
+    }
+    return {'summary': summary.__dict__, 'latest': latest, 'drawdowns': drawdowns}
+
+
+def stage_render(run):
+    _, ledger = run
+    dates = pd.to_datetime(ledger['date'])
+    chart_df = ledger[['sip_value', 'dip_value', 'dip_cash']].set_index(dates)
+    xirr_df = None
+    if 'sip_xirr_to_date' in ledger.columns:
+        xirr_df = ledger[['sip_xirr_to_date', 'dip_xirr_to_date']].set_index(dates)
+        # The first weeks annualize tiny horizons; start the chart after ~3 months
+        xirr_df = xirr_df.loc[dates.iloc[0] + pd.Timedelta(days=90):] * 100.0
+        xirr_df = xirr_df.rename(columns={'sip_xirr_to_date': 'Standard SIP (%)', 'dip_xirr_to_date': 'Dip-SIP (%)'})
+    with span('render.ledger_csv'):
+        csv = ledger.to_csv(index=False).encode('utf-8')
+    return {
+        'chart_df': chart_df,
+        'xirr_df': xirr_df,
+        'views': {name: view(ledger) for name, view in LEDGER_VIEWS.items()},
+        'csv': csv,
+    }
+
+
+graph = st.session_state.setdefault('pipeline', StageGraph())
+graph.register('load', stage_load, params=('index_id', 'series_type', 'source_id', 'data_version'))
+graph.register('normalize', stage_normalize, deps=('load',))
+graph.register('features', stage_features, deps=('normalize',), params=('lookback',))
+graph.register('simulate', stage_simulate, deps=('normalize',), params=(
+    'index_id', 'series_type', 'source_id', 'schedule', 'amount_per_contrib', 'lookback', 'base_fraction',
+    'thresholds', 'deploy', 'allow_daily', 'tcost_bps', 'cash_rate', 'running_xirr',
+))
+graph.register('summarize', stage_summarize, deps=('simulate', 'features'))
+graph.register('render', stage_render, deps=('simulate',))
+
+inputs = dict(
+    index_id=index_id,
+    series_type=series_type,
+    source_id=source_id,
+    data_version=(
+        series_version(index_id, series_type, source_id),
+        int(series_rows.at[source_id, 'n_rows']),
+        str(series_rows.at[source_id, 'last_updated_at']),
+        int(series_rows.at[source_id, 'version']),
+    ),
     schedule=schedule,
-    amount_per_contrib=amount_per_contrib,
-    lookback_days=int(lookback),
+    amount_per_contrib=float(amount_per_contrib),
+    lookback=int(lookback),
     base_fraction=float(base_fraction),
-    thresholds_pct=thresholds,
-    deploy_fractions=deploy,
-    allow_daily_dip_buys=bool(allow_daily),
-    transaction_cost_bps=float(tcost_bps),
-    cash_rate_annual=float(cash_rate),
+    thresholds=tuple(thresholds),
+    deploy=tuple(deploy),
+    allow_daily=bool(allow_daily),
+    tcost_bps=float(tcost_bps),
+    cash_rate=float(cash_rate),
+    running_xirr=bool(show_xirr_curve),
 )
 
-sum_dict = summary.__dict__
+prices_series = graph.run('normalize', **inputs)
+if prices_series is None:
+    st.warning('Cached data is empty. Please re-upload in Data Manager.')
+    st.stop()
+
+summary, ledger = graph.run('simulate', **inputs)
+digest = graph.run('summarize', **inputs)
+rendered = graph.run('render', **inputs)
+if debug:
+    debug_box.write("**Dashboard stages:**", graph.stats())
+
+sum_dict = digest['summary']
 
 col1, col2, col3, col4 = st.columns(4)
 col1.metric('Total contributed', f"₹{sum_dict['total_contributed']:,.0f}")
@@ -210,28 +367,223 @@ col7.metric('Trades (SIP)', str(sum_dict['sip_trades']))
 col8.metric('Trades (Dip-SIP)', str(sum_dict['dip_trades']))
 
 st.subheader('Latest trigger')
-last = ledger.iloc[-1]
+latest = digest['latest']
 A, B, C, D = st.columns(4)
-A.metric('Date', str(last['date']))
-B.metric('Drawdown', f"{float(last['drawdown_pct']):,.2f}%")
-C.metric('Cash bucket', f"₹{float(last['dip_cash']):,.0f}")
-D.metric('Suggested buy today', f"₹{float(last['dip_base_buy'] + last['dip_trigger_buy']):,.0f}")
-
-st.subheader('Value over time')
-chart_df = ledger.copy()
-chart_df['date'] = pd.to_datetime(chart_df['date'])
-chart_df = chart_df.set_index('date')[['sip_value', 'dip_value', 'dip_cash']]
-st.line_chart(chart_df)
-
-st.subheader('Ledger (last 250 rows)')
-st.dataframe(ledger.tail(250), use_container_width=True)
-
-st.download_button(
-    'Download full ledger CSV',
-    data=ledger.to_csv(index=False).encode('utf-8'),
-    file_name=f'ledger_{index_id}.csv',
-    mime='text/csv',
-)
+A.metric('Date', latest['date'])
+B.metric('Drawdown', f"{latest['drawdown_pct']:,.2f}%")
+C.metric('Cash bucket', f"₹{latest['dip_cash']:,.0f}")
+D.metric('Suggested buy today', f"₹{latest['suggested_buy']:,.0f}")
+
+st.caption('Current drawdown by lookback: ' + ' · '.join(
+    f"{w}d {dd:,.2f}%" for w, dd in digest['drawdowns'].items()
+))
+
+with span('render.charts'):
+    st.subheader('Value over time')
+    st.line_chart(rendered['chart_df'])
+
+    if rendered['xirr_df'] is not None:
+        st.subheader('XIRR to date')
+        st.line_chart(rendered['xirr_df'])
+
+with st.expander('Rolling start-date analysis'):
+    st.caption('Alpha XIRR for every fixed-horizon window, so the result does not hinge on one start date.')
+    rA, rB = st.columns(2)
+    with rA:
+        horizon_years = st.number_input('Horizon (years)', min_value=1, max_value=30, value=10, step=1)
+    with rB:
+        roll_step = st.selectbox('Window start', ['month', 'day'], index=0)
+    if st.button('Run rolling analysis'):
+        with st.spinner('Running every window...'):
+            st.session_state['rolling_table'] = rolling_start_analysis(
+                prices=prices_series,
+                schedule=schedule,
+                amount_per_contrib=amount_per_contrib,
+                lookback_days=int(lookback),
+                base_fraction=float(base_fraction),
+                thresholds_pct=thresholds,
+                deploy_fractions=deploy,
+                allow_daily_dip_buys=bool(allow_daily),
+                transaction_cost_bps=float(tcost_bps),
+                cash_rate_annual=float(cash_rate),
+                horizon_years=float(horizon_years),
+                step=roll_step,
+            )
+    rolling_table = st.session_state.get('rolling_table')
+    if rolling_table is not None:
+        if rolling_table.empty:
+            st.warning('History is shorter than the chosen horizon.')
+        else:
+            alpha_pct = rolling_table.set_index(pd.to_datetime(rolling_table['start_date']))['alpha_xirr'] * 100.0
+            st.write(f'{len(rolling_table)} windows — alpha XIRR (%) by start date')
+            st.line_chart(alpha_pct)
+            counts, edges = np.histogram(alpha_pct.dropna(), bins=30)
+            st.bar_chart(pd.Series(counts, index=[f'{x:.2f}' for x in edges[:-1]], name='windows'))
+            st.dataframe(
+                (rolling_table[['sip_xirr', 'dip_xirr', 'alpha_xirr']] * 100.0)
+                .describe(percentiles=[0.05, 0.25, 0.5, 0.75, 0.95]),
+                use_container_width=True,
+            )
+
+with st.expander('Monte Carlo (block bootstrap)'):
+    st.caption('Both strategies on synthetic paths resampled from this index\'s daily returns in random-length blocks.')
+    mA, mB, mC, mD = st.columns(4)
+    with mA:
+        mc_paths = st.number_input('Paths', min_value=100, max_value=20000, value=1000, step=100)
+    with mB:
+        mc_years = st.number_input('Horizon (years) ', min_value=1, max_value=30, value=10, step=1)
+    with mC:
+        mc_block = st.number_input('Mean block (days)', min_value=1, max_value=250, value=20, step=1)
+    with mD:
+        mc_seed = st.number_input('Seed', min_value=0, value=0, step=1)
+    if st.button('Run Monte Carlo'):
+        with st.spinner('Simulating paths...'):
+            try:
+                st.session_state['mc_paths'] = run_monte_carlo(
+                    prices=prices_series,
+                    schedule=schedule,
+                    amount_per_contrib=amount_per_contrib,
+                    lookback_days=int(lookback),
+                    base_fraction=float(base_fraction),
+                    thresholds_pct=thresholds,
+                    deploy_fractions=deploy,
+                    allow_daily_dip_buys=bool(allow_daily),
+                    transaction_cost_bps=float(tcost_bps),
+                    cash_rate_annual=float(cash_rate),
+                    n_paths=int(mc_paths),
+                    horizon_years=float(mc_years),
+                    mean_block_days=float(mc_block),
+                    seed=int(mc_seed),
+                )
+            except ValueError as e:
+                st.session_state.pop('mc_paths', None)
+                st.warning(str(e))
+    mc_table = st.session_state.get('mc_paths')
+    if mc_table is not None:
+        st.metric('Paths where Dip-SIP beats SIP', f"{(mc_table['alpha_xirr'] > 0).mean() * 100:.1f}%")
+        bands = percentile_bands(mc_table)
+        bands[['sip_xirr', 'dip_xirr', 'alpha_xirr', 'alpha_value']] *= 100.0
+        st.dataframe(bands.rename(columns={
+            'sip_xirr': 'sip_xirr (%)', 'dip_xirr': 'dip_xirr (%)',
+            'alpha_xirr': 'alpha_xirr (%)', 'alpha_value': 'alpha_value (%)',
+        }), use_container_width=True)
+        counts, edges = np.histogram(mc_table['alpha_xirr'].dropna() * 100.0, bins=30)
+        st.bar_chart(pd.Series(counts, index=[f'{x:.2f}' for x in edges[:-1]], name='paths'))
+
+with st.expander('Portfolio (multi-index)'):
+    st.caption('Split the contribution across several indices, aligned on their common trading days.')
+    cached = catalog[catalog['series_type'].str.lower() == series_type.lower()]
+    cached_ids = set(cached['index_id'])
+    pf_labels = [i['label'] for i in indices if i['index_id'] in cached_ids]
+    pf_pick = st.multiselect('Indices', pf_labels, default=[index_label] if index_label in pf_labels else [])
+    pf_weights = {}
+    if pf_pick:
+        wcols = st.columns(len(pf_pick))
+        for col, label in zip(wcols, pf_pick):
+            with col:
+                pf_weights[index_label_to_id[label]] = st.number_input(
+                    f'{label} weight', min_value=0.01, value=1.0, step=0.25, key=f'pf_w_{label}',
+                )
+    pf_cash = st.radio('Dip-SIP cash', CASH_MODES, horizontal=True,
+                       help='separate: one cash bucket per index; pooled: one bucket any index can draw on')
+    if st.button('Run portfolio') and pf_weights:
+        pf_prices = {}
+        for pid in pf_weights:
+            rows = cached[cached['index_id'] == pid]
+            # Same source as the main run when the index has it, else its first cached source
+            src = source_id if source_id in set(rows['source_id']) else sorted(rows['source_id'])[0]
+            if hasattr(cache, 'load_price_series'):
+                pf_prices[pid] = cache.load_price_series(pid, series_type, src)
+            else:
+                pf_prices[pid] = normalize_price_series(cache.load_prices(pid, series_type, src), 'date', 'close')
+        with st.spinner('Running sleeves...'):
+            try:
+                st.session_state['portfolio_run'] = run_portfolio(
+                    pf_prices,
+                    pf_weights,
+                    schedule=schedule,
+                    amount_per_contrib=amount_per_contrib,
+                    lookback_days=int(lookback),
+                    base_fraction=float(base_fraction),
+                    thresholds_pct=thresholds,
+                    deploy_fractions=deploy,
+                    allow_daily_dip_buys=bool(allow_daily),
+                    transaction_cost_bps=float(tcost_bps),
+                    cash_rate_annual=float(cash_rate),
+                    cash_mode=pf_cash,
+                )
+                st.session_state['portfolio_cash_mode'] = pf_cash
+            except ValueError as e:
+                st.session_state.pop('portfolio_run', None)
+                st.warning(str(e))
+    pf_run = st.session_state.get('portfolio_run')
+    if pf_run is not None:
+        pf_table, pf_ledgers = pf_run
+        if st.session_state.get('portfolio_cash_mode') == 'pooled':
+            st.caption('Pooled cash: a sleeve holds what it paid in less what it drew from the shared bucket '
+                       '(negative when it borrowed from other sleeves), so its dip value and XIRR include that balance.')
+            pf_table = pf_table.rename(columns={'dip_cash': 'dip_cash (paid in − drawn)'})
+        st.dataframe(pf_table, use_container_width=True, hide_index=True)
+        pf_ledger = pf_ledgers['portfolio']
+        st.line_chart(pf_ledger[['sip_value', 'dip_value', 'dip_cash']].set_index(pd.to_datetime(pf_ledger['date'])))
+
+with st.expander('Optimizer'):
+    st.caption('Successive halving over lookback, base fraction, ladder shape and daily buys: candidates are '
+               'screened on sub-periods and only the survivors get full-history backtests. '
+               'Transaction cost and cash rate come from the sidebar.')
+    oA, oB, oC, oD = st.columns(4)
+    with oA:
+        opt_objective = st.selectbox('Objective', list(OBJECTIVES), format_func=lambda k: OBJECTIVES[k])
+    with oB:
+        opt_candidates = st.number_input('Candidates', min_value=9, max_value=1000, value=81, step=9)
+    with oC:
+        opt_window = st.number_input('Sub-period (years)', min_value=1, max_value=15, value=5, step=1)
+    with oD:
+        opt_seed = st.number_input('Seed ', min_value=0, value=0, step=1)
+    if st.button('Run optimizer'):
+        base_cfg = StrategyConfig(
+            strategy_id='dip_sip_band_entry',
+            lookback_days=int(lookback),
+            base_fraction=float(base_fraction),
+            thresholds_pct=list(thresholds),
+            deploy_fractions=list(deploy),
+            allow_daily_dip_buys=bool(allow_daily),
+            transaction_cost_bps=float(tcost_bps),
+            cash_rate_annual=float(cash_rate),
+        )
+        with st.spinner('Screening candidates...'):
+            st.session_state['optimizer_board'] = optimize(
+                prices_series,
+                base_cfg,
+                objective=opt_objective,
+                schedule=schedule,
+                monthly_amount=float(monthly_amount),
+                n_candidates=int(opt_candidates),
+                window_years=float(opt_window),
+                seed=int(opt_seed),
+            )
+    opt_run = st.session_state.get('optimizer_board')
+    if opt_run is not None:
+        board, best = opt_run
+        st.write('Best config:', {
+            'lookback_days': best.lookback_days,
+            'base_fraction': best.base_fraction,
+            'thresholds_pct': best.thresholds_pct,
+            'deploy_fractions': best.deploy_fractions,
+            'allow_daily_dip_buys': best.allow_daily_dip_buys,
+        })
+        st.dataframe(board.head(25), use_container_width=True, hide_index=True)
+
+with span('render.ledger'):
+    st.subheader(f'Ledger ({ledger_view.lower()})')
+    st.dataframe(rendered['views'][ledger_view], use_container_width=True)
+
+    st.download_button(
+        'Download full ledger CSV',
+        data=rendered['csv'],
+        file_name=f'ledger_{index_id}.csv',
+        mime='text/csv',
+    )
 
 st.subheader('Save run to cache + export')
 if st.button('Save this run'):
@@ -270,3 +622,13 @@ if st.button('Save this run'):
     st.success(f'✅ Saved. run_id: {run_id}')
     st.write(f'Ledger → {ledger_path}')
     st.write(f'Summary → {summary_path}')
+
+# ========== TRACE REPORT ==========
+if rerun_trace is not None:
+    st.session_state.pop('rerun_trace', None)
+    trace_rows = rerun_trace.end(TRACE_LOG if st.session_state.get('trace_to_log') else None)
+    if debug:
+        debug_box.write("**Trace (this rerun, slowest first):**")
+        if rerun_trace.memory_denied:
+            debug_box.caption('Another session is tracking memory; showing timings only.')
+        debug_box.dataframe(pd.DataFrame(trace_rows), use_container_width=True, hide_index=True)
@@ -0,0 +1,290 @@
+"""Benchmarks for the engine, XIRR, calendar and storage hot paths.
+
+Every case runs on synthetic data (seeded, so runs are comparable): price
+series of 1, 10 and 40 years for each schedule, and ledgers of 1k to 100k rows
+for LocalCache save/load. Each case records median and best wall time over
+--repeat runs, peak traced memory (from one extra run under tracemalloc) and
+throughput in rows per second. Results are appended to a JSON-lines history.
+
+compare checks the latest history entry against a baseline (a run saved with
+run --save-baseline) and flags cases slower, or hungrier, than the threshold.
+
+Usage:
+    python benchmarks/run_benchmarks.py run
+    python benchmarks/run_benchmarks.py run --quick --filter run_backtest xirr --save-baseline
+    python benchmarks/run_benchmarks.py compare --threshold 0.15
+
+Exit codes (compare): 0 no regressions, 1 regressions found, 2 missing baseline or history.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from core.calendar import make_contribution_dates, scale_amount_for_schedule  # noqa: E402
+from core.engine import normalize_price_series, run_backtest  # noqa: E402
+from core.features import FEATURES  # noqa: E402
+from core.xirr import xirr  # noqa: E402
+from storage.cache import LocalCache  # noqa: E402
+from storage.ledger_codec import LEDGER_COLUMNS  # noqa: E402
+
+EXIT_OK = 0
+EXIT_REGRESSION = 1
+EXIT_MISSING = 2
+
+YEARS = (1, 10, 40)
+SCHEDULES = ('daily', 'weekly', 'monthly')
+LEDGER_ROWS = (1_000, 10_000, 100_000)
+END_DATE = '2024-12-31'
+STRATEGY = {
+    'lookback_days': 252,
+    'base_fraction': 0.25,
+    'thresholds_pct': [10, 15, 20, 30, 40, 50],
+    'deploy_fractions': [0.10, 0.10, 0.15, 0.25, 0.35, 0.60],
+    'allow_daily_dip_buys': True,
+    'transaction_cost_bps': 10,
+    'cash_rate_annual': 0.0,
+}
+
+
+def synthetic_prices(years: int, seed: int = 0) -> pd.Series:
+    """Business-day random walk with a couple of deep drawdowns, ending on END_DATE."""
+    idx = pd.bdate_range(end=END_DATE, periods=int(years * 261))
+    rng = np.random.default_rng(seed)
+    r = rng.normal(0.0004, 0.012, len(idx))
+    for start in rng.integers(0, max(len(idx) - 120, 1), size=max(1, years // 8)):
+        r[start:start + 120] -= 0.004
+    return pd.Series(1000.0 * np.exp(np.cumsum(r)), index=idx)
+
+
+def synthetic_ledger(rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    ledger = pd.DataFrame({'date': pd.date_range(end=END_DATE, periods=rows, freq='D').strftime('%Y-%m-%d')})
+    for col in LEDGER_COLUMNS[1:]:
+        ledger[col] = rng.random(rows) * 1e5
+    return ledger
+
+
+def build_cases(quick: bool, workdir: str) -> list[dict]:
+    """Cases as dicts: name, params, rows (for throughput) and fn, a zero-argument callable."""
+    years = YEARS[:2] if quick else YEARS
+    ledger_rows = LEDGER_ROWS[:2] if quick else LEDGER_ROWS
+    cases = []
+
+    for y in years:
+        prices = synthetic_prices(y)
+        raw = pd.DataFrame({'date': prices.index.strftime('%Y-%m-%d'), 'close': prices.to_numpy()})
+        cases.append({
+            'name': 'normalize_price_series', 'params': {'years': y}, 'rows': len(raw),
+            'fn': lambda raw=raw: normalize_price_series(raw, 'date', 'close'),
+        })
+        for schedule in SCHEDULES:
+            amount = scale_amount_for_schedule(10000, schedule)
+
+            def backtest(prices=prices, schedule=schedule, amount=amount):
+                # Cold feature cache, so every repeat pays for the rolling high
+                FEATURES.clear()
+                run_backtest(prices, schedule=schedule, amount_per_contrib=amount, **STRATEGY)
+
+            cases.append({'name': 'run_backtest', 'params': {'years': y, 'schedule': schedule},
+                          'rows': len(prices), 'fn': backtest})
+            cases.append({
+                'name': 'make_contribution_dates', 'params': {'years': y, 'schedule': schedule},
+                'rows': len(prices), 'fn': lambda idx=prices.index, schedule=schedule: make_contribution_dates(idx, schedule),
+            })
+            contrib = make_contribution_dates(prices.index, schedule)
+            cashflows = [(d, -amount) for d in contrib] + [(prices.index[-1], amount * len(contrib) * 1.8)]
+            cases.append({
+                'name': 'xirr', 'params': {'years': y, 'schedule': schedule},
+                'rows': len(cashflows), 'fn': lambda cashflows=cashflows: xirr(cashflows),
+            })
+
+    cache = LocalCache(os.path.join(workdir, 'bench.sqlite'))
+    cache.init_db(os.path.join(BASE_DIR, 'storage', 'schema.sql'))
+    for y in years:
+        prices = synthetic_prices(y, seed=1)
+        frame = pd.DataFrame({'date': prices.index.strftime('%Y-%m-%d'), 'close': prices.to_numpy()})
+        cache.upsert_prices(f'BENCH{y}', 'TRI', 'bench', frame)
+        cases.append({
+            'name': 'cache.load_prices', 'params': {'years': y}, 'rows': len(frame),
+            'fn': lambda y=y: cache.load_prices(f'BENCH{y}', 'TRI', 'bench'),
+        })
+    for rows in ledger_rows:
+        ledger = synthetic_ledger(rows)
+        run_id = cache.save_run('BENCH', 'TRI', 'bench', 'dip_sip_band_entry', {}, {}, {}, ledger)
+        cases.append({
+            'name': 'cache.save_run', 'params': {'ledger_rows': rows}, 'rows': rows,
+            'fn': lambda ledger=ledger: cache.save_run('BENCH', 'TRI', 'bench', 'dip_sip_band_entry', {}, {}, {}, ledger),
+        })
+        cases.append({
+            'name': 'cache.load_ledger', 'params': {'ledger_rows': rows}, 'rows': rows,
+            'fn': lambda run_id=run_id: cache.load_ledger(run_id),
+        })
+    return cases
+
+
+def case_key(case: dict) -> str:
+    return case['name'] + ''.join(f' {k}={v}' for k, v in sorted(case['params'].items()))
+
+
+def measure(fn, repeat: int) -> dict:
+    # Scalar xirr's Newton steps can overflow on the way to converging; not worth the noise here
+    with np.errstate(all='ignore'):
+        return _measure(fn, repeat)
+
+
+def _measure(fn, repeat: int) -> dict:
+    fn()  # warm-up: imports, allocator, SQLite page cache
+    times = []
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'wall_s': statistics.median(times), 'wall_min_s': min(times), 'peak_kb': peak / 1024}
+
+
+def git_commit() -> str:
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR, capture_output=True, text=True, timeout=10)
+        return out.stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ''
+
+
+def run(args) -> int:
+    with tempfile.TemporaryDirectory() as workdir:
+        cases = build_cases(args.quick, workdir)
+        if args.filter:
+            cases = [c for c in cases if any(f in case_key(c) for f in args.filter)]
+        results = []
+        for case in cases:
+            stats = measure(case['fn'], args.repeat)
+            stats['rows_per_s'] = case['rows'] / stats['wall_s'] if stats['wall_s'] > 0 else float('inf')
+            results.append({'case': case_key(case), 'name': case['name'], 'params': case['params'], 'rows': case['rows'], **stats})
+            print(f"{case_key(case):<55} {stats['wall_s'] * 1e3:10.2f} ms {stats['peak_kb'] / 1024:9.2f} MB "
+                  f"{stats['rows_per_s']:14,.0f} rows/s", flush=True)
+
+    entry = {
+        'timestamp': datetime.now(timezone.utc).replace(microsecond=0).isoformat(),
+        'commit': git_commit(),
+        'label': args.label or '',
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'machine': platform.platform(),
+        'repeat': args.repeat,
+        'results': results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.history)), exist_ok=True)
+    with open(args.history, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(entry) + '\n')
+    print(f'\n{len(results)} cases appended to {args.history}')
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, indent=1)
+        print(f'Baseline saved to {args.baseline}')
+    return EXIT_OK
+
+
+def load_history(path: str) -> list[dict]:
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def compare(args) -> int:
+    if not os.path.exists(args.baseline):
+        print(f'No baseline at {args.baseline}; create one with: run --save-baseline', file=sys.stderr)
+        return EXIT_MISSING
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    history = load_history(args.history)
+    if not history:
+        print(f'No runs in {args.history}', file=sys.stderr)
+        return EXIT_MISSING
+    current = history[-1]
+
+    before = {r['case']: r for r in baseline['results']}
+    rows = []
+    for r in current['results']:
+        b = before.get(r['case'])
+        if b is None:
+            continue
+        time_ratio = r[args.metric] / b[args.metric] if b[args.metric] > 0 else float('inf')
+        mem_ratio = r['peak_kb'] / b['peak_kb'] if b['peak_kb'] > 0 else 1.0
+        flags = []
+        # Sub-millisecond cases are mostly timer noise; they are shown but never flagged
+        if time_ratio > 1 + args.threshold and b[args.metric] * 1e3 >= args.min_ms:
+            flags.append('SLOWER')
+        if mem_ratio > 1 + args.mem_threshold:
+            flags.append('MORE MEMORY')
+        rows.append({
+            'case': r['case'],
+            f'base_{args.metric}_ms': b[args.metric] * 1e3,
+            f'{args.metric}_ms': r[args.metric] * 1e3,
+            'time_x': time_ratio,
+            'mem_x': mem_ratio,
+            'flag': ', '.join(flags),
+        })
+    if not rows:
+        print('Baseline and latest run share no cases.', file=sys.stderr)
+        return EXIT_MISSING
+
+    table = pd.DataFrame(rows)
+    with pd.option_context('display.width', 200, 'display.max_rows', None, 'display.float_format', '{:.2f}'.format):
+        print(table.to_string(index=False))
+    flagged = table[table['flag'] != '']
+    print(f"\nBaseline {baseline.get('commit') or '?'} ({baseline['timestamp']}) vs "
+          f"{current.get('commit') or '?'} ({current['timestamp']}): {len(flagged)} of {len(table)} cases regressed "
+          f'(threshold {args.threshold:.0%} time, {args.mem_threshold:.0%} memory)')
+    return EXIT_REGRESSION if len(flagged) else EXIT_OK
+
+
+def main(argv=None) -> int:
+    here = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description='Benchmark the engine, XIRR, calendar and storage hot paths.')
+    parser.add_argument('--history', default=os.path.join(here, 'history.jsonl'), help='JSON-lines run history')
+    parser.add_argument('--baseline', default=os.path.join(here, 'baseline.json'))
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_run = sub.add_parser('run', help='run the suite and append it to the history')
+    p_run.add_argument('--repeat', type=int, default=5, help='timed runs per case (median is reported)')
+    p_run.add_argument('--quick', action='store_true', help='skip the 40-year series and 100k-row ledgers')
+    p_run.add_argument('--filter', nargs='*', help='only cases whose key contains one of these strings')
+    p_run.add_argument('--label', default=None, help='free-text note stored with the run')
+    p_run.add_argument('--save-baseline', action='store_true', help='also store this run as the baseline')
+
+    p_cmp = sub.add_parser('compare', help='compare the latest run against the baseline')
+    p_cmp.add_argument('--threshold', type=float, default=0.10, help='allowed slowdown, as a fraction')
+    p_cmp.add_argument('--mem-threshold', type=float, default=0.25, help='allowed peak-memory growth, as a fraction')
+    p_cmp.add_argument('--metric', choices=['wall_s', 'wall_min_s'], default='wall_s')
+    p_cmp.add_argument('--min-ms', type=float, default=1.0, help='baseline time below which slowdowns are not flagged')
+
+    args = parser.parse_args(argv)
+    return run(args) if args.command == 'run' else compare(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
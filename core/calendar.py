@@ -2,7 +2,10 @@ from __future__ import annotations
 
 import pandas as pd
 
+from core.tracing import traced
 
+
+@traced()
 def make_contribution_dates(trading_days: pd.DatetimeIndex, schedule: str) -> pd.DatetimeIndex:
     idx = pd.DatetimeIndex(trading_days)
     if schedule == 'daily':
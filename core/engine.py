@@ -3,11 +3,16 @@ from __future__ import annotations
 import pandas as pd
 import numpy as np
 
-from core.xirr import xirr
+from core.xirr import running_xirr as xirr_curve, xirr, xirr_terminal_batch
 from core.calendar import make_contribution_dates
-from core.models import BacktestSummary
+from core.models import BacktestSummary, EngineState
+from core.features import FEATURES, rolling_max_multi
+from core.tracing import traced
 
+_PERIOD_FREQ = {'daily': 'D', 'weekly': 'W', 'monthly': 'M'}
 
+
+@traced()
 def normalize_price_series(df: pd.DataFrame, date_col: str, close_col: str) -> pd.Series:
     dfx = df.copy()
     dfx[date_col] = pd.to_datetime(dfx[date_col])
@@ -20,28 +25,286 @@ def normalize_price_series(df: pd.DataFrame, date_col: str, close_col: str) -> p
 
 
 def drawdown_from_rolling_high(prices: pd.Series, lookback_days: int):
-    roll_max = prices.rolling(int(lookback_days), min_periods=1).max()
-    dd = (prices / roll_max - 1.0) * 100.0
-    return dd, roll_max
+    """Drawdown (%) from the trailing lookback-day high, served from the shared feature cache."""
+    return FEATURES.drawdown(prices, lookback_days)
 
 
-def run_backtest(
+def _band_levels(dd: np.ndarray, thresholds: list[float]) -> np.ndarray:
+    """Vectorized band_from_dd: index of the last threshold crossed, -1 if none."""
+    if not thresholds:
+        return np.full(len(dd), -1, dtype=np.int64)
+    hit = dd[:, None] <= -np.asarray(thresholds, dtype=float)[None, :]
+    last = hit.shape[1] - 1 - np.argmax(hit[:, ::-1], axis=1)
+    return np.where(hit.any(axis=1), last, -1)
+
+
+def _epoch_days(idx: pd.DatetimeIndex) -> np.ndarray:
+    return idx.values.astype('datetime64[D]').astype(np.int64)
+
+
+def _gap_days(idx: pd.DatetimeIndex) -> np.ndarray:
+    days = _epoch_days(idx)
+    gaps = np.zeros(len(days), dtype=np.int64)
+    gaps[1:] = np.diff(days)
+    return gaps
+
+
+def _growth_factors(gaps: np.ndarray, cash_rate_annual: float) -> list[float]:
+    """Per-row cash growth over each gap in calendar days.
+
+    Uses Python's float pow, as the reference loop does: NumPy's vectorized
+    power can differ in the last bit, which would break bit-identical ledgers.
+    """
+    daily_rate = (1.0 + float(cash_rate_annual)) ** (1.0 / 365.25) - 1.0
+    gap_list = gaps.tolist()
+    factors = {g: (1.0 + daily_rate) ** g for g in set(gap_list)}
+    return [factors[g] for g in gap_list]
+
+
+def _sip_leg(
+    price: np.ndarray,
+    contrib: np.ndarray,
+    amount: float,
+    transaction_cost_bps: float,
+    sip_units: float = 0.0,
+) -> dict:
+    """Standard SIP leg; path-independent, so it is a cumulative sum of units bought."""
+    amount = float(amount)
+    fee_rate = transaction_cost_bps / 1e4
+    active = contrib & (amount > 0)
+    bought = np.where(active, (amount - amount * fee_rate) / price, 0.0)
+    return {
+        'amount': amount,
+        'contribution': np.where(contrib, amount, 0.0),
+        'active': active,
+        'sip_buy': np.where(active, amount, 0.0),
+        # Seeding the running sum keeps a resumed leg bit-identical to an unbroken one
+        'sip_units': np.cumsum(np.r_[float(sip_units), bought])[1:],
+        'sip_trades': int(active.sum()),
+    }
+
+
+def _dip_leg(
+    price: np.ndarray,
+    dd: np.ndarray,
+    levels: np.ndarray,
+    contrib: np.ndarray,
+    active: np.ndarray,
+    gaps: np.ndarray,
+    amount: float,
+    base_fraction: float,
+    deploy: list[float],
+    allow_daily_dip_buys: bool,
+    transaction_cost_bps: float,
+    cash_rate_annual: float,
+    dip_units: float = 0.0,
+    dip_cash: float = 0.0,
+    dip_trades: int = 0,
+    min_band: int = -1,
+) -> dict:
+    """Dip-SIP leg of the array kernel.
+
+    All inputs are aligned by position. Cash and band state carry from day to
+    day, so this stays a loop, but over plain floats with preallocated outputs;
+    the arithmetic mirrors the reference loop step by step. The trailing
+    arguments are the carried state, for continuing an earlier run.
+    """
+    n = len(price)
+    amount = float(amount)
+    fee_rate = transaction_cost_bps / 1e4
+    base_fraction = float(base_fraction)
+
+    dip_units_col = np.empty(n)
+    dip_cash_col = np.empty(n)
+    base_col = np.zeros(n)
+    trigger_col = np.zeros(n)
+
+    p_list = price.tolist()
+    dd_list = dd.tolist()
+    lv_list = levels.tolist()
+    act_list = active.tolist()
+    is_contrib = contrib.tolist()
+    gap_list = gaps.tolist()
+    g_list = _growth_factors(gaps, cash_rate_annual)
+
+    dip_units = float(dip_units)
+    dip_cash = float(dip_cash)
+    dip_trades = int(dip_trades)
+    min_band = int(min_band)
+    for i in range(n):
+        p = p_list[i]
+        if gap_list[i] > 0 and dip_cash > 0:
+            dip_cash *= g_list[i]
+
+        buys_today = act_list[i]
+        if buys_today:
+            dip_cash += amount
+
+        # Re-arm when at rolling high
+        if dd_list[i] >= -1e-12:
+            min_band = -1
+
+        if buys_today and base_fraction > 0 and dip_cash > 0:
+            invest = dip_cash * base_fraction
+            dip_units += (invest - invest * fee_rate) / p
+            dip_cash -= invest
+            dip_trades += 1
+            base_col[i] = invest
+
+        if (allow_daily_dip_buys or is_contrib[i]) and dip_cash > 0:
+            level = lv_list[i]
+            if level > min_band:
+                deploy_amt = dip_cash * deploy[level]
+                dip_units += (deploy_amt - deploy_amt * fee_rate) / p
+                dip_cash -= deploy_amt
+                dip_trades += 1
+                trigger_col[i] = deploy_amt
+                min_band = level
+
+        dip_units_col[i] = dip_units
+        dip_cash_col[i] = dip_cash
+
+    return {
+        'dip_units': dip_units_col,
+        'dip_cash': dip_cash_col,
+        'dip_base_buy': base_col,
+        'dip_trigger_buy': trigger_col,
+        'dip_trades': dip_trades,
+        'min_band': min_band,
+        'dip_units_end': dip_units,
+        'dip_cash_end': dip_cash,
+    }
+
+
+def _ledger_frame(
+    idx: pd.DatetimeIndex,
+    price: np.ndarray,
+    roll_max: np.ndarray,
+    dd: np.ndarray,
+    sip: dict,
+    dip: dict,
+) -> pd.DataFrame:
+    return pd.DataFrame({
+        'date': idx.strftime('%Y-%m-%d'),
+        'price': price,
+        'rolling_high': roll_max,
+        'drawdown_pct': dd,
+        'contribution': sip['contribution'],
+        'sip_buy': sip['sip_buy'],
+        'dip_base_buy': dip['dip_base_buy'],
+        'dip_trigger_buy': dip['dip_trigger_buy'],
+        'dip_cash': dip['dip_cash'],
+        'sip_value': sip['sip_units'] * price,
+        'dip_value': dip['dip_units'] * price + dip['dip_cash'],
+    })
+
+
+def _sip_final_xirr(idx: pd.DatetimeIndex, price: np.ndarray, sip: dict) -> tuple[float, float]:
+    sip_final = float(sip['sip_units'][-1] * price[-1])
+    days = _epoch_days(idx)
+    out_days = days[sip['active']]
+    sip_x = xirr_terminal_batch(out_days, np.full(len(out_days), -sip['amount']), days[-1], [sip_final])[0]
+    return sip_final, float(sip_x)
+
+
+def _summarize(
+    idx: pd.DatetimeIndex,
+    price: np.ndarray,
+    sip: dict,
+    dip: dict,
+    sip_final_xirr: tuple[float, float] | None = None,
+    dip_xirr: float | None = None,
+) -> BacktestSummary:
+    """Build the summary; callers sharing a SIP leg or batching XIRR pass results in."""
+    dip_final = float(dip['dip_units'][-1] * price[-1] + dip['dip_cash'][-1])
+    if sip_final_xirr is None or dip_xirr is None:
+        sip_final = float(sip['sip_units'][-1] * price[-1])
+        days = _epoch_days(idx)
+        out_days = days[sip['active']]
+        sip_x, dip_x = xirr_terminal_batch(
+            out_days, np.full(len(out_days), -sip['amount']), days[-1], [sip_final, dip_final],
+        )
+        if sip_final_xirr is None:
+            sip_final_xirr = (sip_final, float(sip_x))
+        if dip_xirr is None:
+            dip_xirr = float(dip_x)
+    sip_final, sip_x = sip_final_xirr
+    dip_x = float(dip_xirr)
+    return BacktestSummary(
+        total_contributed=float(sip['amount'] * sip['sip_trades']),
+        sip_final=sip_final,
+        dip_final=dip_final,
+        sip_xirr=sip_x,
+        dip_xirr=dip_x,
+        alpha_xirr=float(dip_x - sip_x),
+        sip_trades=int(sip['sip_trades']),
+        dip_trades=int(dip['dip_trades']),
+    )
+
+
+def _add_running_xirr(ledger: pd.DataFrame) -> pd.DataFrame:
+    """Append sip_xirr_to_date / dip_xirr_to_date, as if each row were liquidated that day."""
+    days = pd.DatetimeIndex(pd.to_datetime(ledger['date'])).values.astype('datetime64[D]').astype(np.int64)
+    curves = xirr_curve(
+        days,
+        ledger['sip_buy'].to_numpy(dtype=float),
+        ledger[['sip_value', 'dip_value']].to_numpy(dtype=float),
+    )
+    ledger['sip_xirr_to_date'] = curves[:, 0]
+    ledger['dip_xirr_to_date'] = curves[:, 1]
+    return ledger
+
+
+def _run_backtest_array(
     prices: pd.Series,
     schedule: str,
     amount_per_contrib: float,
     lookback_days: int,
     base_fraction: float,
-    thresholds_pct: list[float],
-    deploy_fractions: list[float],
+    thresholds: list[float],
+    deploy: list[float],
     allow_daily_dip_buys: bool,
     transaction_cost_bps: float,
     cash_rate_annual: float,
 ) -> tuple[BacktestSummary, pd.DataFrame]:
-    thresholds = [float(x) for x in thresholds_pct]
-    deploy = [float(x) for x in deploy_fractions]
-    if len(thresholds) != len(deploy):
-        raise ValueError('thresholds_pct and deploy_fractions must have same length')
+    idx = pd.DatetimeIndex(prices.index)
+    contrib = idx.isin(make_contribution_dates(idx, schedule))
+    dd, roll_max = drawdown_from_rolling_high(prices, lookback_days)
 
+    price = prices.to_numpy(dtype=float)
+    dd_arr = dd.to_numpy(dtype=float)
+    sip = _sip_leg(price, contrib, amount_per_contrib, transaction_cost_bps)
+    dip = _dip_leg(
+        price,
+        dd_arr,
+        _band_levels(dd_arr, thresholds),
+        contrib,
+        sip['active'],
+        _gap_days(idx),
+        amount_per_contrib,
+        base_fraction,
+        deploy,
+        allow_daily_dip_buys,
+        transaction_cost_bps,
+        cash_rate_annual,
+    )
+    ledger = _ledger_frame(idx, price, roll_max.to_numpy(dtype=float), dd_arr, sip, dip)
+    return _summarize(idx, price, sip, dip), ledger
+
+
+def _run_backtest_reference(
+    prices: pd.Series,
+    schedule: str,
+    amount_per_contrib: float,
+    lookback_days: int,
+    base_fraction: float,
+    thresholds: list[float],
+    deploy: list[float],
+    allow_daily_dip_buys: bool,
+    transaction_cost_bps: float,
+    cash_rate_annual: float,
+) -> tuple[BacktestSummary, pd.DataFrame]:
+    """Day-by-day reference loop; kept for equivalence checks against the array kernel."""
     idx = pd.DatetimeIndex(prices.index)
     contrib_dates = set(make_contribution_dates(idx, schedule))
     dd, roll_max = drawdown_from_rolling_high(prices, lookback_days)
@@ -156,3 +419,203 @@ def run_backtest(
         sip_trades=int(sip_trades),
         dip_trades=int(dip_trades),
     ), pd.DataFrame(rows)
+
+
+def _open_period_start(idx: pd.DatetimeIndex, schedule: str) -> int:
+    """Position of the first row of the last contribution period.
+
+    That period is still open: a later row in it would move its contribution
+    day, so state is only ever carried up to the row before it.
+    """
+    periods = idx.to_period(_PERIOD_FREQ[schedule])
+    earlier = np.flatnonzero(periods != periods[-1])
+    return int(earlier[-1]) + 1 if len(earlier) else 0
+
+
+def _legs_from(state: EngineState, price, dd, levels, contrib, gaps) -> tuple[dict, dict]:
+    p = state.params
+    sip = _sip_leg(price, contrib, p['amount_per_contrib'], p['transaction_cost_bps'], state.sip_units)
+    dip = _dip_leg(
+        price,
+        dd,
+        levels,
+        contrib,
+        sip['active'],
+        gaps,
+        p['amount_per_contrib'],
+        p['base_fraction'],
+        p['deploy_fractions'],
+        p['allow_daily_dip_buys'],
+        p['transaction_cost_bps'],
+        p['cash_rate_annual'],
+        dip_units=state.dip_units,
+        dip_cash=state.dip_cash,
+        dip_trades=state.dip_trades,
+        min_band=state.min_band,
+    )
+    return sip, dip
+
+
+def _run_from_state(
+    state: EngineState,
+    idx: pd.DatetimeIndex,
+    price: np.ndarray,
+    dd: np.ndarray,
+    roll_max: np.ndarray,
+) -> tuple[BacktestSummary, pd.DataFrame, EngineState]:
+    """Continue the array kernel from state over rows idx (all after the state's tail).
+
+    The rows are run in two pieces, up to and from the open contribution
+    period, and the state is captured between them.
+    """
+    p = state.params
+    days = _epoch_days(idx)
+    gaps = np.diff(np.r_[state.tail_days[-1:] or days[:1], days])
+    contrib = idx.isin(make_contribution_dates(idx, p['schedule']))
+    levels = _band_levels(dd, p['thresholds_pct'])
+    k = _open_period_start(idx, p['schedule'])
+
+    sip_a, dip_a = _legs_from(state, price[:k], dd[:k], levels[:k], contrib[:k], gaps[:k])
+    keep = max(int(p['lookback_days']) - 1, 1)
+    settled = EngineState(
+        params=p,
+        tail_days=(state.tail_days + days[:k].tolist())[-keep:],
+        tail_prices=(state.tail_prices + price[:k].tolist())[-keep:],
+        contrib_days=state.contrib_days + days[:k][sip_a['active']].tolist(),
+        sip_units=float(sip_a['sip_units'][-1]) if k else state.sip_units,
+        sip_trades=state.sip_trades + sip_a['sip_trades'],
+        dip_units=dip_a['dip_units_end'],
+        dip_cash=dip_a['dip_cash_end'],
+        dip_trades=dip_a['dip_trades'],
+        min_band=dip_a['min_band'],
+    )
+    sip_b, dip_b = _legs_from(settled, price[k:], dd[k:], levels[k:], contrib[k:], gaps[k:])
+
+    sip = {col: np.r_[sip_a[col], sip_b[col]] for col in ('contribution', 'active', 'sip_buy', 'sip_units')}
+    dip = {col: np.r_[dip_a[col], dip_b[col]] for col in ('dip_units', 'dip_cash', 'dip_base_buy', 'dip_trigger_buy')}
+    ledger = _ledger_frame(idx, price, roll_max, dd, sip, dip)
+
+    amount = float(p['amount_per_contrib'])
+    sip_trades = settled.sip_trades + sip_b['sip_trades']
+    out_days = np.r_[np.asarray(settled.contrib_days, dtype=np.int64), days[k:][sip_b['active']]]
+    sip_final = float(sip['sip_units'][-1] * price[-1])
+    dip_final = float(dip['dip_units'][-1] * price[-1] + dip['dip_cash'][-1])
+    sip_x, dip_x = xirr_terminal_batch(out_days, np.full(len(out_days), -amount), days[-1], [sip_final, dip_final])
+    summary = BacktestSummary(
+        total_contributed=float(amount * sip_trades),
+        sip_final=sip_final,
+        dip_final=dip_final,
+        sip_xirr=float(sip_x),
+        dip_xirr=float(dip_x),
+        alpha_xirr=float(dip_x - sip_x),
+        sip_trades=int(sip_trades),
+        dip_trades=int(dip_b['dip_trades']),
+    )
+    return summary, ledger, settled
+
+
+@traced()
+def resume_backtest(state: EngineState, prices: pd.Series) -> tuple[BacktestSummary, pd.DataFrame, EngineState]:
+    """Continue a backtest from a saved EngineState with newer price rows.
+
+    prices may be the full series or just its recent rows, as long as it holds
+    every row after the state's tail (earlier rows are ignored). The work is
+    O(new rows + open period + lookback). The summary covers the whole history
+    and equals a full rerun's; the ledger holds the replayed rows only (the
+    open contribution period onwards), matching the full rerun's last rows.
+    Returns the state to save for the next update.
+    """
+    idx = pd.DatetimeIndex(prices.index)
+    if state.tail_days:
+        prices = prices[_epoch_days(idx) > state.tail_days[-1]]
+        idx = pd.DatetimeIndex(prices.index)
+    if prices.empty:
+        raise ValueError('no price rows after the saved state')
+
+    lookback = int(state.params['lookback_days'])
+    m = len(state.tail_prices)
+    values = np.r_[np.asarray(state.tail_prices, dtype=float), prices.to_numpy(dtype=float)]
+    roll_max = rolling_max_multi(values, [lookback])[lookback]
+    dd = (values / roll_max - 1.0) * 100.0
+    return _run_from_state(state, idx, values[m:], dd[m:], roll_max[m:])
+
+
+@traced()
+def run_backtest(
+    prices: pd.Series,
+    schedule: str,
+    amount_per_contrib: float,
+    lookback_days: int,
+    base_fraction: float,
+    thresholds_pct: list[float],
+    deploy_fractions: list[float],
+    allow_daily_dip_buys: bool,
+    transaction_cost_bps: float,
+    cash_rate_annual: float,
+    kernel: str = 'array',
+    running_xirr: bool = False,
+    return_state: bool = False,
+):
+    """Backtest Dip-SIP against Standard SIP.
+
+    kernel='array' runs the position-indexed NumPy kernel; kernel='reference'
+    runs the original per-date loop. Both produce the same ledger and summary.
+    running_xirr=True adds sip_xirr_to_date and dip_xirr_to_date ledger columns.
+    return_state=True (array kernel only) returns (summary, ledger, state),
+    where state can be passed to resume_backtest once new rows arrive.
+    """
+    thresholds = [float(x) for x in thresholds_pct]
+    deploy = [float(x) for x in deploy_fractions]
+    if len(thresholds) != len(deploy):
+        raise ValueError('thresholds_pct and deploy_fractions must have same length')
+    if return_state:
+        if kernel != 'array':
+            raise ValueError("return_state requires kernel='array'")
+        state = EngineState(
+            params={
+                'schedule': schedule,
+                'amount_per_contrib': float(amount_per_contrib),
+                'lookback_days': int(lookback_days),
+                'base_fraction': float(base_fraction),
+                'thresholds_pct': thresholds,
+                'deploy_fractions': deploy,
+                'allow_daily_dip_buys': bool(allow_daily_dip_buys),
+                'transaction_cost_bps': float(transaction_cost_bps),
+                'cash_rate_annual': float(cash_rate_annual),
+            },
+            tail_days=[],
+            tail_prices=[],
+            contrib_days=[],
+        )
+        dd, roll_max = drawdown_from_rolling_high(prices, lookback_days)
+        summary, ledger, state = _run_from_state(
+            state,
+            pd.DatetimeIndex(prices.index),
+            prices.to_numpy(dtype=float),
+            dd.to_numpy(dtype=float),
+            roll_max.to_numpy(dtype=float),
+        )
+        if running_xirr:
+            ledger = _add_running_xirr(ledger)
+        return summary, ledger, state
+    if kernel == 'array':
+        impl = _run_backtest_array
+    elif kernel == 'reference':
+        impl = _run_backtest_reference
+    else:
+        raise ValueError("kernel must be 'array' or 'reference'")
+    summary, ledger = impl(
+        prices,
+        schedule,
+        amount_per_contrib,
+        lookback_days,
+        base_fraction,
+        thresholds,
+        deploy,
+        allow_daily_dip_buys,
+        transaction_cost_bps,
+        cash_rate_annual,
+    )
+    if running_xirr:
+        ledger = _add_running_xirr(ledger)
+    return summary, ledger
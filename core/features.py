@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from core.tracing import traced
+
+
+def series_fingerprint(prices: pd.Series) -> str:
+    """Content hash of a price series (dates and closes)."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(pd.DatetimeIndex(prices.index).values.astype('datetime64[ns]').view(np.int64).tobytes())
+    h.update(np.ascontiguousarray(prices.to_numpy(dtype=float)).tobytes())
+    return h.hexdigest()
+
+
+def max_sparse_table(values: np.ndarray, max_window: int) -> list[np.ndarray]:
+    """Level k holds the trailing max over 2**k values ending at each position."""
+    levels = [np.array(values, dtype=float)]
+    span = 1
+    while span * 2 <= max_window:
+        prev = levels[-1]
+        nxt = prev.copy()
+        nxt[span:] = np.maximum(prev[span:], prev[:-span])
+        levels.append(nxt)
+        span *= 2
+    return levels
+
+
+def rolling_max_from_table(levels: list[np.ndarray], window: int) -> np.ndarray:
+    """Trailing max with min_periods=1 semantics, answered from two table lookups per day."""
+    window = int(window)
+    if window < 1:
+        raise ValueError('lookback must be at least 1 day')
+    values = levels[0]
+    out = np.maximum.accumulate(values)
+    if window >= len(values):
+        return out
+    k = window.bit_length() - 1
+    span = 1 << k
+    table = levels[k]
+    # Full windows [i - window + 1, i] are covered by two overlapping 2**k blocks
+    out[window - 1:] = np.maximum(table[window - 1:], table[span - 1:len(values) - window + span])
+    return out
+
+
+def rolling_max_multi(values: np.ndarray, lookbacks) -> dict[int, np.ndarray]:
+    """Rolling max for several lookbacks from one shared sparse table."""
+    lookbacks = sorted({int(w) for w in lookbacks})
+    levels = max_sparse_table(values, max(lookbacks))
+    return {w: rolling_max_from_table(levels, w) for w in lookbacks}
+
+
+class FeatureCache:
+    """Bounded LRU cache of rolling-high and drawdown arrays per (series, lookback).
+
+    Entries are keyed by series_fingerprint, so an edited series never reads a
+    stale entry. The sparse table for a series is cached too, which makes a new
+    lookback on a known series a single O(n) pass.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = int(max_bytes)
+        self._entries: OrderedDict = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _get(self, key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def _put(self, key, value, nbytes: int):
+        if key in self._entries:
+            self._bytes -= self._entries.pop(key)[1]
+        self._entries[key] = (value, nbytes)
+        self._bytes += nbytes
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            _, (_, freed) = self._entries.popitem(last=False)
+            self._bytes -= freed
+
+    @traced()
+    def features(self, prices: pd.Series, lookbacks, fingerprint: str | None = None) -> dict[int, tuple[np.ndarray, np.ndarray]]:
+        """{lookback: (drawdown_pct, rolling_high)} as read-only arrays."""
+        fp = fingerprint or series_fingerprint(prices)
+        lookbacks = sorted({int(w) for w in lookbacks})
+        out = {}
+        with self._lock:
+            missing = []
+            for w in lookbacks:
+                entry = self._get((fp, w))
+                if entry is None:
+                    missing.append(w)
+                else:
+                    out[w] = entry[0]
+            self.hits += len(lookbacks) - len(missing)
+            self.misses += len(missing)
+            if not missing:
+                return out
+
+            values = prices.to_numpy(dtype=float)
+            table_entry = self._get((fp, 'table'))
+            levels = table_entry[0] if table_entry else []
+            if len(levels) < max(missing).bit_length():
+                levels = max_sparse_table(values, max(missing))
+                self._put((fp, 'table'), levels, sum(lv.nbytes for lv in levels))
+            for w in missing:
+                roll_max = rolling_max_from_table(levels, w)
+                dd = (values / roll_max - 1.0) * 100.0
+                roll_max.flags.writeable = False
+                dd.flags.writeable = False
+                out[w] = (dd, roll_max)
+                self._put((fp, w), out[w], dd.nbytes + roll_max.nbytes)
+        return out
+
+    def drawdown(self, prices: pd.Series, lookback_days: int) -> tuple[pd.Series, pd.Series]:
+        dd, roll_max = self.features(prices, [lookback_days])[int(lookback_days)]
+        return pd.Series(dd, index=prices.index), pd.Series(roll_max, index=prices.index)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+# Process-wide cache shared by the engine and the Dashboard (survives Streamlit reruns)
+FEATURES = FeatureCache()
@@ -37,3 +37,24 @@ class BacktestSummary:
     alpha_xirr: float
     sip_trades: int
     dip_trades: int
+
+
+@dataclass
+class EngineState:
+    """Backtest state at the end of the last settled contribution period.
+
+    Plain lists and numbers, so dataclasses.asdict(state) is JSON-ready and
+    EngineState(**d) restores it. tail_days/tail_prices hold the rows the
+    next rolling-high window still needs; contrib_days are the epoch days of
+    every SIP contribution so far, which the XIRR cashflows are rebuilt from.
+    """
+    params: dict
+    tail_days: List[int]
+    tail_prices: List[float]
+    contrib_days: List[int]
+    sip_units: float = 0.0
+    sip_trades: int = 0
+    dip_units: float = 0.0
+    dip_cash: float = 0.0
+    dip_trades: int = 0
+    min_band: int = -1
@@ -0,0 +1,251 @@
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from core.calendar import make_contribution_dates
+from core.engine import _epoch_days, _growth_factors
+from core.tracing import traced
+from core.xirr import xirr_terminal_batch
+
+PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def bootstrap_indices(n_returns: int, n_steps: int, n_paths: int, mean_block: float, rng: np.random.Generator) -> np.ndarray:
+    """(n_steps, n_paths) positions into a return series, by stationary block bootstrap.
+
+    Each step starts a new block at a uniform random position with probability
+    1 / mean_block and otherwise continues the current block, wrapping around
+    the end of the series (Politis & Romano), so block lengths are geometric
+    with mean mean_block.
+    """
+    if n_steps == 0:
+        return np.empty((0, n_paths), dtype=np.int64)
+    new_block = rng.random((n_steps, n_paths)) < 1.0 / max(float(mean_block), 1.0)
+    new_block[0] = True
+    starts = rng.integers(0, n_returns, size=(n_steps, n_paths))
+    step = np.arange(n_steps)[:, None]
+    block_at = np.maximum.accumulate(np.where(new_block, step, 0), axis=0)
+    return (np.take_along_axis(starts, block_at, axis=0) + step - block_at) % n_returns
+
+
+def rolling_max_rows(price: np.ndarray, window: int) -> np.ndarray:
+    """Trailing max down the rows of a (days, paths) matrix, min_periods=1.
+
+    Same two-block lookup as features.rolling_max_from_table, but only the
+    2**k level is kept, so memory stays at two matrices whatever the window.
+    """
+    window = int(window)
+    if window < 1:
+        raise ValueError('lookback must be at least 1 day')
+    out = np.maximum.accumulate(price, axis=0)
+    n = len(price)
+    if window >= n:
+        return out
+    k = window.bit_length() - 1
+    span = 1 << k
+    table = price.copy()
+    step = 1
+    while step < span:
+        table[step:] = np.maximum(table[step:], table[:-step])
+        step *= 2
+    out[window - 1:] = np.maximum(table[window - 1:], table[span - 1:n - window + span])
+    return out
+
+
+def simulate_paths(
+    price: np.ndarray,
+    days: np.ndarray,
+    contrib: np.ndarray,
+    amount: float,
+    lookback_days: int,
+    base_fraction: float,
+    thresholds_pct: list[float],
+    deploy_fractions: list[float],
+    allow_daily_dip_buys: bool,
+    transaction_cost_bps: float,
+    cash_rate_annual: float,
+) -> dict[str, np.ndarray]:
+    """Terminal Standard SIP and Dip-SIP outcomes for every column of a (days, paths) price matrix.
+
+    All paths share one calendar (days, contrib), so every step is a row
+    operation across paths. The Dip-SIP leg carries state from day to day and
+    walks the rows once, applying _dip_leg's arithmetic to whole rows, so a
+    single path matches run_backtest on the same prices exactly.
+    """
+    n, n_paths = price.shape
+    amount = float(amount)
+    fee_rate = transaction_cost_bps / 1e4
+    base_fraction = float(base_fraction)
+    thresholds = np.asarray(thresholds_pct, dtype=float)
+    deploy = np.asarray(deploy_fractions, dtype=float)
+    active = contrib & (amount > 0)
+
+    roll_max = rolling_max_rows(price, lookback_days)
+    dd = (price / roll_max - 1.0) * 100.0
+    del roll_max
+    if len(thresholds):
+        hit = dd[..., None] <= -thresholds
+        levels = np.where(hit.any(axis=2), hit.shape[2] - 1 - np.argmax(hit[..., ::-1], axis=2), -1)
+        del hit
+    else:
+        levels = np.full(dd.shape, -1, dtype=np.int64)
+
+    bought = (amount - amount * fee_rate) / price[active]
+    sip_units = np.cumsum(bought, axis=0)[-1] if len(bought) else np.zeros(n_paths)
+
+    gaps = np.r_[0, np.diff(days)]
+    growth = _growth_factors(gaps, cash_rate_annual)
+    dip_units = np.zeros(n_paths)
+    dip_cash = np.zeros(n_paths)
+    dip_trades = np.zeros(n_paths, dtype=np.int64)
+    min_band = np.full(n_paths, -1, dtype=np.int64)
+    for i in range(n):
+        p = price[i]
+        if gaps[i] > 0:
+            dip_cash = np.where(dip_cash > 0, dip_cash * growth[i], dip_cash)
+        if active[i]:
+            dip_cash = dip_cash + amount
+        # Re-arm when at rolling high
+        min_band[dd[i] >= -1e-12] = -1
+        if active[i] and base_fraction > 0:
+            buy = dip_cash > 0
+            invest = np.where(buy, dip_cash * base_fraction, 0.0)
+            dip_units = dip_units + (invest - invest * fee_rate) / p
+            dip_cash = dip_cash - invest
+            dip_trades += buy
+        if allow_daily_dip_buys or contrib[i]:
+            level = levels[i]
+            buy = (dip_cash > 0) & (level > min_band)
+            if buy.any():
+                deploy_amt = np.where(buy, dip_cash * deploy[level], 0.0)
+                dip_units = dip_units + (deploy_amt - deploy_amt * fee_rate) / p
+                dip_cash = dip_cash - deploy_amt
+                dip_trades += buy
+                min_band = np.where(buy, level, min_band)
+
+    sip_final = sip_units * price[-1]
+    dip_final = dip_units * price[-1] + dip_cash
+    out_days = days[active]
+    xirrs = xirr_terminal_batch(out_days, np.full(len(out_days), -amount), days[-1], np.r_[sip_final, dip_final])
+    return {
+        'sip_final': sip_final,
+        'dip_final': dip_final,
+        'sip_xirr': xirrs[:n_paths],
+        'dip_xirr': xirrs[n_paths:],
+        'dip_trades': dip_trades,
+    }
+
+
+def _simulate_chunk(task: dict) -> dict[str, np.ndarray]:
+    """Bootstrap one chunk of paths and simulate them; module-level so it can go to a worker process."""
+    rng = np.random.default_rng(task['seed'])
+    returns = task['log_returns']
+    steps = bootstrap_indices(len(returns), len(task['days']) - 1, task['n_paths'], task['mean_block_days'], rng)
+    log_price = np.zeros((len(task['days']), task['n_paths']))
+    np.cumsum(returns[steps], axis=0, out=log_price[1:])
+    price = task['start_price'] * np.exp(log_price)
+    del log_price, steps
+    return simulate_paths(price, task['days'], task['contrib'], **task['params'])
+
+
+@traced()
+def run_monte_carlo(
+    prices: pd.Series,
+    schedule: str,
+    amount_per_contrib: float,
+    lookback_days: int,
+    base_fraction: float,
+    thresholds_pct: list[float],
+    deploy_fractions: list[float],
+    allow_daily_dip_buys: bool,
+    transaction_cost_bps: float,
+    cash_rate_annual: float,
+    n_paths: int = 1000,
+    horizon_years: float | None = 10,
+    mean_block_days: float = 20,
+    seed: int = 0,
+    chunk_paths: int = 250,
+    max_workers: int | None = None,
+) -> pd.DataFrame:
+    """Dip-SIP vs Standard SIP over synthetic price paths; one row per path.
+
+    Paths are built by stationary block bootstrap of the series' daily log
+    returns, so volatility clustering and drawdown shapes survive within
+    blocks of about mean_block_days. Every path runs on the trading calendar
+    of the last horizon_years of history (all of it if None) and starts at the
+    last close.
+
+    Paths are simulated chunk_paths at a time, which bounds memory to a few
+    (days x chunk_paths) arrays; chunks are spread over a process pool
+    (max_workers=1 runs in-process). Chunk i draws from child i of
+    SeedSequence(seed), so results do not depend on the worker count.
+    """
+    if len(thresholds_pct) != len(deploy_fractions):
+        raise ValueError('thresholds_pct and deploy_fractions must have same length')
+    idx = pd.DatetimeIndex(prices.index)
+    values = prices.to_numpy(dtype=float)
+    log_returns = np.diff(np.log(values))
+    log_returns = log_returns[np.isfinite(log_returns)]
+    if len(log_returns) < 2:
+        raise ValueError('Need at least three prices to bootstrap returns')
+
+    start = 0
+    if horizon_years is not None:
+        first = idx[-1] - pd.DateOffset(months=int(round(float(horizon_years) * 12)))
+        if first < idx[0]:
+            raise ValueError('History is shorter than the chosen horizon')
+        start = int(np.searchsorted(idx.values, first.to_datetime64(), side='left'))
+    calendar = idx[start:]
+    contrib = calendar.isin(make_contribution_dates(calendar, schedule))
+
+    sizes = [min(int(chunk_paths), int(n_paths) - lo) for lo in range(0, int(n_paths), int(chunk_paths))]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    params = {
+        'amount': float(amount_per_contrib),
+        'lookback_days': int(lookback_days),
+        'base_fraction': float(base_fraction),
+        'thresholds_pct': [float(x) for x in thresholds_pct],
+        'deploy_fractions': [float(x) for x in deploy_fractions],
+        'allow_daily_dip_buys': bool(allow_daily_dip_buys),
+        'transaction_cost_bps': float(transaction_cost_bps),
+        'cash_rate_annual': float(cash_rate_annual),
+    }
+    tasks = [
+        {
+            'log_returns': log_returns,
+            'days': _epoch_days(calendar),
+            'contrib': contrib,
+            'start_price': float(values[-1]),
+            'mean_block_days': float(mean_block_days),
+            'n_paths': size,
+            'seed': child,
+            'params': params,
+        }
+        for size, child in zip(sizes, seeds)
+    ]
+
+    if max_workers == 1 or len(tasks) <= 1:
+        results = [_simulate_chunk(t) for t in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            results = list(pool.map(_simulate_chunk, tasks))
+
+    table = pd.DataFrame({
+        key: np.concatenate([r[key] for r in results]) if results else np.empty(0)
+        for key in ('sip_final', 'dip_final', 'sip_xirr', 'dip_xirr', 'dip_trades')
+    })
+    table.insert(0, 'path', np.arange(len(table)))
+    table.insert(3, 'total_contributed', float(amount_per_contrib) * int((contrib & (amount_per_contrib > 0)).sum()))
+    table['alpha_xirr'] = table['dip_xirr'] - table['sip_xirr']
+    table['alpha_value'] = table['dip_final'] / table['sip_final'] - 1.0
+    return table
+
+
+def percentile_bands(paths: pd.DataFrame, percentiles=PERCENTILES) -> pd.DataFrame:
+    """Percentiles of terminal value and XIRR across paths, one row per percentile (NaN XIRRs skipped)."""
+    cols = ['sip_final', 'dip_final', 'sip_xirr', 'dip_xirr', 'alpha_xirr', 'alpha_value']
+    bands = np.nanpercentile(paths[cols].to_numpy(dtype=float), list(percentiles), axis=0)
+    return pd.DataFrame(bands, index=[f'p{p:g}' for p in percentiles], columns=cols)
@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import math
+
+import numpy as np
+import pandas as pd
+
+from core.models import StrategyConfig
+from core.sweep import _fmt_list, config_grid, run_sweep
+from core.tracing import traced
+
+OBJECTIVES = {
+    'alpha_xirr': 'Full-history alpha XIRR (mean over sub-periods while screening)',
+    'worst_window_alpha': 'Lowest alpha XIRR over the sub-periods',
+    'median_window_alpha': 'Median alpha XIRR over the sub-periods',
+}
+
+# Band thresholds (drawdown %) the ladder shapes are laid over
+THRESHOLD_SETS = (
+    (5.0, 10.0, 15.0, 20.0),
+    (10.0, 15.0, 20.0, 30.0, 40.0, 50.0),
+    (10.0, 20.0, 30.0, 40.0),
+    (20.0, 30.0, 40.0, 50.0),
+)
+
+
+def ladder(thresholds, shape: str, scale: float) -> tuple[list[float], list[float]]:
+    """(thresholds_pct, deploy_fractions) with deploy fractions laid out by shape.
+
+    'flat' deploys scale at every band, 'rising' climbs linearly from scale to
+    3 x scale, 'back_loaded' keeps scale until the last band, which deploys
+    everything left. Fractions are capped at 1.
+    """
+    k = len(thresholds)
+    if shape == 'flat':
+        deploy = [scale] * k
+    elif shape == 'rising':
+        deploy = [scale * (1.0 + 2.0 * i / max(k - 1, 1)) for i in range(k)]
+    elif shape == 'back_loaded':
+        deploy = [scale] * (k - 1) + [1.0]
+    else:
+        raise ValueError("shape must be 'flat', 'rising' or 'back_loaded'")
+    return [float(t) for t in thresholds], [round(min(d, 1.0), 4) for d in deploy]
+
+
+def default_space() -> dict:
+    """Search axes in config_grid form: lookback, base fraction, ladder shape, daily vs contribution-day buys."""
+    return {
+        'lookback_days': [63, 126, 252, 504],
+        'base_fraction': [0.0, 0.1, 0.25, 0.4, 0.6],
+        'ladder': [
+            ladder(t, shape, scale)
+            for t in THRESHOLD_SETS
+            for shape in ('flat', 'rising', 'back_loaded')
+            for scale in (0.1, 0.2, 0.35)
+        ],
+        'allow_daily_dip_buys': [True, False],
+    }
+
+
+def sub_periods(idx: pd.DatetimeIndex, window_years: float) -> list[tuple[int, int]]:
+    """Consecutive, non-overlapping (start, stop) row ranges of about window_years each."""
+    idx = pd.DatetimeIndex(idx)
+    months = int(round(float(window_years) * 12))
+    out = []
+    start = 0
+    while start < len(idx):
+        end = idx[start] + pd.DateOffset(months=months)
+        if end > idx[-1]:
+            break
+        stop = int(np.searchsorted(idx.values, end.to_datetime64(), side='left'))
+        out.append((start, stop))
+        start = stop
+    return out
+
+
+def _score(objective: str, window_alphas: np.ndarray, full_alpha: np.ndarray | None) -> np.ndarray:
+    """Objective per candidate (higher is better) from its (candidates, windows) alpha matrix.
+
+    A window whose XIRR failed counts as the worst possible result.
+    """
+    ok = np.isfinite(window_alphas)
+    if objective == 'alpha_xirr':
+        if full_alpha is not None:
+            score = np.asarray(full_alpha, dtype=float)
+        else:
+            count = ok.sum(axis=1)
+            score = np.where(ok, window_alphas, 0.0).sum(axis=1) / np.maximum(count, 1)
+            score[count == 0] = -np.inf
+    elif objective == 'worst_window_alpha':
+        score = np.where(ok, window_alphas, -np.inf).min(axis=1)
+    else:
+        score = np.median(np.where(ok, window_alphas, -np.inf), axis=1)
+    return np.where(np.isfinite(score), score, -np.inf)
+
+
+@traced()
+def optimize(
+    prices: pd.Series,
+    base: StrategyConfig,
+    objective: str = 'alpha_xirr',
+    space: dict | None = None,
+    schedule: str = 'monthly',
+    monthly_amount: float = 10000.0,
+    n_candidates: int = 81,
+    eta: int = 3,
+    window_years: float = 5,
+    seed: int = 0,
+    max_workers: int | None = None,
+) -> tuple[pd.DataFrame, StrategyConfig]:
+    """Search StrategyConfig space for the best objective by successive halving.
+
+    n_candidates configs are drawn (seeded) from config_grid(base, **space).
+    History is cut into window_years sub-periods, visited in a seeded order.
+    Rung r scores the survivors on the first eta**r sub-periods and keeps the
+    best 1/eta of them; when every sub-period has been used, the remaining
+    candidates get full-history backtests as well. A candidate's sub-period
+    results are kept between rungs, so each (candidate, sub-period) pair is
+    backtested once. Every batch goes through run_sweep, which spreads it over
+    a process pool (max_workers=1 runs in-process).
+
+    objective is a key of OBJECTIVES. worst_window_alpha and
+    median_window_alpha are scored over all sub-periods; if history is shorter
+    than two sub-periods, all of them fall back to full-history alpha.
+
+    Returns a leaderboard (one row per candidate, survivors of the last rung
+    first, best score first) and the best config.
+    """
+    if objective not in OBJECTIVES:
+        raise ValueError(f'objective must be one of {sorted(OBJECTIVES)}')
+    if eta < 2:
+        raise ValueError('eta must be at least 2')
+    rng = np.random.default_rng(seed)
+    grid = config_grid(base, **(space or default_space()))
+    if n_candidates < len(grid):
+        grid = [grid[i] for i in sorted(rng.choice(len(grid), size=int(n_candidates), replace=False))]
+    n = len(grid)
+
+    idx = pd.DatetimeIndex(prices.index)
+    windows = sub_periods(idx, window_years)
+    if len(windows) < 2:
+        windows = []
+        objective = 'alpha_xirr'
+    order = rng.permutation(len(windows))
+    window_alphas = np.full((n, len(windows)), np.nan)
+    full_alphas = np.full(n, np.nan)
+    rung_of = np.zeros(n, dtype=int)
+    score = np.full(n, -np.inf)
+
+    def run(rows: np.ndarray, window: tuple[int, int] | None) -> pd.DataFrame:
+        series = prices if window is None else prices.iloc[window[0]:window[1]]
+        table, _ = run_sweep(series, [grid[i] for i in rows], [schedule], monthly_amount, max_workers=max_workers)
+        return table.sort_values('row_id')
+
+    alive = np.arange(n)
+    used = 0
+    rung = 0
+    while True:
+        budget = min(eta ** rung, len(windows))
+        for w in order[used:budget]:
+            window_alphas[alive, w] = run(alive, windows[w])['alpha_xirr'].to_numpy()
+        used = budget
+        final = used == len(windows)
+        full_alpha = None
+        if final:
+            full_alphas[alive] = run(alive, None)['alpha_xirr'].to_numpy()
+            full_alpha = full_alphas[alive]
+        rung_of[alive] = rung
+        score[alive] = _score(objective, window_alphas[alive][:, order[:used]], full_alpha)
+        if final:
+            break
+        keep = max(1, math.ceil(len(alive) / eta))
+        # Stable sort on -score: ties keep candidate order, so the run is reproducible
+        alive = alive[np.argsort(-score[alive], kind='stable')[:keep]]
+        rung += 1
+
+    scored = ~np.isnan(window_alphas)
+    board = pd.DataFrame({
+        'candidate': np.arange(n),
+        'rung': rung_of,
+        'score': np.where(np.isfinite(score), score, np.nan),
+        'lookback_days': [int(c.lookback_days) for c in grid],
+        'base_fraction': [float(c.base_fraction) for c in grid],
+        'thresholds_pct': [_fmt_list(c.thresholds_pct) for c in grid],
+        'deploy_fractions': [_fmt_list(c.deploy_fractions) for c in grid],
+        'allow_daily_dip_buys': [bool(c.allow_daily_dip_buys) for c in grid],
+        'windows_scored': scored.sum(axis=1),
+        'worst_window_alpha': [row[m].min() if m.any() else np.nan for row, m in zip(window_alphas, scored)],
+        'full_alpha_xirr': full_alphas,
+    })
+    board = board.sort_values(['rung', 'score'], ascending=[False, False], kind='stable').reset_index(drop=True)
+    return board, grid[int(board['candidate'].iloc[0])]
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import hashlib
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable
+
+from core.tracing import span
+
+
+@dataclass
+class Stage:
+    name: str
+    fn: Callable
+    deps: tuple = ()
+    params: tuple = ()
+    memo: OrderedDict = field(default_factory=OrderedDict)
+    hits: int = 0
+    misses: int = 0
+    last_ms: float = 0.0
+
+
+class StageGraph:
+    """Explicit stage graph where each stage caches its output on its own inputs.
+
+    A stage's key hashes its name, the values of the params it declares and the
+    keys of its upstream stages, so changing one input reruns only the stages
+    downstream of it. Stage functions are called as fn(*dep_outputs, **params).
+
+    Keep one graph per session (e.g. in st.session_state) and re-register the
+    stage functions on every rerun: register() swaps the function but keeps
+    the stage's memo and counters.
+    """
+
+    def __init__(self, memo_size: int = 4):
+        self.memo_size = int(memo_size)
+        self.stages: dict[str, Stage] = {}
+
+    def register(self, name: str, fn: Callable, deps=(), params=()):
+        stage = self.stages.get(name)
+        if stage is None:
+            self.stages[name] = Stage(name, fn, tuple(deps), tuple(params))
+        else:
+            stage.fn, stage.deps, stage.params = fn, tuple(deps), tuple(params)
+
+    def _key(self, name: str, params: dict, keys: dict) -> str:
+        if name not in keys:
+            stage = self.stages[name]
+            parts = [name, [(p, params[p]) for p in stage.params], [self._key(d, params, keys) for d in stage.deps]]
+            keys[name] = hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+        return keys[name]
+
+    def run(self, name: str, **params):
+        """Output of `name`, recomputing only the stages whose key changed."""
+        keys: dict = {}
+        return self._run(name, params, keys)
+
+    def _run(self, name: str, params: dict, keys: dict):
+        stage = self.stages[name]
+        key = self._key(name, params, keys)
+        if key in stage.memo:
+            stage.memo.move_to_end(key)
+            stage.hits += 1
+            return stage.memo[key]
+        inputs = [self._run(d, params, keys) for d in stage.deps]
+        t0 = time.perf_counter()
+        with span(f'stage.{name}'):
+            out = stage.fn(*inputs, **{p: params[p] for p in stage.params})
+        stage.last_ms = (time.perf_counter() - t0) * 1000.0
+        stage.misses += 1
+        stage.memo[key] = out
+        while len(stage.memo) > self.memo_size:
+            stage.memo.popitem(last=False)
+        return out
+
+    def stats(self) -> list[dict]:
+        return [
+            {'stage': s.name, 'hits': s.hits, 'misses': s.misses, 'last_ms': round(s.last_ms, 2)}
+            for s in self.stages.values()
+        ]
+
+    def clear(self):
+        for stage in self.stages.values():
+            stage.memo.clear()
@@ -0,0 +1,264 @@
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from core.calendar import make_contribution_dates
+from core.engine import (
+    _band_levels,
+    _epoch_days,
+    _gap_days,
+    _growth_factors,
+    _ledger_frame,
+    _sip_leg,
+    _summarize,
+    drawdown_from_rolling_high,
+    run_backtest,
+)
+from core.tracing import traced
+from core.xirr import xirr_terminal_batch
+
+CASH_MODES = ('separate', 'pooled')
+
+
+def align_prices(prices: dict[str, pd.Series]) -> pd.DataFrame:
+    """One column per sleeve on the trading days every series has a close for."""
+    if not prices:
+        raise ValueError('A portfolio needs at least one index')
+    frame = pd.concat({k: s.astype(float) for k, s in prices.items()}, axis=1, join='inner').dropna()
+    frame = frame[~frame.index.duplicated(keep='last')].sort_index()
+    if len(frame) < 2:
+        raise ValueError('The indices have fewer than two trading days in common')
+    return frame
+
+
+def _run_sleeve(task: dict) -> tuple[dict, pd.DataFrame]:
+    """run_backtest for one sleeve; module-level so it can go to a worker process."""
+    summary, ledger = run_backtest(task['prices'], **task['kwargs'])
+    return summary.__dict__, ledger
+
+
+def _pooled_dip_legs(
+    price: np.ndarray,
+    dd: np.ndarray,
+    levels: np.ndarray,
+    contrib: np.ndarray,
+    active: np.ndarray,
+    gaps: np.ndarray,
+    amount: float,
+    weights: np.ndarray,
+    base_fraction: float,
+    deploy: list[float],
+    allow_daily_dip_buys: bool,
+    transaction_cost_bps: float,
+    cash_rate_annual: float,
+) -> tuple[list[dict], np.ndarray]:
+    """Dip-SIP legs of every sleeve drawing on one shared cash bucket.
+
+    Each day follows _dip_leg: the whole contribution lands in the bucket, the
+    base buy is split across sleeves by weight, and then each sleeve whose band
+    deepened deploys its fraction of what is left of the bucket, in sleeve
+    order. Band re-arming stays per sleeve. With one sleeve this is _dip_leg.
+
+    Each sleeve's dip_cash is its share of the bucket by actual draws: its
+    weighted contributions, with interest, less its own base and trigger buys.
+    The shares sum to the bucket; a sleeve that drew more than it paid in has
+    a negative share (it borrowed from the others).
+    """
+    n, k = price.shape
+    fee_rate = transaction_cost_bps / 1e4
+    growth = _growth_factors(gaps, cash_rate_annual)
+
+    units_col = np.empty((n, k))
+    cash_col = np.empty(n)
+    base_col = np.zeros((n, k))
+    trigger_col = np.zeros((n, k))
+    p_rows = price.tolist()
+    dd_rows = dd.tolist()
+    lv_rows = levels.tolist()
+    w = [float(x) for x in weights]
+
+    share_col = np.empty((n, k))
+    units = [0.0] * k
+    trades = [0] * k
+    min_band = [-1] * k
+    shares = [0.0] * k
+    cash = 0.0
+    for i in range(n):
+        p, d, lv = p_rows[i], dd_rows[i], lv_rows[i]
+        if gaps[i] > 0 and cash > 0:
+            cash *= growth[i]
+            shares = [c * growth[i] for c in shares]
+        buys_today = bool(active[i])
+        if buys_today:
+            cash += amount
+            for j in range(k):
+                shares[j] += amount * w[j]
+        for j in range(k):
+            # Re-arm when at rolling high
+            if d[j] >= -1e-12:
+                min_band[j] = -1
+
+        if buys_today and base_fraction > 0 and cash > 0:
+            invest = cash * base_fraction
+            for j in range(k):
+                part = invest * w[j]
+                units[j] += (part - part * fee_rate) / p[j]
+                shares[j] -= part
+                trades[j] += 1
+                base_col[i, j] = part
+            cash -= invest
+
+        if allow_daily_dip_buys or contrib[i]:
+            for j in range(k):
+                if cash > 0 and lv[j] > min_band[j]:
+                    deploy_amt = cash * deploy[lv[j]]
+                    units[j] += (deploy_amt - deploy_amt * fee_rate) / p[j]
+                    cash -= deploy_amt
+                    shares[j] -= deploy_amt
+                    trades[j] += 1
+                    trigger_col[i, j] = deploy_amt
+                    min_band[j] = lv[j]
+
+        units_col[i] = units
+        share_col[i] = shares
+        cash_col[i] = cash
+
+    legs = [
+        {
+            'dip_units': units_col[:, j],
+            'dip_cash': share_col[:, j],
+            'dip_base_buy': base_col[:, j],
+            'dip_trigger_buy': trigger_col[:, j],
+            'dip_trades': trades[j],
+        }
+        for j in range(k)
+    ]
+    return legs, cash_col
+
+
+@traced()
+def run_portfolio(
+    prices: dict[str, pd.Series],
+    weights: dict[str, float],
+    schedule: str,
+    amount_per_contrib: float,
+    lookback_days: int,
+    base_fraction: float,
+    thresholds_pct: list[float],
+    deploy_fractions: list[float],
+    allow_daily_dip_buys: bool,
+    transaction_cost_bps: float,
+    cash_rate_annual: float,
+    cash_mode: str = 'separate',
+    max_workers: int | None = None,
+) -> tuple[pd.DataFrame, dict[str, pd.DataFrame]]:
+    """Backtest one contribution budget split across several indices (sleeves).
+
+    The series are aligned on the trading days they all share, so every sleeve
+    contributes on the same days; sleeve j gets weights[j] (normalized to sum
+    to 1) of amount_per_contrib. cash_mode='separate' gives each sleeve its own
+    Dip-SIP cash bucket, which makes the sleeves independent run_backtest calls
+    spread over a process pool (max_workers=1 runs in-process).
+    cash_mode='pooled' keeps one bucket that any sleeve's dip can draw on; the
+    sleeves are then coupled and run in one shared loop, and a sleeve's cash
+    (and so its dip_final and dip XIRR) is its contributions less what it
+    actually drew from the bucket, which can be negative.
+
+    Returns a table with one row per sleeve plus a 'portfolio' row (summary
+    fields as in BacktestSummary, plus the final dip_cash) and a dict of
+    ledgers: one per sleeve and a combined 'portfolio' ledger of summed
+    contributions, values and cash.
+    """
+    if cash_mode not in CASH_MODES:
+        raise ValueError(f'cash_mode must be one of {CASH_MODES}')
+    if len(thresholds_pct) != len(deploy_fractions):
+        raise ValueError('thresholds_pct and deploy_fractions must have same length')
+    missing = set(prices) - set(weights)
+    if missing:
+        raise ValueError(f'No weight for {sorted(missing)}')
+    w = pd.Series({k: float(weights[k]) for k in prices})
+    if (w <= 0).any():
+        raise ValueError('Weights must be positive')
+    w = w / w.sum()
+
+    frame = align_prices(prices)
+    sleeves = list(frame.columns)
+    idx = pd.DatetimeIndex(frame.index)
+    kwargs = {
+        'schedule': schedule,
+        'lookback_days': int(lookback_days),
+        'base_fraction': float(base_fraction),
+        'thresholds_pct': [float(x) for x in thresholds_pct],
+        'deploy_fractions': [float(x) for x in deploy_fractions],
+        'allow_daily_dip_buys': bool(allow_daily_dip_buys),
+        'transaction_cost_bps': float(transaction_cost_bps),
+        'cash_rate_annual': float(cash_rate_annual),
+    }
+
+    if cash_mode == 'separate':
+        tasks = [
+            {'prices': frame[s], 'kwargs': dict(kwargs, amount_per_contrib=float(amount_per_contrib) * w[s])}
+            for s in sleeves
+        ]
+        if max_workers == 1 or len(tasks) <= 1:
+            results = [_run_sleeve(t) for t in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers) as pool:
+                results = list(pool.map(_run_sleeve, tasks))
+        summaries = {s: r[0] for s, r in zip(sleeves, results)}
+        ledgers = {s: r[1] for s, r in zip(sleeves, results)}
+    else:
+        contrib = idx.isin(make_contribution_dates(idx, schedule))
+        price = frame.to_numpy(dtype=float)
+        dd_cols, roll_cols = zip(*(drawdown_from_rolling_high(frame[s], lookback_days) for s in sleeves))
+        dd = np.column_stack([d.to_numpy(dtype=float) for d in dd_cols])
+        levels = np.column_stack([_band_levels(dd[:, j], kwargs['thresholds_pct']) for j in range(len(sleeves))])
+        sips = [
+            _sip_leg(price[:, j], contrib, float(amount_per_contrib) * w[s], kwargs['transaction_cost_bps'])
+            for j, s in enumerate(sleeves)
+        ]
+        dips, _ = _pooled_dip_legs(
+            price, dd, levels, contrib, contrib & (float(amount_per_contrib) > 0), _gap_days(idx),
+            float(amount_per_contrib), w[sleeves].to_numpy(), kwargs['base_fraction'], kwargs['deploy_fractions'],
+            kwargs['allow_daily_dip_buys'], kwargs['transaction_cost_bps'], kwargs['cash_rate_annual'],
+        )
+        summaries, ledgers = {}, {}
+        for j, s in enumerate(sleeves):
+            summaries[s] = _summarize(idx, price[:, j], sips[j], dips[j]).__dict__
+            ledgers[s] = _ledger_frame(idx, price[:, j], roll_cols[j].to_numpy(dtype=float), dd[:, j], sips[j], dips[j])
+
+    combined = pd.DataFrame({'date': ledgers[sleeves[0]]['date']})
+    for col in ('contribution', 'sip_buy', 'dip_base_buy', 'dip_trigger_buy', 'dip_cash', 'sip_value', 'dip_value'):
+        combined[col] = sum(ledgers[s][col].to_numpy() for s in sleeves)
+    for s in sleeves:
+        combined[f'{s}_sip_value'] = ledgers[s]['sip_value'].to_numpy()
+        combined[f'{s}_dip_value'] = ledgers[s]['dip_value'].to_numpy()
+    ledgers['portfolio'] = combined
+
+    # The portfolio's outflows are the summed sleeve buys on the shared contribution days
+    days = _epoch_days(idx)
+    buys = combined['sip_buy'].to_numpy()
+    sip_final = float(combined['sip_value'].iloc[-1])
+    dip_final = float(combined['dip_value'].iloc[-1])
+    sip_x, dip_x = xirr_terminal_batch(days[buys > 0], -buys[buys > 0], days[-1], [sip_final, dip_final])
+    summaries['portfolio'] = {
+        'total_contributed': float(sum(summaries[s]['total_contributed'] for s in sleeves)),
+        'sip_final': sip_final,
+        'dip_final': dip_final,
+        'sip_xirr': float(sip_x),
+        'dip_xirr': float(dip_x),
+        'alpha_xirr': float(dip_x - sip_x),
+        'sip_trades': int(max(summaries[s]['sip_trades'] for s in sleeves)),
+        'dip_trades': int(sum(summaries[s]['dip_trades'] for s in sleeves)),
+    }
+    for s in [*sleeves, 'portfolio']:
+        summaries[s]['dip_cash'] = float(ledgers[s]['dip_cash'].iloc[-1])
+
+    table = pd.DataFrame([
+        {'sleeve': s, 'weight': float(w[s]) if s in w else 1.0, **summaries[s]}
+        for s in [*sleeves, 'portfolio']
+    ])
+    return table, ledgers
@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from core.xirr import pad_cashflows, xirr_batch
+from core.calendar import make_contribution_dates
+from core.engine import _band_levels, drawdown_from_rolling_high
+from core.models import BacktestSummary
+from core.tracing import traced
+
+XIRR_CHUNK = 256
+
+
+def window_starts(idx: pd.DatetimeIndex, horizon_years: float, step: str = 'month') -> tuple[np.ndarray, np.ndarray]:
+    """Start and end positions of every complete fixed-horizon window.
+
+    step='day' starts a window on every trading day, step='month' on the first
+    trading day of each month. A window ends on the last trading day before
+    its anniversary and is kept only if that date is covered by the data.
+    """
+    idx = pd.DatetimeIndex(idx)
+    if step == 'day':
+        starts = np.arange(len(idx))
+    elif step == 'month':
+        months = idx.to_period('M')
+        starts = np.flatnonzero(np.r_[True, months[1:] != months[:-1]])
+    else:
+        raise ValueError("step must be 'day' or 'month'")
+
+    months_ahead = int(round(float(horizon_years) * 12))
+    targets = idx[starts] + pd.DateOffset(months=months_ahead)
+    ends = np.searchsorted(idx.values, targets.values, side='left') - 1
+    keep = (targets - pd.Timedelta(days=1) <= idx[-1]) & (ends > starts)
+    return starts[keep], ends[keep]
+
+
+@traced()
+def rolling_start_analysis(
+    prices: pd.Series,
+    schedule: str,
+    amount_per_contrib: float,
+    lookback_days: int,
+    base_fraction: float,
+    thresholds_pct: list[float],
+    deploy_fractions: list[float],
+    allow_daily_dip_buys: bool,
+    transaction_cost_bps: float,
+    cash_rate_annual: float,
+    horizon_years: float = 10,
+    step: str = 'month',
+) -> pd.DataFrame:
+    """BacktestSummary metrics for every fixed-horizon window start.
+
+    Everything that does not depend on the start date is computed once over the
+    full history: the drawdown series and band levels, the contribution
+    schedule, cumulative SIP units, and the list of days on which the Dip-SIP
+    leg can act. Each window then only walks its own action days.
+
+    Drawdowns use the full history, so a window that starts mid-series sees the
+    index's real rolling high rather than one rebuilt from the window start.
+    The contribution schedule matches running run_backtest on the window slice:
+    the window's last day always contributes.
+    """
+    thresholds = [float(x) for x in thresholds_pct]
+    deploy = [float(x) for x in deploy_fractions]
+    if len(thresholds) != len(deploy):
+        raise ValueError('thresholds_pct and deploy_fractions must have same length')
+
+    idx = pd.DatetimeIndex(prices.index)
+    price = prices.to_numpy(dtype=float)
+    days = idx.values.astype('datetime64[D]').astype(np.int64)
+    dd, _ = drawdown_from_rolling_high(prices, lookback_days)
+    dd = dd.to_numpy(dtype=float)
+    levels = _band_levels(dd, thresholds)
+
+    amount = float(amount_per_contrib)
+    fee_rate = float(transaction_cost_bps) / 1e4
+    base_fraction = float(base_fraction)
+    daily_rate = (1.0 + float(cash_rate_annual)) ** (1.0 / 365.25) - 1.0
+    contrib = idx.isin(make_contribution_dates(idx, schedule)) & (amount > 0)
+
+    # Prefix sums shared by every window
+    unit_buys = np.where(contrib, (amount - amount * fee_rate) / price, 0.0)
+    cum_units = np.r_[0.0, np.cumsum(unit_buys)]
+    cum_contrib = np.r_[0, np.cumsum(contrib)]
+    cum_rearm = np.r_[0, np.cumsum(dd >= -1e-12)]
+    actionable = contrib | (allow_daily_dip_buys & (levels >= 0))
+    events = np.flatnonzero(actionable)
+
+    p_list = price.tolist()
+    lv_list = levels.tolist()
+    day_list = days.tolist()
+    contrib_list = contrib.tolist()
+    rearm_list = cum_rearm.tolist()
+
+    starts, ends = window_starts(idx, horizon_years, step)
+    windows = []
+    for s, e in zip(starts.tolist(), ends.tolist()):
+        # Standard SIP from prefix sums; the last day of the slice always contributes
+        last_extra = amount > 0 and not contrib_list[e]
+        n_contrib = int(cum_contrib[e + 1] - cum_contrib[s]) + int(last_extra)
+        sip_units = cum_units[e + 1] - cum_units[s]
+        if last_extra:
+            sip_units += (amount - amount * fee_rate) / p_list[e]
+
+        # Dip-SIP over this window's action days only
+        lo, hi = np.searchsorted(events, [s, e])
+        window_events = events[lo:hi].tolist() + [e]
+        dip_units = 0.0
+        dip_cash = 0.0
+        dip_trades = 0
+        min_band = -1
+        prev = s - 1
+        for i in window_events:
+            if dip_cash > 0:
+                dip_cash *= (1.0 + daily_rate) ** (day_list[i] - day_list[prev])
+            p = p_list[i]
+            buys_today = contrib_list[i] or (i == e and amount > 0)
+            if buys_today:
+                dip_cash += amount
+            # Re-arm if the rolling high was touched since the previous action day
+            if rearm_list[i + 1] - rearm_list[prev + 1] > 0:
+                min_band = -1
+            if buys_today and base_fraction > 0 and dip_cash > 0:
+                invest = dip_cash * base_fraction
+                dip_units += (invest - invest * fee_rate) / p
+                dip_cash -= invest
+                dip_trades += 1
+            if (allow_daily_dip_buys or buys_today) and dip_cash > 0:
+                level = lv_list[i]
+                if level > min_band:
+                    deploy_amt = dip_cash * deploy[level]
+                    dip_units += (deploy_amt - deploy_amt * fee_rate) / p
+                    dip_cash -= deploy_amt
+                    dip_trades += 1
+                    min_band = level
+            prev = i
+
+        p_end = p_list[e]
+        windows.append((s, e, n_contrib, float(sip_units * p_end), float(dip_units * p_end + dip_cash), dip_trades))
+
+    # XIRR for all windows in padded batches: one SIP row and one Dip-SIP row each
+    rows = []
+    for c in range(0, len(windows), XIRR_CHUNK):
+        chunk = windows[c:c + XIRR_CHUNK]
+        day_sets, amount_sets = [], []
+        for s, e, _, sip_final, dip_final, _ in chunk:
+            out_days = days[np.flatnonzero(contrib[s:e]) + s]
+            if amount > 0:
+                out_days = np.r_[out_days, days[e]]
+            for final in (sip_final, dip_final):
+                day_sets.append(np.r_[out_days, days[e]])
+                amount_sets.append(np.r_[np.full(len(out_days), -amount), final])
+        solved = xirr_batch(*pad_cashflows(day_sets, amount_sets))
+        for j, (s, e, n_contrib, sip_final, dip_final, dip_trades) in enumerate(chunk):
+            sip_x, dip_x = float(solved[2 * j]), float(solved[2 * j + 1])
+            summary = BacktestSummary(
+                total_contributed=float(n_contrib * amount),
+                sip_final=sip_final,
+                dip_final=dip_final,
+                sip_xirr=sip_x,
+                dip_xirr=dip_x,
+                alpha_xirr=float(dip_x - sip_x),
+                sip_trades=n_contrib,
+                dip_trades=dip_trades,
+            )
+            rows.append({'start_date': idx[s].date().isoformat(), 'end_date': idx[e].date().isoformat(), **summary.__dict__})
+
+    return pd.DataFrame(rows, columns=['start_date', 'end_date', *BacktestSummary.__dataclass_fields__])
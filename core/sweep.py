@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import replace
+
+import numpy as np
+import pandas as pd
+
+from core.xirr import xirr_terminal_batch
+from core.calendar import make_contribution_dates, scale_amount_for_schedule
+from core.engine import (
+    _band_levels,
+    _dip_leg,
+    _epoch_days,
+    _gap_days,
+    _ledger_frame,
+    _sip_final_xirr,
+    _sip_leg,
+    _summarize,
+)
+from core.features import FEATURES
+from core.models import StrategyConfig
+from core.tracing import traced
+
+
+def config_grid(base: StrategyConfig, **axes) -> list[StrategyConfig]:
+    """Cartesian product of StrategyConfig fields around a base config.
+
+    Each keyword is a StrategyConfig field mapped to a list of values. The
+    special axis `ladder` takes (thresholds_pct, deploy_fractions) pairs so
+    the two lists always vary together.
+    """
+    names = list(axes)
+    configs = []
+    for values in itertools.product(*(axes[n] for n in names)):
+        changes = {}
+        for n, v in zip(names, values):
+            if n == 'ladder':
+                changes['thresholds_pct'] = list(v[0])
+                changes['deploy_fractions'] = list(v[1])
+            else:
+                changes[n] = v
+        configs.append(replace(base, **changes))
+    return configs
+
+
+def _fmt_list(xs) -> str:
+    return ','.join(str(float(x)) for x in xs)
+
+
+def _run_group(task: dict) -> list[tuple[int, dict, pd.DataFrame | None]]:
+    """Run every config sharing one (schedule, lookback) pair.
+
+    Module-level so it can be shipped to a worker process.
+    """
+    idx = task['idx']
+    price = task['price']
+    dd = task['dd']
+    contrib = task['contrib']
+    gaps = task['gaps']
+    levels_by_ladder = {}
+    legs = []
+    for row_id, cfg in task['rows']:
+        thresholds = tuple(float(x) for x in cfg.thresholds_pct)
+        if thresholds not in levels_by_ladder:
+            levels_by_ladder[thresholds] = _band_levels(dd, list(thresholds))
+        tcost = float(cfg.transaction_cost_bps)
+        sip, sip_final_xirr = task['sip_legs'][tcost]
+        dip = _dip_leg(
+            price,
+            dd,
+            levels_by_ladder[thresholds],
+            contrib,
+            sip['active'],
+            gaps,
+            task['amount'],
+            float(cfg.base_fraction),
+            [float(x) for x in cfg.deploy_fractions],
+            bool(cfg.allow_daily_dip_buys),
+            tcost,
+            float(cfg.cash_rate_annual),
+        )
+        legs.append((row_id, sip, sip_final_xirr, dip))
+
+    # Every config in the group shares its outflows, so all Dip-SIP XIRRs solve as one batch
+    days = _epoch_days(idx)
+    out_days = days[task['contrib'] & (task['amount'] > 0)]
+    finals = [dip['dip_units'][-1] * price[-1] + dip['dip_cash'][-1] for _, _, _, dip in legs]
+    dip_xirrs = xirr_terminal_batch(out_days, np.full(len(out_days), -task['amount']), days[-1], finals)
+
+    out = []
+    for (row_id, sip, sip_final_xirr, dip), dip_x in zip(legs, dip_xirrs):
+        summary = _summarize(idx, price, sip, dip, sip_final_xirr, dip_x)
+        ledger = None
+        if row_id in task['ledger_rows']:
+            ledger = _ledger_frame(idx, price, task['roll_max'], dd, sip, dip)
+        out.append((row_id, summary.__dict__, ledger))
+    return out
+
+
+@traced()
+def run_sweep(
+    prices: pd.Series,
+    configs: list[StrategyConfig],
+    schedules: list[str] = ('monthly',),
+    monthly_amount: float = 10000.0,
+    ledger_rows: list[int] | None = None,
+    max_workers: int | None = None,
+) -> tuple[pd.DataFrame, dict[int, pd.DataFrame]]:
+    """Backtest every (schedule, config) combination on one price series.
+
+    Work that does not depend on the strategy is done once and shared: the
+    contribution mask per schedule, the rolling high and drawdown per lookback,
+    band levels per ladder, and the whole Standard SIP leg (plus its XIRR) per
+    (schedule, transaction cost). Combinations are grouped by (schedule,
+    lookback) and the groups are spread over a process pool.
+
+    Returns a tidy table with one row per combination (row_id is the position in
+    schedules x configs order) and a dict of ledgers for the requested row_ids.
+    max_workers=1 runs everything in-process.
+    """
+    for cfg in configs:
+        if len(cfg.thresholds_pct) != len(cfg.deploy_fractions):
+            raise ValueError('thresholds_pct and deploy_fractions must have same length')
+
+    idx = pd.DatetimeIndex(prices.index)
+    price = prices.to_numpy(dtype=float)
+    gaps = _gap_days(idx)
+    wanted = set(ledger_rows or [])
+
+    rows = []
+    for schedule in schedules:
+        for cfg in configs:
+            rows.append((len(rows), schedule, cfg))
+
+    features = FEATURES.features(prices, {int(cfg.lookback_days) for cfg in configs})
+
+    tasks = []
+    for schedule in schedules:
+        contrib = idx.isin(make_contribution_dates(idx, schedule))
+        amount = scale_amount_for_schedule(monthly_amount, schedule)
+        sip_legs = {}
+        for tcost in sorted({float(cfg.transaction_cost_bps) for cfg in configs}):
+            sip = _sip_leg(price, contrib, amount, tcost)
+            sip_legs[tcost] = (sip, _sip_final_xirr(idx, price, sip))
+
+        for lookback, (dd, roll_max) in features.items():
+            group = [
+                (row_id, cfg) for row_id, sch, cfg in rows
+                if sch == schedule and int(cfg.lookback_days) == lookback
+            ]
+            if not group:
+                continue
+            tasks.append({
+                'idx': idx,
+                'price': price,
+                'dd': dd,
+                'roll_max': roll_max,
+                'contrib': contrib,
+                'gaps': gaps,
+                'amount': amount,
+                'sip_legs': sip_legs,
+                'rows': group,
+                'ledger_rows': wanted & {row_id for row_id, _ in group},
+            })
+
+    if max_workers == 1 or len(tasks) <= 1:
+        results = [_run_group(t) for t in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            results = list(pool.map(_run_group, tasks))
+
+    summaries = {}
+    ledgers = {}
+    for group_result in results:
+        for row_id, summary, ledger in group_result:
+            summaries[row_id] = summary
+            if ledger is not None:
+                ledgers[row_id] = ledger
+
+    table = pd.DataFrame([
+        {
+            'row_id': row_id,
+            'schedule': schedule,
+            'lookback_days': int(cfg.lookback_days),
+            'base_fraction': float(cfg.base_fraction),
+            'thresholds_pct': _fmt_list(cfg.thresholds_pct),
+            'deploy_fractions': _fmt_list(cfg.deploy_fractions),
+            'allow_daily_dip_buys': bool(cfg.allow_daily_dip_buys),
+            'transaction_cost_bps': float(cfg.transaction_cost_bps),
+            'cash_rate_annual': float(cfg.cash_rate_annual),
+            **summaries[row_id],
+        }
+        for row_id, schedule, cfg in rows
+    ])
+    return table, ledgers
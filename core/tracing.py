@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+# Only one trace at a time may drive tracemalloc: its peak counter is process-wide
+_MEMORY_OWNER = threading.Lock()
+
+
+class _Span:
+    __slots__ = ('trace', 'name', 't0', 'start_mem', 'peak')
+
+    def __init__(self, trace: 'Trace', name: str):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.trace._enter(self)
+        return self
+
+    def __exit__(self, *exc):
+        self.trace._exit(self)
+        return False
+
+
+class Trace:
+    """Timing spans of one unit of work (e.g. one Streamlit rerun), from start_trace() to end().
+
+    Spans only reach the trace that is active in the calling context, so
+    concurrent sessions (each rerun runs in its own thread) never see or end
+    each other's traces. Every span records wall time, its parent span and,
+    with memory=True, peak bytes allocated above the level at span entry
+    (tracemalloc, which slows Python allocation noticeably). Memory tracking
+    is granted to one trace at a time (a second concurrent request falls back
+    to timings only and sets memory_denied), and its peaks include whatever
+    other threads allocate meanwhile. Work handed to a thread pool records
+    into the trace only if submitted through bind().
+    """
+
+    def __init__(self, label: str = '', memory: bool = False):
+        self.label = label
+        self.memory = False
+        self.memory_denied = False
+        self.ended = False
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._records: list[dict] = []
+        self._started_tracemalloc = False
+        if memory:
+            if _MEMORY_OWNER.acquire(blocking=False):
+                self.memory = True
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start()
+                    self._started_tracemalloc = True
+            else:
+                self.memory_denied = True
+
+    def _stack(self) -> list:
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _enter(self, span: _Span):
+        stack = self._stack()
+        span.start_mem = span.peak = 0
+        if self.memory and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            # Fold the peak so far into the parent before resetting it for this span
+            if stack:
+                stack[-1].peak = max(stack[-1].peak, peak)
+            tracemalloc.reset_peak()
+            span.start_mem = span.peak = current
+        stack.append(span)
+        span.t0 = time.perf_counter()
+
+    def _exit(self, span: _Span):
+        ms = (time.perf_counter() - span.t0) * 1000.0
+        stack = self._stack()
+        if stack and stack[-1] is span:
+            stack.pop()
+        peak_kb = None
+        if self.memory and tracemalloc.is_tracing():
+            span.peak = max(span.peak, tracemalloc.get_traced_memory()[1])
+            peak_kb = (span.peak - span.start_mem) / 1024.0
+            if stack:
+                stack[-1].peak = max(stack[-1].peak, span.peak)
+        record = {
+            'span': span.name,
+            'parent': stack[-1].name if stack else '',
+            'ms': ms,
+            'peak_kb': peak_kb,
+            'thread': threading.current_thread().name,
+        }
+        with self._lock:
+            self._records.append(record)
+
+    def records(self) -> list[dict]:
+        with self._lock:
+            return list(self._records)
+
+    def summary(self) -> list[dict]:
+        """One row per span name: calls, total/mean/max ms and the largest peak, slowest first."""
+        rows: dict[str, dict] = {}
+        for r in self.records():
+            row = rows.setdefault(r['span'], {'span': r['span'], 'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'peak_kb': None})
+            row['calls'] += 1
+            row['total_ms'] += r['ms']
+            row['max_ms'] = max(row['max_ms'], r['ms'])
+            if r['peak_kb'] is not None:
+                row['peak_kb'] = max(row['peak_kb'] or 0.0, r['peak_kb'])
+        return [
+            {
+                'span': row['span'],
+                'calls': row['calls'],
+                'total_ms': round(row['total_ms'], 3),
+                'mean_ms': round(row['total_ms'] / row['calls'], 3),
+                'max_ms': round(row['max_ms'], 3),
+                'peak_kb': None if row['peak_kb'] is None else round(row['peak_kb'], 1),
+            }
+            for row in sorted(rows.values(), key=lambda row: -row['total_ms'])
+        ]
+
+    def end(self, jsonl_path: str | None = None) -> list[dict]:
+        """Stop collecting and return the summary; with jsonl_path, also append every span as a JSON line.
+
+        Safe to call more than once and from another thread than the one that
+        started the trace.
+        """
+        if _ACTIVE.get() is self:
+            _ACTIVE.set(None)
+        with self._lock:
+            first = not self.ended
+            self.ended = True
+        if first:
+            if self.memory:
+                if self._started_tracemalloc:
+                    tracemalloc.stop()
+                self.memory = False
+                _MEMORY_OWNER.release()
+            if jsonl_path:
+                stamp = datetime.now(timezone.utc).isoformat()
+                os.makedirs(os.path.dirname(os.path.abspath(jsonl_path)), exist_ok=True)
+                with open(jsonl_path, 'a', encoding='utf-8') as f:
+                    for r in self.records():
+                        f.write(json.dumps({'ts': stamp, 'label': self.label, **r}) + '\n')
+        return self.summary()
+
+
+_ACTIVE: contextvars.ContextVar[Trace | None] = contextvars.ContextVar('dip_sip_trace', default=None)
+
+
+def start_trace(label: str = '', memory: bool = False) -> Trace:
+    """Start a trace and make it the active one in the calling context (ending any trace it replaces)."""
+    previous = _ACTIVE.get()
+    if previous is not None:
+        previous.end()
+    trace = Trace(label, memory)
+    _ACTIVE.set(trace)
+    return trace
+
+
+def current_trace() -> Trace | None:
+    return _ACTIVE.get()
+
+
+def bind(fn):
+    """fn, made to record into the calling context's trace when run on another thread (e.g. a pool worker)."""
+    trace = _ACTIVE.get()
+    if trace is None or trace.ended:
+        return fn
+
+    @functools.wraps(fn)
+    def run(*args, **kwargs):
+        token = _ACTIVE.set(trace)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _ACTIVE.reset(token)
+    return run
+
+
+def span(name: str):
+    """Context manager timing a block under name; a no-op unless a trace is active."""
+    trace = _ACTIVE.get()
+    if trace is None or trace.ended:
+        return _NULL_SPAN
+    return _Span(trace, name)
+
+
+def traced(name: str | None = None):
+    """Decorator timing every call of a function (named after its qualname by default)."""
+    def wrap(fn):
+        label = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            trace = _ACTIVE.get()
+            if trace is None or trace.ended:
+                return fn(*args, **kwargs)
+            with _Span(trace, label):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
@@ -1,9 +1,14 @@
 from __future__ import annotations
 
+import math
+
 import numpy as np
 import pandas as pd
 
+from core.tracing import traced
+
 
+@traced()
 def xirr(cashflows, guess: float = 0.10) -> float:
     """Annualized IRR for irregular cashflows.
 
@@ -13,10 +18,10 @@ def xirr(cashflows, guess: float = 0.10) -> float:
     if not cashflows or len(cashflows) < 2:
         return float('nan')
 
-    dates = np.array([pd.Timestamp(d).to_datetime64() for d, _ in cashflows])
+    dates = pd.DatetimeIndex([d for d, _ in cashflows]).values.astype('datetime64[D]')
     amts = np.array([a for _, a in cashflows], dtype=float)
     t0 = dates.min()
-    years = (dates - t0).astype('timedelta64[D]').astype(float) / 365.25
+    years = (dates - t0).astype(float) / 365.25
 
     def f(r):
         return np.sum(amts / np.power(1.0 + r, years))
@@ -37,3 +42,240 @@ def xirr(cashflows, guess: float = 0.10) -> float:
             break
         r = r_new
     return float(r)
+
+
+def _npv(amounts: np.ndarray, years: np.ndarray, r: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """NPV and dNPV/dr for each row at its own rate."""
+    lg = np.log1p(r)[:, None]
+    with np.errstate(over='ignore', invalid='ignore'):
+        disc = np.exp(-years * lg)
+        f = (amounts * disc).sum(axis=1)
+        fp = -(years * amounts * disc).sum(axis=1) / (1.0 + r)
+    return f, fp
+
+
+@traced()
+def xirr_batch(
+    amounts,
+    years,
+    guess: float | np.ndarray = 0.10,
+    tol: float = 1e-11,
+    max_iter: int = 100,
+) -> np.ndarray:
+    """Solve XIRR for every row of a padded cashflow matrix.
+
+    amounts: (rows, k) cashflows, zero-padded; years: matching year fractions
+    from each row's first cashflow. Each row is first bracketed on
+    (-0.9999, up to 1e10); rows without a sign change come back NaN. Inside the
+    bracket it takes Newton steps and falls back to bisection (in log(1+r)) when
+    a step leaves the bracket, is not finite, or is not shrinking fast enough.
+    Rows that have not converged after max_iter also come back NaN, so one bad
+    row never stalls the batch.
+    """
+    a = np.atleast_2d(np.asarray(amounts, dtype=float))
+    y = np.atleast_2d(np.asarray(years, dtype=float))
+    n = a.shape[0]
+    out = np.full(n, np.nan)
+    if n == 0:
+        return out
+
+    lo = np.full(n, -0.9999)
+    hi = np.full(n, 1.0)
+    f_lo, _ = _npv(a, y, lo)
+    f_hi, _ = _npv(a, y, hi)
+    for _ in range(10):
+        widen = np.isfinite(f_lo) & np.isfinite(f_hi) & (np.sign(f_lo) == np.sign(f_hi))
+        if not widen.any():
+            break
+        hi[widen] *= 10.0
+        f_hi[widen], _ = _npv(a[widen], y[widen], hi[widen])
+
+    rows = np.flatnonzero(np.isfinite(f_lo) & np.isfinite(f_hi) & (np.sign(f_lo) != np.sign(f_hi)))
+    exact_lo = rows[f_lo[rows] == 0]
+    exact_hi = rows[f_hi[rows] == 0]
+    out[exact_lo] = lo[exact_lo]
+    out[exact_hi] = hi[exact_hi]
+    rows = rows[(f_lo[rows] != 0) & (f_hi[rows] != 0)]
+
+    a, y = a[rows], y[rows]
+    lo, hi, f_lo = lo[rows], hi[rows], f_lo[rows]
+    r = np.broadcast_to(np.asarray(guess, dtype=float), (n,))[rows].copy()
+    outside = ~((r > lo) & (r < hi))
+    r[outside] = np.expm1(0.5 * (np.log1p(lo[outside]) + np.log1p(hi[outside])))
+    dx_old = hi - lo
+
+    for _ in range(int(max_iter)):
+        if len(rows) == 0:
+            break
+        f, fp = _npv(a, y, r)
+        same = np.sign(f) == np.sign(f_lo)
+        lo = np.where(same, r, lo)
+        f_lo = np.where(same, f, f_lo)
+        hi = np.where(same, hi, r)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            r_new = r - f / fp
+        # Bisect when Newton leaves the bracket or is not halving the previous step
+        bad = ~np.isfinite(r_new) | (r_new <= lo) | (r_new >= hi) | (np.abs(2.0 * f) > np.abs(dx_old * fp))
+        r_new[bad] = np.expm1(0.5 * (np.log1p(lo[bad]) + np.log1p(hi[bad])))
+
+        scale = np.maximum(1.0, np.abs(r_new))
+        done = (f == 0) | (np.abs(r_new - r) <= tol * scale) | (hi - lo <= tol * scale)
+        out[rows[done]] = np.where(f[done] == 0, r[done], r_new[done])
+
+        keep = ~done
+        dx_old = np.abs(r_new - r)[keep]
+        rows, a, y = rows[keep], a[keep], y[keep]
+        lo, hi, f_lo, r = lo[keep], hi[keep], f_lo[keep], r_new[keep]
+    return out
+
+
+def pad_cashflows(day_sets: list, amount_sets: list) -> tuple[np.ndarray, np.ndarray]:
+    """Pack ragged (days, amounts) cashflow sets into padded matrices for xirr_batch.
+
+    days are integer day numbers (e.g. datetime64[D] as int); year fractions
+    are measured from each row's first day. Padding is zero amount at year 0.
+    """
+    k = max((len(d) for d in day_sets), default=0)
+    amounts = np.zeros((len(day_sets), k))
+    years = np.zeros((len(day_sets), k))
+    for i, (d, amt) in enumerate(zip(day_sets, amount_sets)):
+        d = np.asarray(d, dtype=np.int64)
+        if len(d) == 0:
+            continue
+        amounts[i, :len(d)] = amt
+        years[i, :len(d)] = (d - d.min()) / 365.25
+    return amounts, years
+
+
+def xirr_terminal_batch(days, amounts, end_day: int, finals, guess: float = 0.10) -> np.ndarray:
+    """XIRR for cashflow sets that share their outflows and differ only in the final value.
+
+    days/amounts are the shared (integer day, amount) outflows; finals holds one
+    terminal value per row, all paid on end_day.
+    """
+    days = np.r_[np.asarray(days, dtype=np.int64), int(end_day)]
+    years = (days - days.min()) / 365.25
+    finals = np.atleast_1d(np.asarray(finals, dtype=float))
+    a = np.empty((len(finals), len(days)))
+    a[:, :-1] = np.asarray(amounts, dtype=float)
+    a[:, -1] = finals
+    return xirr_batch(a, np.broadcast_to(years, a.shape), guess=guess)
+
+
+@traced()
+def running_xirr(
+    days,
+    outflows,
+    values,
+    guess: float = 0.10,
+    order: int = 12,
+    radius: float = 0.5,
+    tol: float = 1e-9,
+    max_iter: int = 50,
+) -> np.ndarray:
+    """XIRR to date for every row of a ledger.
+
+    Row t treats outflows[:t+1] (amounts invested, positive) as contributions on
+    days[:t+1] and values[t] as the liquidation value on days[t]. values may be
+    (n,) or (n, legs); legs sharing the same outflows are solved side by side.
+
+    Working in x = log(1 + r) and measuring time back from the current row, the
+    compounded contributions S(x) = sum c_i exp(x * age_i) are summarised by the
+    moments M_j = sum c_i age_i^j exp(xa * age_i) at an anchor rate xa. Moving
+    to the next row only shifts the ages, which is a small triangular update of
+    the moments, and S(xa + h) is their Taylor series in h. Each row warm-starts
+    Newton from the previous row's rate; the moments are rebuilt exactly (one
+    O(rows so far) pass) when |x - xa| * span exceeds radius, where span is the
+    age of the first contribution; with the defaults the truncated series is
+    accurate to about 1e-14 relative. Newton stops once a step is below tol,
+    which, converging quadratically, leaves an error far below tol.
+    """
+    days = np.asarray(days, dtype=np.int64)
+    c = np.asarray(outflows, dtype=float)
+    v = np.asarray(values, dtype=float)
+    squeeze = v.ndim == 1
+    v = v.reshape(len(v), -1)
+    n, legs = v.shape
+    vals = v.tolist()
+    out = np.full((n, legs), np.nan)
+    if n == 0:
+        return out[:, 0] if squeeze else out
+
+    tau = (days - days[0]) / 365.25
+    k = order + 2
+    inv_fact = (1.0 / np.cumprod(np.r_[1.0, np.arange(1, k)])).tolist()
+    binom = np.zeros((k, k))
+    for p in range(k):
+        binom[p, 0] = 1.0
+        for j in range(1, p + 1):
+            binom[p, j] = binom[p - 1, j - 1] + binom[p - 1, j]
+    expo = np.subtract.outer(np.arange(k), np.arange(k)).clip(min=0)
+    shift_cache = {}
+
+    x = np.full(legs, np.log1p(guess))
+    xa = x.copy()
+    moments = np.zeros((legs, k))
+    first = -1
+    for t in range(n):
+        if t > 0:
+            gap = int(days[t] - days[t - 1])
+            if gap > 0 and first >= 0:
+                shift = shift_cache.get(gap)
+                if shift is None:
+                    shift = np.tril(binom * (gap / 365.25) ** expo).T
+                    shift_cache[gap] = shift
+                moments = (moments @ shift) * np.exp(xa * gap / 365.25)[:, None]
+        if c[t] > 0:
+            moments[:, 0] += c[t]
+            if first < 0:
+                first = t
+        if first < 0 or tau[t] <= tau[first]:
+            continue
+        span = tau[t] - tau[first]
+
+        redo = []
+        for leg in range(legs):
+            # Newton on the Taylor series, evaluated by Horner's rule over plain floats
+            mom = moments[leg].tolist()
+            s_coef = [m * f for m, f in zip(mom[order::-1], inv_fact[order::-1])]
+            ds_coef = [m * f for m, f in zip(mom[order + 1:0:-1], inv_fact[order::-1])]
+            target = vals[t][leg]
+            h = x[leg] - xa[leg]
+            converged = False
+            for _ in range(max_iter):
+                s_val = 0.0
+                ds_val = 0.0
+                for a_j, b_j in zip(s_coef, ds_coef):
+                    s_val = s_val * h + a_j
+                    ds_val = ds_val * h + b_j
+                if ds_val <= 0.0:
+                    break
+                step = (s_val - target) / ds_val
+                h -= step
+                if abs(h) * span > radius:
+                    break
+                if abs(step) < tol:
+                    converged = True
+                    break
+            if converged:
+                x[leg] = xa[leg] + h
+                out[t, leg] = math.expm1(x[leg])
+            else:
+                redo.append(leg)
+
+        if redo:
+            # Re-anchor: exact solve on the prefix, then rebuild the moments there
+            age = tau[t] - tau[:t + 1]
+            amts = np.broadcast_to(np.r_[-c[:t + 1], 0.0], (len(redo), t + 2)).copy()
+            amts[:, -1] = v[t, redo]
+            years = np.broadcast_to(np.r_[tau[:t + 1], tau[t]] - tau[first], amts.shape)
+            r = xirr_batch(amts, years, guess=np.expm1(x[redo]))
+            for leg, rate in zip(redo, r):
+                if not np.isfinite(rate):
+                    continue
+                x[leg] = xa[leg] = np.log1p(rate)
+                weights = c[:t + 1] * np.exp(xa[leg] * age)
+                moments[leg] = (weights[:, None] * age[:, None] ** np.arange(k)).sum(axis=0)
+                out[t, leg] = rate
+    return out[:, 0] if squeeze else out
@@ -1,10 +1,243 @@
-"""Optional CLI job to refresh index data in the local cache.
+"""CLI job to refresh index data in the cache incrementally.
 
-This is a template/stub. Implement the provider you want (e.g., niftyindices or nse)
-and call it here, then optionally schedule via cron or Windows Task Scheduler.
+For every index in config/index_registry.yaml it looks up the last cached date
+in the series catalog, downloads only the days after it (plus a few days of
+overlap, to pick up revised closes) and upserts them; unchanged rows are not
+rewritten, so re-running is harmless. Every download goes through one
+fetch_many call, so all indices share a single pool of --workers connections,
+and a lock file makes overlapping cron runs exit instead of racing. A dry run
+reads the HTTP cache but writes nothing to it or to the price store.
+
+Uses Supabase when SUPABASE_URL and SUPABASE_KEY are set in the environment,
+otherwise the local SQLite cache from config/defaults.yaml.
 
 Usage:
     python jobs/refresh_cache.py
+    python jobs/refresh_cache.py --indices NIFTY50 NIFTY_IT --series-type both --workers 2
+    python jobs/refresh_cache.py --trace data/traces.jsonl   # append provider/storage timings
+
+Exit codes: 0 ok (including nothing to do), 1 some indices failed,
+2 every index failed or bad configuration, 3 another refresh holds the lock.
 """
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+import pandas as pd
+import yaml
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from core.tracing import start_trace  # noqa: E402
+from providers.http_cache import HTTPCache, shared_http_cache  # noqa: E402
+from providers.niftyindices import NiftyIndicesProvider  # noqa: E402
+
+EXIT_OK = 0
+EXIT_PARTIAL = 1
+EXIT_FAILED = 2
+EXIT_LOCKED = 3
+
+PROVIDERS = {NiftyIndicesProvider.id: NiftyIndicesProvider}
+
+
+def load_yaml(path: str) -> dict:
+    with open(path, 'r', encoding='utf-8') as f:
+        return yaml.safe_load(f)
+
+
+class FileLock:
+    """Non-blocking exclusive lock on a file; released when the process exits."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.handle = None
+
+    def acquire(self) -> bool:
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.handle = open(self.path, 'a+')
+        try:
+            try:
+                import fcntl
+                fcntl.flock(self.handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except ImportError:
+                import msvcrt
+                msvcrt.locking(self.handle.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            self.handle.close()
+            self.handle = None
+            return False
+        self.handle.seek(0)
+        self.handle.truncate()
+        self.handle.write(f'{os.getpid()}\n')
+        self.handle.flush()
+        return True
+
+    def release(self):
+        if self.handle is not None:
+            self.handle.close()
+            self.handle = None
+
+
+def open_cache(db_path: str, schema_sql: str, price_store_dir: str | None = None):
+    if os.environ.get('SUPABASE_URL') and os.environ.get('SUPABASE_KEY'):
+        from storage.supabase_cache import SupabaseCache
+        return SupabaseCache(os.environ['SUPABASE_URL'], os.environ['SUPABASE_KEY'])
+    from storage.cache import LocalCache
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    cache = LocalCache(db_path, price_store_dir)
+    cache.init_db(schema_sql)
+    return cache
+
+
+def plan_jobs(registry: dict, catalog: pd.DataFrame, args) -> list[dict]:
+    """One job per (index, series_type) with the date range still to fetch."""
+    wanted = set(args.indices or [])
+    known = {i['index_id'] for i in registry['indices']}
+    unknown = wanted - known
+    if unknown:
+        raise ValueError(f'Unknown index_id(s): {sorted(unknown)}')
+
+    last_dates = {
+        (r.index_id, r.series_type, r.source_id): r.last_date
+        for r in catalog.itertuples(index=False)
+    }
+    end = args.end or date.today().isoformat()
+    jobs = []
+    for spec in registry['indices']:
+        if wanted and spec['index_id'] not in wanted:
+            continue
+        if args.series_type == 'both':
+            series_types = ['TRI', 'PRICE']
+        else:
+            series_types = [args.series_type or spec.get('preferred_series', 'TRI')]
+        for series_type in series_types:
+            last = last_dates.get((spec['index_id'], series_type, args.source))
+            if last is None:
+                start = args.start
+            else:
+                start = (pd.Timestamp(last) - timedelta(days=args.overlap_days)).date().isoformat()
+            jobs.append({
+                'index_id': spec['index_id'],
+                'series_type': series_type,
+                'last_cached': last,
+                'start': start,
+                'end': end,
+            })
+    return jobs
+
+
+def run_job(job: dict, fetched, fetch_s: float, cache, dry_run: bool) -> dict:
+    """Upsert one job's download: a ProviderResult, or the exception its fetch failed with."""
+    out = dict(job, status='ok', rows=0, inserted=0, updated=0, unchanged=0, fetch_s=fetch_s, upsert_s=0.0, error='')
+    if job['start'] > job['end']:
+        out['status'] = 'up-to-date'
+        return out
+    try:
+        if isinstance(fetched, Exception):
+            raise fetched
+        res = fetched
+        out['rows'] = len(res.df)
+        if dry_run or res.df.empty:
+            out['status'] = 'dry-run' if dry_run else 'no-data'
+            return out
+        t0 = time.perf_counter()
+        stats = cache.upsert_prices(job['index_id'], job['series_type'], res.source_id, res.df)
+        out['upsert_s'] = time.perf_counter() - t0
+        out.update(inserted=stats.inserted, updated=stats.updated, unchanged=stats.unchanged)
+    except Exception as e:
+        out['status'] = 'failed'
+        out['error'] = str(e).splitlines()[0][:120]
+    return out
+
+
+def print_summary(results: list[dict], elapsed: float, fetch_s: float):
+    table = pd.DataFrame(results)[[
+        'index_id', 'series_type', 'last_cached', 'start', 'end', 'status',
+        'rows', 'inserted', 'updated', 'unchanged', 'fetch_s', 'upsert_s', 'error',
+    ]]
+    with pd.option_context('display.width', 200, 'display.max_columns', None, 'display.float_format', '{:.2f}'.format):
+        print(table.to_string(index=False))
+    failed = int((table['status'] == 'failed').sum())
+    print(f'\n{len(table)} series, {failed} failed, {int(table["inserted"].sum())} rows inserted, '
+          f'{int(table["updated"].sum())} updated in {elapsed:.1f}s ({fetch_s:.1f}s downloading)')
+
+
+def main(argv=None) -> int:
+    cfg = load_yaml(os.path.join(BASE_DIR, 'config', 'defaults.yaml'))
+    parser = argparse.ArgumentParser(description='Incrementally refresh cached index data.')
+    parser.add_argument('--indices', nargs='*', help='index_ids to refresh (default: whole registry)')
+    parser.add_argument('--series-type', choices=['TRI', 'PRICE', 'both'], default=None,
+                        help="default: each index's preferred_series")
+    parser.add_argument('--source', default=NiftyIndicesProvider.id, choices=sorted(PROVIDERS))
+    parser.add_argument('--start', default='2000-01-01', help='first date for series not cached yet')
+    parser.add_argument('--end', default=None, help='last date to fetch (default: today)')
+    parser.add_argument('--overlap-days', type=int, default=5, help='days re-fetched before the last cached date')
+    parser.add_argument('--workers', type=int, default=4, help='concurrent downloads, shared by all indices')
+    parser.add_argument('--db', default=os.path.join(BASE_DIR, cfg['storage']['cache_db_path']))
+    parser.add_argument('--lock-file', default=None, help='default: next to the cache db')
+    parser.add_argument('--dry-run', action='store_true', help='fetch but do not write')
+    parser.add_argument('--trace', default=None, metavar='FILE', help='append timing spans to FILE as JSON lines')
+    args = parser.parse_args(argv)
+
+    lock = FileLock(args.lock_file or os.path.join(os.path.dirname(os.path.abspath(args.db)), 'refresh_cache.lock'))
+    if not lock.acquire():
+        print(f'Another refresh is running (lock: {lock.path}); exiting.', file=sys.stderr)
+        return EXIT_LOCKED
+
+    trace = start_trace(label='refresh_cache') if args.trace else None
+    try:
+        t_start = time.perf_counter()
+        try:
+            registry = load_yaml(os.path.join(BASE_DIR, 'config', 'index_registry.yaml'))
+            store_dir = cfg['storage'].get('price_store_dir')
+            cache = open_cache(
+                args.db,
+                os.path.join(BASE_DIR, 'storage', 'schema.sql'),
+                os.path.join(BASE_DIR, store_dir) if store_dir else None,
+            )
+            jobs = plan_jobs(registry, cache.list_catalog(), args)
+        except Exception as e:
+            print(f'Configuration error: {e}', file=sys.stderr)
+            return EXIT_FAILED
+        if not jobs:
+            print('Nothing to refresh.')
+            return EXIT_OK
+
+        http_cache_dir = os.path.join(BASE_DIR, cfg['storage'].get('http_cache_dir', './data/http_cache'))
+        http_cache_bytes = int(cfg['storage'].get('http_cache_max_mb', 256)) * 1024 * 1024
+        if args.dry_run:
+            http_cache = HTTPCache(http_cache_dir, http_cache_bytes, read_only=True)
+        else:
+            http_cache = shared_http_cache(http_cache_dir, http_cache_bytes)
+        provider = PROVIDERS[args.source](max_workers=max(1, args.workers), http_cache=http_cache)
+
+        t0 = time.perf_counter()
+        fetched, errors, fetch_times = provider.fetch_many([
+            (job['index_id'], job['series_type'], job['start'], job['end'])
+            for job in jobs if job['start'] <= job['end']
+        ])
+        fetch_s = time.perf_counter() - t0
+        fetched.update(errors)
+        results = []
+        for job in jobs:
+            key = (job['index_id'], job['series_type'])
+            results.append(run_job(job, fetched.get(key), fetch_times.get(key, 0.0), cache, args.dry_run))
+        print_summary(results, time.perf_counter() - t_start, fetch_s)
+
+        failed = sum(r['status'] == 'failed' for r in results)
+        if failed == 0:
+            return EXIT_OK
+        return EXIT_FAILED if failed == len(results) else EXIT_PARTIAL
+    finally:
+        if trace is not None:
+            trace.end(args.trace)
+        lock.release()
+
 
-print("refresh_cache.py: Implement your preferred provider fetch logic here.")
+if __name__ == '__main__':
+    sys.exit(main())
@@ -10,6 +10,7 @@ from datetime import datetime, timedelta
 from storage.cache_factory import get_cache
 from providers.upload_csv import UploadCSVProvider
 from providers.niftyindices import NiftyIndicesProvider
+from providers.http_cache import shared_http_cache
 
 
 def load_yaml(path: str) -> dict:
@@ -60,7 +61,7 @@ authenticator.logout('Logout', 'sidebar')
 
 
 # ========== INITIALIZE CACHE ==========
-cache = get_cache(DB_PATH)
+cache = get_cache(DB_PATH, price_store_dir=cfg['storage'].get('price_store_dir') or None)
 cache.init_db(SCHEMA_SQL)
 
 st.title('Data Manager')
@@ -84,35 +85,60 @@ if source_id == 'upload_csv':
     st.subheader('📁 Upload CSV → cache')
     uploaded = st.file_uploader('Upload daily CSV', type=['csv'])
     
-    cA, cB = st.columns(2)
+    cA, cB, cC, cD = st.columns(4)
     with cA:
         date_col = st.text_input('Date column name', value='Date')
     with cB:
         close_col = st.text_input('Close/TRI column name', value='Close')
+    with cC:
+        index_col = st.text_input('Index column (long format)', value='', help='Leave empty for a single-index file')
+    with cD:
+        date_format = st.text_input('Date format', value='', help='e.g. %d-%m-%Y; empty to detect')
     
     if uploaded is not None:
-        provider = UploadCSVProvider(uploaded, date_col=date_col, close_col=close_col)
+        provider = UploadCSVProvider(uploaded, date_col=date_col, close_col=close_col,
+                                     index_col=index_col.strip() or None, date_format=date_format.strip() or None)
         try:
-            res = provider.fetch_history(index_id=index_id, series_type=series_type)
-            df = res.df
-            st.success(res.notes)
-            st.write('Preview (first 20 rows):')
-            st.dataframe(df.head(20), use_container_width=True)
-            
-            dfv = df.copy()
-            dfv['date'] = pd.to_datetime(dfv['date'])
-            st.write('Validation report:', {
-                'rows': int(len(dfv)),
-                'start_date': str(dfv['date'].min().date()),
-                'end_date': str(dfv['date'].max().date()),
-                'missing_close': int(dfv['close'].isna().sum()),
-                'unique_dates': int(dfv['date'].nunique()),
-            })
-            
-            if st.button('💾 Save to cache'):
-                cache.upsert_prices(index_id=index_id, series_type=series_type, source_id=res.source_id, df=df)
-                st.success(f'✅ Saved {len(df)} rows for {index_id} / {series_type} / {res.source_id}.')
-                st.info('Return to the main Dashboard and select this cached source from the sidebar.')
+            if provider.index_col:
+                # Long format: one streaming pass to list the series, one to save them
+                counts = provider.list_indices()
+                st.success(f'{len(counts)} indices found (dates as {provider.date_format})')
+                known = {i['index_id'] for i in indices}
+                st.dataframe(pd.DataFrame({
+                    'index_id': list(counts),
+                    'rows': list(counts.values()),
+                    'in_registry': [k in known for k in counts],
+                }), use_container_width=True, hide_index=True)
+                
+                if st.button(f'💾 Save all {len(counts)} indices to cache'):
+                    with st.spinner('Saving...'):
+                        saved = provider.ingest(cache, series_type)
+                    st.success(f'✅ Saved {len(saved)} series as {series_type} / {provider.id}.')
+                    st.dataframe(pd.DataFrame([
+                        {'index_id': k, 'inserted': v.inserted, 'updated': v.updated, 'unchanged': v.unchanged}
+                        for k, v in saved.items()
+                    ]), use_container_width=True, hide_index=True)
+            else:
+                res = provider.fetch_history(index_id=index_id, series_type=series_type)
+                df = res.df
+                st.success(res.notes)
+                st.write('Preview (first 20 rows):')
+                st.dataframe(df.head(20), use_container_width=True)
+                
+                dfv = df.copy()
+                dfv['date'] = pd.to_datetime(dfv['date'])
+                st.write('Validation report:', {
+                    'rows': int(len(dfv)),
+                    'start_date': str(dfv['date'].min().date()),
+                    'end_date': str(dfv['date'].max().date()),
+                    'missing_close': int(dfv['close'].isna().sum()),
+                    'unique_dates': int(dfv['date'].nunique()),
+                })
+                
+                if st.button('💾 Save to cache'):
+                    stats = provider.ingest(cache, series_type, index_id=index_id).get(index_id)
+                    st.success(f'✅ Saved {index_id} / {series_type} / {provider.id}: {stats}.')
+            st.info('Return to the main Dashboard and select this cached source from the sidebar.')
         except Exception as e:
             st.error(str(e))
 
@@ -133,7 +159,10 @@ elif source_id == 'niftyindices_download':
     if st.button('🚀 Fetch and save to cache'):
         with st.spinner('Downloading from NIFTY Indices...'):
             try:
-                provider = NiftyIndicesProvider()
+                provider = NiftyIndicesProvider(http_cache=shared_http_cache(
+                    cfg['storage'].get('http_cache_dir', './data/http_cache'),
+                    int(cfg['storage'].get('http_cache_max_mb', 256)) * 1024 * 1024,
+                ))
                 res = provider.fetch_history(
                     index_id=index_id,
                     start_date=start_date.strftime('%Y-%m-%d'),
@@ -157,8 +186,8 @@ elif source_id == 'niftyindices_download':
                 })
                 
                 # Auto-save
-                cache.upsert_prices(index_id=index_id, series_type=series_type, source_id=res.source_id, df=df)
-                st.success(f'✅ Saved {len(df)} rows to cache. Go to Dashboard and select this source.')
+                stats = cache.upsert_prices(index_id=index_id, series_type=series_type, source_id=res.source_id, df=df)
+                st.success(f'✅ Saved to cache ({stats}). Go to Dashboard and select this source.')
                 
             except Exception as e:
                 st.error(f'❌ Failed to fetch data: {str(e)}')
@@ -166,9 +195,10 @@ elif source_id == 'niftyindices_download':
 
 st.markdown('---')
 st.subheader('📊 Currently cached sources')
-for idx_spec in indices:
-    iid = idx_spec['index_id']
-    for st_type in ['TRI', 'PRICE']:
-        srcs = cache.list_sources_for_index(iid, st_type)
-        if srcs:
-            st.write(f'**{idx_spec["label"]}** ({st_type}): {srcs}')
+catalog = cache.list_catalog()
+if catalog.empty:
+    st.info('Nothing cached yet.')
+else:
+    labels = {i['index_id']: i['label'] for i in indices}
+    catalog.insert(0, 'index', catalog['index_id'].map(labels).fillna(catalog['index_id']))
+    st.dataframe(catalog.drop(columns=['index_id']), use_container_width=True, hide_index=True)
@@ -53,7 +53,7 @@ authenticator.logout('Logout', 'sidebar')
 
 
 # ========== INITIALIZE CACHE ==========
-cache = get_cache(DB_PATH)
+cache = get_cache(DB_PATH, price_store_dir=cfg['storage'].get('price_store_dir') or None)
 cache.init_db(SCHEMA_SQL)
 
 st.title('Run Viewer')
@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import requests
+
+_SHARED: dict = {}
+_SHARED_LOCK = threading.Lock()
+
+
+@dataclass
+class CachedResponse:
+    """The parts of requests.Response the providers use, for cached and fresh payloads alike."""
+    status_code: int
+    text: str
+    key: str = ''
+    from_cache: bool = False
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f'{self.status_code} Error', response=self)
+
+
+class HTTPCache:
+    """On-disk GET cache for provider downloads.
+
+    Entries are keyed by URL plus sorted params and stored as <key>.body with a
+    <key>.json sidecar (validators, expiry, size, last use). A fresh entry is
+    served without a request; an expired one is revalidated with
+    If-None-Match / If-Modified-Since, and a 304 just renews it. Callers pick
+    the TTL per request (e.g. long for ranges that ended in the past). Total
+    body size is capped with least-recently-used eviction, tracked in memory
+    (the directory is scanned once, on first use). Temp files are unique per
+    process and thread, so the app and the refresh job can share a directory,
+    which is only created on the first store. A read_only cache serves what is
+    already on disk but never writes (e.g. for a dry run). Parsed frames are
+    kept in a small memory LRU keyed by payload, so a repeat fetch skips the
+    parse as well.
+    """
+
+    def __init__(self, root: str, max_bytes: int = 256 * 1024 * 1024, max_frames: int = 64, read_only: bool = False):
+        self.root = root
+        self.max_bytes = int(max_bytes)
+        self.max_frames = int(max_frames)
+        self.read_only = bool(read_only)
+        self._lock = threading.Lock()
+        self._frames: OrderedDict = OrderedDict()
+        self._sizes: OrderedDict | None = None
+        self._total = 0
+        self.counts = {'hits': 0, 'revalidated': 0, 'misses': 0, 'frame_hits': 0}
+
+    @staticmethod
+    def key_for(url: str, params: dict | None) -> str:
+        blob = json.dumps([url, sorted((params or {}).items())], default=str)
+        return hashlib.sha256(blob.encode('utf-8')).hexdigest()
+
+    def _paths(self, key: str) -> tuple[str, str]:
+        base = os.path.join(self.root, key)
+        return base + '.body', base + '.json'
+
+    def _read_meta(self, key: str) -> dict | None:
+        body_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return meta if os.path.exists(body_path) else None
+
+    def _replace(self, path: str, text: str):
+        os.makedirs(self.root, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(text)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+
+    def _write_meta(self, key: str, meta: dict):
+        self._replace(self._paths(key)[1], json.dumps(meta))
+
+    def _read_body(self, key: str) -> str:
+        body_path, _ = self._paths(key)
+        with open(body_path, 'r', encoding='utf-8') as f:
+            return f.read()
+
+    def _store(self, key: str, url: str, params: dict | None, response, ttl: float):
+        body_path, _ = self._paths(key)
+        self._replace(body_path, response.text)
+        size = os.path.getsize(body_path)
+        now = time.time()
+        self._write_meta(key, {
+            'url': url,
+            'params': params or {},
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'fetched_at': now,
+            'expires_at': now + ttl,
+            'last_used': now,
+            'size': size,
+        })
+        with self._lock:
+            self._touch(key, size)
+            sizes = self._index()
+            while self._total > self.max_bytes and sizes:
+                old, old_size = sizes.popitem(last=False)
+                self._total -= old_size
+                self._remove_files(old)
+
+    def _index(self) -> OrderedDict:
+        """key -> body size, least recently used first; built from the sidecars once (caller holds _lock)."""
+        if self._sizes is None:
+            entries = []
+            try:
+                names = os.listdir(self.root)
+            except FileNotFoundError:
+                names = []
+            for name in names:
+                if name.endswith('.json'):
+                    meta = self._read_meta(name[:-5])
+                    if meta is not None:
+                        entries.append((meta.get('last_used', 0.0), int(meta.get('size', 0)), name[:-5]))
+            self._sizes = OrderedDict((key, size) for _, size, key in sorted(entries))
+            self._total = sum(self._sizes.values())
+        return self._sizes
+
+    def _touch(self, key: str, size: int):
+        """Mark key most recently used (caller holds _lock)."""
+        sizes = self._index()
+        self._total += int(size) - sizes.pop(key, 0)
+        sizes[key] = int(size)
+
+    def get(self, session: requests.Session, url: str, params: dict | None = None, timeout: float = 30, ttl: float = 3600) -> CachedResponse:
+        """GET through the cache; non-2xx/304 responses are returned as-is and never stored."""
+        key = self.key_for(url, params)
+        meta = self._read_meta(key)
+        now = time.time()
+        if meta is not None and meta['expires_at'] > now:
+            meta['last_used'] = now
+            if not self.read_only:
+                self._write_meta(key, meta)
+            with self._lock:
+                self._touch(key, meta.get('size', 0))
+            self.counts['hits'] += 1
+            return CachedResponse(200, self._read_body(key), key, True)
+
+        headers = {}
+        if meta is not None:
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+        response = session.get(url, params=params, timeout=timeout, headers=headers or None)
+
+        if response.status_code == 304 and meta is not None:
+            meta.update(expires_at=now + ttl, last_used=now)
+            if not self.read_only:
+                self._write_meta(key, meta)
+            with self._lock:
+                self._touch(key, meta.get('size', 0))
+            self.counts['revalidated'] += 1
+            return CachedResponse(200, self._read_body(key), key, True)
+        self.counts['misses'] += 1
+        if 200 <= response.status_code < 300 and not self.read_only:
+            self._store(key, url, params, response, ttl)
+        return CachedResponse(response.status_code, response.text, key, False)
+
+    def discard(self, key: str):
+        """Drop an entry, e.g. a 200 payload that turned out not to parse."""
+        with self._lock:
+            self._total -= self._index().pop(key, 0)
+            if not self.read_only:
+                self._remove_files(key)
+
+    def _remove_files(self, key: str):
+        for path in self._paths(key):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def parse(self, response: CachedResponse, parser):
+        """parser(response.text), memoized on the payload; returns a copy of the cached frame."""
+        digest = hashlib.blake2b(response.text.encode('utf-8'), digest_size=16).hexdigest()
+        with self._lock:
+            frame = self._frames.get(digest)
+            if frame is not None:
+                self._frames.move_to_end(digest)
+                self.counts['frame_hits'] += 1
+                return frame.copy()
+        frame = parser(response.text)
+        with self._lock:
+            self._frames[digest] = frame
+            while len(self._frames) > self.max_frames:
+                self._frames.popitem(last=False)
+        return frame.copy()
+
+    def stats(self) -> dict:
+        with self._lock:
+            sizes = self._index()
+            return {'entries': len(sizes), 'bytes': self._total, 'frames': len(self._frames), **self.counts}
+
+
+def shared_http_cache(root: str = './data/http_cache', max_bytes: int = 256 * 1024 * 1024) -> HTTPCache:
+    """Process-wide HTTPCache per directory, shared by every provider instance."""
+    key = os.path.realpath(root)
+    with _SHARED_LOCK:
+        if key not in _SHARED:
+            _SHARED[key] = HTTPCache(root, max_bytes)
+        return _SHARED[key]
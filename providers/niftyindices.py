@@ -1,11 +1,20 @@
 from __future__ import annotations
 
 import io
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
 import pandas as pd
 import requests
 
+from core.tracing import bind, traced
 from providers.base import DataProvider, ProviderResult
+from providers.http_cache import HTTPCache, shared_http_cache
+
+# Transient HTTP statuses worth retrying
+RETRY_STATUS = {429, 500, 502, 503, 504}
 
 
 class NiftyIndicesProvider(DataProvider):
@@ -35,9 +44,30 @@ class NiftyIndicesProvider(DataProvider):
     
     BASE_URL = 'https://www.niftyindices.com/IndexArchive'
     
-    def __init__(self, timeout: int = 30):
+    def __init__(
+        self,
+        timeout: int = 30,
+        max_workers: int = 4,
+        chunk_days: int = 365,
+        max_retries: int = 3,
+        backoff: float = 0.5,
+        http_cache: HTTPCache | None = None,
+        recent_ttl: float = 3600.0,
+        past_ttl: float = 30 * 86400.0,
+    ):
         self.timeout = timeout
+        self.max_workers = int(max_workers)
+        self.chunk_days = int(chunk_days)
+        self.max_retries = int(max_retries)
+        self.backoff = float(backoff)
+        # Chunks of settled history are cached for past_ttl, recent ones for recent_ttl
+        self.http_cache = http_cache or shared_http_cache()
+        self.recent_ttl = float(recent_ttl)
+        self.past_ttl = float(past_ttl)
         self.session = requests.Session()
+        # One connection per worker, shared by every chunk and index
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers)
+        self.session.mount('https://', adapter)
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
@@ -68,6 +98,158 @@ class NiftyIndicesProvider(DataProvider):
         except:
             return date_str
     
+    def _chunk_ranges(self, start_date: str, end_date: str) -> list[tuple[str, str]]:
+        """Split [start_date, end_date] (YYYY-MM-DD) into consecutive chunks of at most chunk_days."""
+        start = datetime.strptime(start_date, '%Y-%m-%d')
+        end = datetime.strptime(end_date, '%Y-%m-%d')
+        ranges = []
+        while start <= end:
+            stop = min(start + timedelta(days=self.chunk_days - 1), end)
+            ranges.append((start.strftime('%Y-%m-%d'), stop.strftime('%Y-%m-%d')))
+            start = stop + timedelta(days=1)
+        return ranges
+
+    def _parse_csv(self, text: str) -> pd.DataFrame:
+        # A chunk with no trading days (a weekend or holiday tail) comes back empty or header-only
+        if not text.strip():
+            return self._empty_frame()
+        df = pd.read_csv(io.StringIO(text))
+        if df.empty:
+            return self._empty_frame()
+        df.columns = df.columns.str.strip()
+        
+        if 'Date' not in df.columns:
+            raise ValueError(f"CSV missing 'Date' column. Found: {list(df.columns)}")
+        
+        close_col = 'Close'
+        if 'Close' not in df.columns:
+            for col in ['Close*', 'Closing Index Value', 'Close Value']:
+                if col in df.columns:
+                    close_col = col
+                    break
+        
+        if close_col not in df.columns:
+            raise ValueError(f"CSV missing 'Close' column. Found: {list(df.columns)}")
+        
+        dfx = df[['Date', close_col]].copy()
+        dfx.columns = ['date', 'close']
+        
+        dfx['date'] = pd.to_datetime(dfx['date'], format='%d-%b-%Y', errors='coerce')
+        dfx = dfx.dropna(subset=['date'])
+        dfx['date'] = dfx['date'].dt.date.astype(str)
+        
+        dfx['close'] = dfx['close'].astype(str).str.replace(',', '').astype(float)
+        return dfx
+
+    @staticmethod
+    def _empty_frame() -> pd.DataFrame:
+        return pd.DataFrame({'date': pd.Series(dtype=str), 'close': pd.Series(dtype=float)})
+
+    @traced()
+    def _download_chunk(self, index_name: str, start_date: str, end_date: str, series_type: str) -> pd.DataFrame:
+        """One chunk, retried with exponential backoff on timeouts, connection errors, 429 and 5xx."""
+        params = self._build_download_params(
+            index_name, self._parse_date(start_date), self._parse_date(end_date), series_type,
+        )
+        url = f"{self.BASE_URL}/histidxdata"
+        # Allow a week for late publications/revisions before a range counts as settled
+        settled = end_date < (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d')
+        ttl = self.past_ttl if settled else self.recent_ttl
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.http_cache.get(self.session, url, params, self.timeout, ttl)
+                if response.status_code in RETRY_STATUS and attempt < self.max_retries:
+                    raise requests.HTTPError(f'HTTP {response.status_code}', response=response)
+                response.raise_for_status()
+                try:
+                    return self.http_cache.parse(response, self._parse_csv)
+                except Exception:
+                    self.http_cache.discard(response.key)
+                    raise
+            except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as e:
+                status = getattr(e.response, 'status_code', None)
+                if attempt == self.max_retries or (status is not None and status not in RETRY_STATUS):
+                    raise
+                time.sleep(self.backoff * (2 ** attempt) * (1.0 + random.random()))
+
+    def _fetch_all(self, jobs: list[tuple[str, str, str, str]]) -> tuple[dict, dict]:
+        """Download every (index_id, series_type, start_date, end_date) job in year chunks.
+
+        All chunks of all jobs share one bounded worker pool (and the session's
+        connection pool). Returns ({(index_id, series_type): ProviderResult or
+        the exception that job failed with}, {same key: seconds spent in its
+        chunk downloads, summed}). Results are keyed by pair, so a pair may
+        appear in only one job.
+        """
+        pairs = [(index_id, series_type) for index_id, series_type, _, _ in jobs]
+        repeated = sorted({pair for pair in pairs if pairs.count(pair) > 1})
+        if repeated:
+            raise ValueError(f'Each (index_id, series_type) can have only one date range per call; repeated: {repeated}')
+        tasks = []
+        for index_id, series_type, start_date, end_date in jobs:
+            for chunk in self._chunk_ranges(start_date, end_date):
+                tasks.append(((index_id, series_type), chunk))
+
+        pieces: dict = {}
+        failures: dict = {}
+        elapsed: dict = {}
+        elapsed_lock = threading.Lock()
+        download = bind(self._download_chunk)
+
+        def timed(key, start, end):
+            t0 = time.perf_counter()
+            try:
+                return download(self._get_index_name(key[0]), start, end, key[1])
+            finally:
+                with elapsed_lock:
+                    elapsed[key] = elapsed.get(key, 0.0) + time.perf_counter() - t0
+
+        workers = max(1, min(self.max_workers, len(tasks)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(timed, key, start, end): key for key, (start, end) in tasks}
+            for future in as_completed(futures):
+                key = futures[future]
+                try:
+                    pieces.setdefault(key, []).append(future.result())
+                except Exception as e:
+                    failures.setdefault(key, e)
+
+        out = {}
+        for index_id, series_type, _, _ in jobs:
+            key = (index_id, series_type)
+            if key in failures:
+                out[key] = self._wrap_error(failures[key])
+                continue
+            dfx = pd.concat([self._empty_frame(), *pieces.get(key, [])], ignore_index=True)
+            dfx = dfx.sort_values('date').drop_duplicates(subset=['date'], keep='last').reset_index(drop=True)
+            out[key] = ProviderResult(
+                df=dfx,
+                source_id=self.id,
+                series_type=series_type,
+                notes=f'Fetched {len(dfx)} rows from NIFTY Indices for {self._get_index_name(index_id)} ({series_type})'
+            )
+        return out, {key: elapsed.get(key, 0.0) for key in out}
+
+    def _wrap_error(self, e: Exception) -> Exception:
+        if isinstance(e, requests.RequestException):
+            return ConnectionError(
+                f"Failed to download from NIFTY Indices. Error: {str(e)}. "
+                f"Try manual download from https://www.niftyindices.com/reports/historical-data"
+            )
+        return ValueError(
+            f"Failed to parse NIFTY Indices data. Error: {str(e)}. "
+            f"The website format may have changed. Please report this issue."
+        )
+
+    def _default_range(self, start_date: str = None, end_date: str = None) -> tuple[str, str]:
+        if not end_date:
+            end_date = datetime.now().strftime('%Y-%m-%d')
+        if not start_date:
+            start_dt = datetime.now() - timedelta(days=3*365)
+            start_date = start_dt.strftime('%Y-%m-%d')
+        return start_date, end_date
+    
+    @traced()
     def fetch_history(
         self,
         index_id: str,
@@ -77,6 +259,9 @@ class NiftyIndicesProvider(DataProvider):
     ) -> ProviderResult:
         """Fetch historical data from NIFTY Indices.
         
+        Long ranges are downloaded as year-sized chunks in parallel, then
+        stitched and de-duplicated by date.
+        
         Args:
             index_id: App index ID (e.g., 'NIFTY50')
             start_date: Start date in YYYY-MM-DD format (default: 3 years ago)
@@ -86,67 +271,39 @@ class NiftyIndicesProvider(DataProvider):
         Returns:
             ProviderResult with DataFrame containing date, close columns
         """
-        index_name = self._get_index_name(index_id)
-        
-        if not end_date:
-            end_date = datetime.now().strftime('%Y-%m-%d')
-        if not start_date:
-            start_dt = datetime.now() - timedelta(days=3*365)
-            start_date = start_dt.strftime('%Y-%m-%d')
-        
-        start_formatted = self._parse_date(start_date)
-        end_formatted = self._parse_date(end_date)
-        
-        params = self._build_download_params(index_name, start_formatted, end_formatted, series_type)
+        start_date, end_date = self._default_range(start_date, end_date)
+        result = self._fetch_all([(index_id, series_type, start_date, end_date)])[0][(index_id, series_type)]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    @traced()
+    def fetch_many(
+        self,
+        pairs: list[tuple],
+        start_date: str = None,
+        end_date: str = None,
+    ) -> tuple[dict, dict, dict]:
+        """Fetch many (index_id, series_type) pairs concurrently over the shared session.
         
-        try:
-            url = f"{self.BASE_URL}/histidxdata"
-            response = self.session.get(url, params=params, timeout=self.timeout)
-            response.raise_for_status()
-            
-            df = pd.read_csv(io.StringIO(response.text))
-            df.columns = df.columns.str.strip()
-            
-            if 'Date' not in df.columns:
-                raise ValueError(f"CSV missing 'Date' column. Found: {list(df.columns)}")
-            
-            close_col = 'Close'
-            if 'Close' not in df.columns:
-                for col in ['Close*', 'Closing Index Value', 'Close Value']:
-                    if col in df.columns:
-                        close_col = col
-                        break
-            
-            if close_col not in df.columns:
-                raise ValueError(f"CSV missing 'Close' column. Found: {list(df.columns)}")
-            
-            dfx = df[['Date', close_col]].copy()
-            dfx.columns = ['date', 'close']
-            
-            dfx['date'] = pd.to_datetime(dfx['date'], format='%d-%b-%Y', errors='coerce')
-            dfx = dfx.dropna(subset=['date'])
-            dfx['date'] = dfx['date'].dt.date.astype(str)
-            
-            dfx['close'] = dfx['close'].astype(str).str.replace(',', '').astype(float)
-            dfx = dfx.sort_values('date').drop_duplicates(subset=['date'], keep='last').reset_index(drop=True)
-            
-            return ProviderResult(
-                df=dfx,
-                source_id=self.id,
-                series_type=series_type,
-                notes=f'Fetched {len(dfx)} rows from NIFTY Indices for {index_name} ({series_type})'
-            )
-            
-        except requests.RequestException as e:
-            raise ConnectionError(
-                f"Failed to download from NIFTY Indices. Error: {str(e)}. "
-                f"Try manual download from https://www.niftyindices.com/reports/historical-data"
-            )
-        except Exception as e:
-            raise ValueError(
-                f"Failed to parse NIFTY Indices data. Error: {str(e)}. "
-                f"The website format may have changed. Please report this issue."
-            )
+        A pair may carry its own range as (index_id, series_type, start_date,
+        end_date); start_date/end_date fill in whatever a pair leaves out. A
+        pair listed twice with different ranges raises ValueError. All
+        chunks of all pairs share the provider's one bounded worker pool.
+        Returns (results, errors, elapsed), all keyed by (index_id, series_type):
+        one failing index does not discard the others, and elapsed is the time
+        spent downloading each pair's chunks (summed, so it can exceed wall time).
+        """
+        jobs = []
+        for pair in pairs:
+            index_id, series_type, *bounds = pair
+            start, end = (list(bounds) + [None, None])[:2]
+            start, end = self._default_range(start or start_date, end or end_date)
+            jobs.append((index_id, series_type, start, end))
+        out, elapsed = self._fetch_all(list(dict.fromkeys(jobs)))
+        results = {k: v for k, v in out.items() if not isinstance(v, Exception)}
+        errors = {k: v for k, v in out.items() if isinstance(v, Exception)}
+        return results, errors, elapsed
     
     def fetch_latest(self, index_id: str, series_type: str = 'TRI') -> ProviderResult:
         """Fetch latest available data (last 30 days)."""
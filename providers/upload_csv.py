@@ -1,35 +1,163 @@
 from __future__ import annotations
 
+import numpy as np
 import pandas as pd
 
+from core.tracing import traced
 from providers.base import DataProvider, ProviderResult
+from storage.ingest import UpsertStats
+
+# Tried in order on a sample of the date column; day-first wins over month-first
+DATE_FORMATS = [
+    '%Y-%m-%d', '%d-%m-%Y', '%d/%m/%Y', '%m/%d/%Y', '%Y/%m/%d', '%d.%m.%Y',
+    '%d-%b-%Y', '%d %b %Y', '%d-%b-%y', '%b %d, %Y', '%Y%m%d',
+    '%Y-%m-%d %H:%M:%S', '%d-%m-%Y %H:%M:%S', '%d/%m/%Y %H:%M:%S',
+]
+SAMPLE_ROWS = 500
+
+
+def detect_date_format(values) -> str:
+    """First of DATE_FORMATS that parses every non-empty value in the sample."""
+    sample = pd.Series(values, dtype=object).dropna().astype(str).str.strip()
+    sample = sample[sample != ''].head(SAMPLE_ROWS)
+    if sample.empty:
+        raise ValueError('No dates found to detect a date format from')
+    for fmt in DATE_FORMATS:
+        if pd.to_datetime(sample, format=fmt, errors='coerce').notna().all():
+            return fmt
+    raise ValueError(
+        f'Could not detect the date format from values like {sample.head(3).tolist()}; '
+        'declare it with date_format (e.g. %d-%m-%Y)'
+    )
 
 
 class UploadCSVProvider(DataProvider):
+    """Daily closes from an uploaded CSV, parsed in fixed-size chunks.
+
+    Wide files hold one series (date_col, close_col). Long files also have an
+    index_col and hold many series; rows are split by its value in the same
+    pass. Dates are parsed with date_format, or one detected from the first
+    chunk, so parsing stays vectorized. ingest() hands every chunk straight to
+    cache.upsert_prices, which keeps memory bounded by chunk_rows whatever the
+    file size.
+    """
+
     id = 'upload_csv'
     label = 'Upload CSV'
 
-    def __init__(self, uploaded_file, date_col: str = 'Date', close_col: str = 'Close'):
+    def __init__(
+        self,
+        uploaded_file,
+        date_col: str = 'Date',
+        close_col: str = 'Close',
+        index_col: str | None = None,
+        date_format: str | None = None,
+        chunk_rows: int = 100_000,
+    ):
         self.uploaded_file = uploaded_file
         self.date_col = date_col
         self.close_col = close_col
+        self.index_col = index_col or None
+        self.date_format = date_format or None
+        self.chunk_rows = int(chunk_rows)
 
-    def fetch_history(self, index_id: str, start_date=None, end_date=None, series_type: str = 'TRI') -> ProviderResult:
-        df = pd.read_csv(self.uploaded_file)
-        if self.date_col not in df.columns or self.close_col not in df.columns:
-            raise ValueError(
-                f"CSV must contain {self.date_col!r} and {self.close_col!r}. Found: {list(df.columns)}"
+    def _reader(self):
+        if hasattr(self.uploaded_file, 'seek'):
+            self.uploaded_file.seek(0)
+        wanted = [self.date_col, self.close_col] + ([self.index_col] if self.index_col else [])
+        try:
+            return pd.read_csv(
+                self.uploaded_file,
+                usecols=wanted,
+                dtype={c: str for c in wanted if c != self.close_col},
+                chunksize=self.chunk_rows,
+                skipinitialspace=True,
+                thousands=',',
             )
-        dfx = df[[self.date_col, self.close_col]].copy()
-        dfx.columns = ['date', 'close']
-        dfx['date'] = pd.to_datetime(dfx['date']).dt.date.astype(str)
-        dfx['close'] = dfx['close'].astype(float)
-        dfx = dfx.dropna().sort_values('date').reset_index(drop=True)
-        if start_date:
-            dfx = dfx[dfx['date'] >= str(start_date)]
-        if end_date:
-            dfx = dfx[dfx['date'] <= str(end_date)]
-        return ProviderResult(df=dfx, source_id=self.id, series_type=series_type, notes='Loaded from uploaded CSV')
+        except ValueError as e:
+            if hasattr(self.uploaded_file, 'seek'):
+                self.uploaded_file.seek(0)
+            header = pd.read_csv(self.uploaded_file, nrows=0).columns.tolist()
+            missing = [c for c in wanted if c not in header]
+            if missing:
+                raise ValueError(f'CSV must contain {missing!r}. Found: {header}') from e
+            raise
+
+    def _parse_dates(self, raw: pd.Series) -> np.ndarray:
+        if self.date_format is None:
+            self.date_format = detect_date_format(raw)
+        raw = raw.str.strip()
+        parsed = pd.to_datetime(raw, format=self.date_format, errors='coerce')
+        bad = parsed.isna() & raw.notna() & (raw != '')
+        if bad.any():
+            raise ValueError(f'Date {raw[bad].iloc[0]!r} does not match format {self.date_format!r}')
+        return parsed.to_numpy(dtype='datetime64[D]')
+
+    def iter_chunks(self, start_date=None, end_date=None):
+        """Yield (index_id, date/close frame) per series per chunk; index_id is None for wide files."""
+        lo = np.datetime64(pd.Timestamp(start_date).date(), 'D') if start_date else None
+        hi = np.datetime64(pd.Timestamp(end_date).date(), 'D') if end_date else None
+        for chunk in self._reader():
+            days = self._parse_dates(chunk[self.date_col])
+            closes = pd.to_numeric(chunk[self.close_col], errors='coerce').to_numpy(dtype=float)
+            keep = ~np.isnat(days) & np.isfinite(closes)
+            if lo is not None:
+                keep &= days >= lo
+            if hi is not None:
+                keep &= days <= hi
+            frame = pd.DataFrame({'date': days[keep].astype(str), 'close': closes[keep]})
+            if self.index_col is None:
+                if len(frame):
+                    yield None, frame
+                continue
+            ids = chunk[self.index_col].to_numpy(dtype=object)[keep]
+            for index_id, rows in frame.groupby(pd.Series(ids).str.strip().to_numpy(), sort=False):
+                yield index_id, rows.reset_index(drop=True)
+
+    @traced()
+    def fetch_history(self, index_id: str, start_date=None, end_date=None, series_type: str = 'TRI') -> ProviderResult:
+        """One series in memory: the whole file if wide, else only index_id's rows."""
+        pieces = [
+            df for key, df in self.iter_chunks(start_date, end_date)
+            if self.index_col is None or key == index_id
+        ]
+        if pieces:
+            dfx = pd.concat(pieces, ignore_index=True)
+        else:
+            dfx = pd.DataFrame({'date': pd.Series(dtype=str), 'close': pd.Series(dtype=float)})
+        dfx = dfx.drop_duplicates('date', keep='last').sort_values('date').reset_index(drop=True)
+        return ProviderResult(df=dfx, source_id=self.id, series_type=series_type, notes=f'Loaded from uploaded CSV (dates as {self.date_format})')
 
     def fetch_latest(self, index_id: str, series_type: str = 'TRI') -> ProviderResult:
         return self.fetch_history(index_id, None, None, series_type)
+
+    def list_indices(self) -> dict[str, int]:
+        """Rows per index_col value in a long file, from one streaming pass."""
+        if self.index_col is None:
+            raise ValueError('list_indices needs index_col')
+        counts: dict[str, int] = {}
+        for index_id, df in self.iter_chunks():
+            counts[index_id] = counts.get(index_id, 0) + len(df)
+        return counts
+
+    @traced()
+    def ingest(self, cache, series_type: str, index_id: str | None = None, start_date=None, end_date=None) -> dict[str, UpsertStats]:
+        """Stream the file into cache chunk by chunk; returns upsert stats per index_id.
+
+        Wide files are written under index_id. In long files index_id, if given,
+        restricts the load to that one series.
+        """
+        if self.index_col is None and not index_id:
+            raise ValueError('index_id is required for a single-series CSV')
+        totals: dict[str, UpsertStats] = {}
+        for key, df in self.iter_chunks(start_date, end_date):
+            target = index_id if key is None else key
+            if key is not None and index_id and key != index_id:
+                continue
+            stats = cache.upsert_prices(target, series_type, self.id, df)
+            total = totals.setdefault(target, UpsertStats())
+            total.inserted += stats.inserted
+            total.updated += stats.updated
+            total.unchanged += stats.unchanged
+        return totals
+
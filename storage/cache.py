@@ -1,44 +1,117 @@
 from __future__ import annotations
 
+import os
 import sqlite3
 import json
 import uuid
 from datetime import datetime, timezone
 
+import numpy as np
 import pandas as pd
 
+from core.tracing import traced
+from storage.ingest import UpsertStats, chunks, diff_prices, price_columns
+from storage.ledger_codec import LEDGER_COLUMNS, decode_ledger, encode_ledger
+from storage.price_store import PriceStore, as_series
+from storage.result_cache import forget_memory_results
+from storage.sqlite_pool import get_pool
+
 
 def utc_now_iso() -> str:
     return datetime.now(timezone.utc).replace(microsecond=0).isoformat()
 
 
 class LocalCache:
-    def __init__(self, db_path: str):
+    """SQLite cache; connections come from the shared WAL-mode pool for db_path.
+
+    With price_store_dir set, every series is also kept as a memory-mapped
+    binary file (see PriceStore). Upserts only move the catalog stamp; the
+    file is rebuilt from SQLite on the first read that finds it out of date,
+    so a many-chunk ingest rewrites it once rather than per chunk.
+    """
+
+    def __init__(self, db_path: str, price_store_dir: str | None = None):
         self.db_path = db_path
+        self.pool = get_pool(db_path)
+        self.price_store = PriceStore(price_store_dir) if price_store_dir else None
 
     def connect(self):
-        return sqlite3.connect(self.db_path)
+        """Pooled read connection, as a context manager."""
+        return self.pool.read()
+
+    def write(self):
+        """Serialized write transaction, as a context manager."""
+        return self.pool.write()
 
     def init_db(self, schema_sql_path: str):
+        # The schema is idempotent, but only needs applying once per process
+        key = os.path.realpath(schema_sql_path)
+        if key in self.pool.schemas_applied:
+            return
         with open(schema_sql_path, 'r', encoding='utf-8') as f:
             schema = f.read()
-        with self.connect() as con:
-            con.executescript(schema)
-
-    def upsert_prices(self, index_id: str, series_type: str, source_id: str, df: pd.DataFrame):
-        dfx = df.copy()
-        dfx['date'] = pd.to_datetime(dfx['date']).dt.date.astype(str)
-        dfx = dfx.sort_values('date')
-        rows = [
-            (index_id, series_type, source_id, r['date'], float(r['close']), utc_now_iso())
-            for _, r in dfx.iterrows()
-        ]
-        with self.connect() as con:
-            con.executemany(
-                'INSERT OR REPLACE INTO prices(index_id, series_type, source_id, date, close, updated_at) VALUES(?,?,?,?,?,?)',
-                rows,
-            )
+        with self.write() as con:
+            statement = ''
+            for line in schema.splitlines(keepends=True):
+                statement += line
+                if sqlite3.complete_statement(statement):
+                    con.execute(statement)
+                    statement = ''
+        self.pool.schemas_applied.add(key)
+
+    @traced()
+    def upsert_prices(self, index_id: str, series_type: str, source_id: str, df: pd.DataFrame) -> UpsertStats:
+        """Write only new or changed dates; returns inserted/updated/unchanged counts.
+
+        The diff read, the writes, the catalog refresh and the result
+        invalidation share one write transaction, so a failed upsert leaves
+        nothing behind and a concurrent writer cannot land in between.
+        """
+        return self._write_prices(index_id, series_type, source_id, df, prune=False)
+
+    @traced()
+    def replace_prices(self, index_id: str, series_type: str, source_id: str, df: pd.DataFrame) -> UpsertStats:
+        """Make the stored series exactly df: upsert it and delete the dates df lacks (full mirror syncs)."""
+        return self._write_prices(index_id, series_type, source_id, df, prune=True)
+
+    def _write_prices(self, index_id: str, series_type: str, source_id: str, df: pd.DataFrame, prune: bool) -> UpsertStats:
+        dates, closes = price_columns(df)
+        if len(dates) == 0 and not prune:
+            return UpsertStats()
+        with self.write() as con:
+            sql = 'SELECT date, close FROM prices WHERE index_id=? AND series_type=? AND source_id=?'
+            params = (index_id, series_type, source_id)
+            if not prune:
+                sql += ' AND date BETWEEN ? AND ?'
+                params += (dates[0], dates[-1])
+            stored = pd.read_sql_query(sql, con, params=params)
+            new, changed = diff_prices(dates, closes, stored)
+            stats = UpsertStats(int(new.sum()), int(changed.sum()), int(len(dates) - new.sum() - changed.sum()))
+            gone = []
+            if prune and not stored.empty:
+                gone = sorted(set(stored['date'].astype(str)) - set(dates.tolist()))
+                con.executemany(
+                    'DELETE FROM prices WHERE index_id=? AND series_type=? AND source_id=? AND date=?',
+                    [(index_id, series_type, source_id, d) for d in gone],
+                )
+            if not stats.written and not gone:
+                return stats
 
+            write = new | changed
+            dates, closes = dates[write].tolist(), closes[write].tolist()
+            now = utc_now_iso()
+            for part in chunks(len(dates)):
+                con.executemany(
+                    'INSERT INTO prices(index_id, series_type, source_id, date, close, updated_at) VALUES(?,?,?,?,?,?) '
+                    'ON CONFLICT(index_id, series_type, source_id, date) DO UPDATE SET close=excluded.close, updated_at=excluded.updated_at',
+                    [(index_id, series_type, source_id, d, c, now) for d, c in zip(dates[part], closes[part])],
+                )
+            self._refresh_catalog(con, index_id, series_type, source_id)
+            self._invalidate_results(con, index_id, series_type, source_id)
+        forget_memory_results(index_id, series_type, source_id)
+        return stats
+
+    @traced()
     def load_prices(self, index_id: str, series_type: str, source_id: str) -> pd.DataFrame:
         with self.connect() as con:
             df = pd.read_sql_query(
@@ -48,14 +121,84 @@ class LocalCache:
             )
         return df
 
+    @traced()
+    def load_price_series(self, index_id: str, series_type: str, source_id: str) -> pd.Series:
+        """Sorted, deduplicated close series; memory-mapped from the price store when enabled."""
+        if self.price_store is None:
+            dates, closes = price_columns(self.load_prices(index_id, series_type, source_id))
+            return as_series(dates.astype('datetime64[D]'), closes)
+        with self.connect() as con:
+            stamp = self._catalog_stamp(con, index_id, series_type, source_id)
+        if stamp is None:
+            return as_series(np.empty(0, dtype=np.int32), np.empty(0))
+        arrays = self.price_store.open(index_id, series_type, source_id, stamp)
+        if arrays is None:
+            arrays = self._build_price_store(index_id, series_type, source_id)
+        return as_series(*arrays)
+
+    def _catalog_stamp(self, con, index_id: str, series_type: str, source_id: str) -> dict | None:
+        row = con.execute(
+            'SELECT n_rows, first_date, last_date, last_updated_at, version FROM series_catalog '
+            'WHERE index_id=? AND series_type=? AND source_id=?',
+            (index_id, series_type, source_id),
+        ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(('n_rows', 'first_date', 'last_date', 'last_updated_at', 'version'), row))
+
+    def _build_price_store(self, index_id: str, series_type: str, source_id: str) -> tuple[np.ndarray, np.ndarray]:
+        # Stamp first: a write landing in between leaves the file looking stale, never falsely fresh
+        with self.connect() as con:
+            stamp = self._catalog_stamp(con, index_id, series_type, source_id)
+            df = pd.read_sql_query(
+                'SELECT date, close FROM prices WHERE index_id=? AND series_type=? AND source_id=? ORDER BY date ASC',
+                con,
+                params=(index_id, series_type, source_id),
+            )
+        dates, closes = price_columns(df)
+        if stamp is None:
+            self.price_store.discard(index_id, series_type, source_id)
+        else:
+            self.price_store.write(index_id, series_type, source_id, dates, closes, stamp)
+        return dates.astype('datetime64[D]').astype(np.int32), closes
+
     def list_sources_for_index(self, index_id: str, series_type: str) -> list[str]:
         with self.connect() as con:
             cur = con.execute(
-                'SELECT DISTINCT source_id FROM prices WHERE index_id=? AND series_type=? ORDER BY source_id ASC',
+                'SELECT source_id FROM series_catalog WHERE index_id=? AND series_type=? ORDER BY source_id ASC',
                 (index_id, series_type),
             )
             return [r[0] for r in cur.fetchall()]
 
+    @traced()
+    def list_catalog(self) -> pd.DataFrame:
+        """Every cached series with row count, first/last date, last update and write version, in one query."""
+        with self.connect() as con:
+            return pd.read_sql_query(
+                'SELECT index_id, series_type, source_id, n_rows, first_date, last_date, last_updated_at, version '
+                'FROM series_catalog ORDER BY index_id, series_type, source_id',
+                con,
+            )
+
+    def _refresh_catalog(self, con, index_id: str, series_type: str, source_id: str):
+        # Aggregate over one series' primary-key range, inside the writing transaction
+        con.execute(
+            'INSERT INTO series_catalog(index_id, series_type, source_id, n_rows, first_date, last_date, last_updated_at) '
+            'SELECT index_id, series_type, source_id, COUNT(*), MIN(date), MAX(date), MAX(updated_at) FROM prices '
+            'WHERE index_id=? AND series_type=? AND source_id=? GROUP BY index_id, series_type, source_id '
+            'ON CONFLICT(index_id, series_type, source_id) DO UPDATE SET n_rows=excluded.n_rows, '
+            'first_date=excluded.first_date, last_date=excluded.last_date, last_updated_at=excluded.last_updated_at, '
+            'version=series_catalog.version + 1',
+            (index_id, series_type, source_id),
+        )
+        # A replace can leave no rows at all
+        con.execute(
+            'DELETE FROM series_catalog WHERE index_id=? AND series_type=? AND source_id=? AND NOT EXISTS '
+            '(SELECT 1 FROM prices WHERE index_id=? AND series_type=? AND source_id=?)',
+            (index_id, series_type, source_id) * 2,
+        )
+
+    @traced()
     def save_run(
         self,
         index_id: str,
@@ -69,21 +212,16 @@ class LocalCache:
     ) -> str:
         run_id = str(uuid.uuid4())
         created_at = utc_now_iso()
-        with self.connect() as con:
+        span = (str(ledger['date'].iloc[0]), str(ledger['date'].iloc[-1])) if len(ledger) else (None, None)
+        with self.write() as con:
             con.execute(
                 'INSERT INTO runs(run_id, created_at, index_id, series_type, source_id, strategy_id, plan_json, params_json, summary_json) VALUES(?,?,?,?,?,?,?,?,?)',
                 (run_id, created_at, index_id, series_type, source_id, strategy_id,
                  json.dumps(plan), json.dumps(params), json.dumps(summary)),
             )
-            con.executemany(
-                'INSERT OR REPLACE INTO ledgers(run_id, date, price, rolling_high, drawdown_pct, contribution, sip_buy, dip_base_buy, dip_trigger_buy, dip_cash, sip_value, dip_value) VALUES(?,?,?,?,?,?,?,?,?,?,?,?)',
-                [
-                    (run_id, r['date'], float(r['price']), float(r['rolling_high']),
-                     float(r['drawdown_pct']), float(r['contribution']), float(r['sip_buy']),
-                     float(r['dip_base_buy']), float(r['dip_trigger_buy']), float(r['dip_cash']),
-                     float(r['sip_value']), float(r['dip_value']))
-                    for _, r in ledger.iterrows()
-                ],
+            con.execute(
+                'INSERT OR REPLACE INTO ledger_blobs(run_id, n_rows, start_date, end_date, payload) VALUES(?,?,?,?,?)',
+                (run_id, len(ledger), *span, sqlite3.Binary(encode_ledger(ledger))),
             )
         return run_id
 
@@ -92,11 +230,77 @@ class LocalCache:
             row = con.execute('SELECT summary_json FROM runs WHERE run_id=?', (run_id,)).fetchone()
         return json.loads(row[0]) if row else {}
 
-    def load_ledger(self, run_id: str) -> pd.DataFrame:
+    @traced()
+    def load_ledger(
+        self,
+        run_id: str,
+        columns: list[str] | None = None,
+        start_date: str | None = None,
+        end_date: str | None = None,
+    ) -> pd.DataFrame:
+        """Saved ledger, optionally only some columns and an inclusive date range."""
         with self.connect() as con:
-            df = pd.read_sql_query(
-                'SELECT date, price, rolling_high, drawdown_pct, contribution, sip_buy, dip_base_buy, dip_trigger_buy, dip_cash, sip_value, dip_value FROM ledgers WHERE run_id=? ORDER BY date ASC',
-                con,
-                params=(run_id,),
-            )
+            row = con.execute('SELECT payload FROM ledger_blobs WHERE run_id=?', (run_id,)).fetchone()
+            if row is not None:
+                return decode_ledger(bytes(row[0]), columns, start_date, end_date)
+            # Runs saved in the old row-per-day format
+            cols = [c for c in LEDGER_COLUMNS if c == 'date' or columns is None or c in columns]
+            sql = f"SELECT {', '.join(cols)} FROM ledgers WHERE run_id=?"
+            params = [run_id]
+            if start_date is not None:
+                sql += ' AND date >= ?'
+                params.append(str(pd.Timestamp(start_date).date()))
+            if end_date is not None:
+                sql += ' AND date <= ?'
+                params.append(str(pd.Timestamp(end_date).date()))
+            df = pd.read_sql_query(sql + ' ORDER BY date ASC', con, params=params)
         return df
+
+    # ---- memoized backtest results (see storage.result_cache) ----
+
+    def _invalidate_results(self, con, index_id: str, series_type: str, source_id: str):
+        con.execute(
+            'DELETE FROM backtest_results WHERE index_id=? AND series_type=? AND source_id=?',
+            (index_id, series_type, source_id),
+        )
+
+    @traced()
+    def load_result(self, result_key: str) -> bytes | None:
+        with self.connect() as con:
+            row = con.execute('SELECT payload FROM backtest_results WHERE result_key=?', (result_key,)).fetchone()
+        if row is None:
+            return None
+        with self.write() as con:
+            con.execute('UPDATE backtest_results SET last_used_at=? WHERE result_key=?', (utc_now_iso(), result_key))
+        return bytes(row[0])
+
+    @traced()
+    def save_result(
+        self,
+        result_key: str,
+        index_id: str,
+        series_type: str,
+        source_id: str,
+        payload: bytes,
+        max_total_bytes: int,
+    ):
+        now = utc_now_iso()
+        with self.write() as con:
+            con.execute(
+                'INSERT OR REPLACE INTO backtest_results(result_key, index_id, series_type, source_id, created_at, last_used_at, size_bytes, payload) VALUES(?,?,?,?,?,?,?,?)',
+                (result_key, index_id, series_type, source_id, now, now, len(payload), sqlite3.Binary(payload)),
+            )
+            # Size-based eviction, least recently used first
+            total = con.execute('SELECT COALESCE(SUM(size_bytes), 0) FROM backtest_results').fetchone()[0]
+            if total > max_total_bytes:
+                cur = con.execute(
+                    'SELECT result_key, size_bytes FROM backtest_results WHERE result_key<>? ORDER BY last_used_at ASC',
+                    (result_key,),
+                )
+                doomed = []
+                for key, size in cur.fetchall():
+                    if total <= max_total_bytes:
+                        break
+                    doomed.append((key,))
+                    total -= size
+                con.executemany('DELETE FROM backtest_results WHERE result_key=?', doomed)
@@ -3,24 +3,46 @@ from __future__ import annotations
 import os
 import streamlit as st
 
+# One TieredCache per (Supabase URL, mirror path), so its memory tier and
+# catalog TTL survive Streamlit reruns
+_TIERED: dict = {}
 
-def get_cache(db_path: str = './data/cache.sqlite'):
+
+def get_cache(db_path: str = './data/cache.sqlite', tiered: bool = True, price_store_dir: str | None = None):
     """Factory: returns SupabaseCache if SUPABASE_URL exists in secrets, else LocalCache.
     
     This allows:
     - Local development: uses SQLite (fast, no internet)
     - Online Streamlit Cloud: uses Supabase (persistent, shared)
+
+    With tiered=True (the default) the Supabase store comes wrapped in a
+    TieredCache that mirrors prices into the SQLite file at db_path.
+    price_store_dir enables the memory-mapped price store on the SQLite side.
     """
     
     # Check if running on Streamlit Cloud with Supabase configured
     if 'SUPABASE_URL' in st.secrets and 'SUPABASE_KEY' in st.secrets:
         from storage.supabase_cache import SupabaseCache
-        return SupabaseCache(
-            supabase_url=st.secrets['SUPABASE_URL'],
-            supabase_key=st.secrets['SUPABASE_KEY'],
-        )
+        if not tiered:
+            return SupabaseCache(
+                supabase_url=st.secrets['SUPABASE_URL'],
+                supabase_key=st.secrets['SUPABASE_KEY'],
+            )
+        key = (st.secrets['SUPABASE_URL'], os.path.realpath(db_path), price_store_dir)
+        if key not in _TIERED:
+            from storage.cache import LocalCache
+            from storage.tiered_cache import TieredCache
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+            _TIERED[key] = TieredCache(
+                SupabaseCache(
+                    supabase_url=st.secrets['SUPABASE_URL'],
+                    supabase_key=st.secrets['SUPABASE_KEY'],
+                ),
+                LocalCache(db_path, price_store_dir),
+            )
+        return _TIERED[key]
     
     # Fall back to local SQLite
     from storage.cache import LocalCache
     os.makedirs(os.path.dirname(db_path), exist_ok=True)
-    return LocalCache(db_path)
+    return LocalCache(db_path, price_store_dir)
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+# Rows per executemany batch (LocalCache) or per request (Supabase)
+CHUNK_ROWS = 5000
+
+
+@dataclass
+class UpsertStats:
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+
+    @property
+    def written(self) -> int:
+        return self.inserted + self.updated
+
+    def __str__(self) -> str:
+        return f'{self.inserted} inserted, {self.updated} updated, {self.unchanged} unchanged'
+
+
+def price_columns(df: pd.DataFrame) -> tuple[np.ndarray, np.ndarray]:
+    """(dates as 'YYYY-MM-DD' strings, closes) from a date/close frame, column-wise.
+
+    Rows without a close are dropped; a repeated date keeps its last row.
+    """
+    dates = pd.to_datetime(df['date']).to_numpy(dtype='datetime64[D]')
+    closes = pd.to_numeric(df['close'], errors='coerce').to_numpy(dtype=float)
+    ok = ~np.isnat(dates) & np.isfinite(closes)
+    dates, closes = dates[ok], closes[ok]
+    order = np.argsort(dates, kind='stable')
+    dates, closes = dates[order], closes[order]
+    last = np.r_[dates[1:] != dates[:-1], True]
+    return dates[last].astype(str), closes[last]
+
+
+def diff_prices(
+    dates: np.ndarray,
+    closes: np.ndarray,
+    stored: pd.DataFrame,
+    rtol: float = 1e-12,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Masks (new, changed) of incoming rows against stored date/close rows."""
+    if stored is None or stored.empty:
+        return np.ones(len(dates), dtype=bool), np.zeros(len(dates), dtype=bool)
+    stored_dates = pd.Index(pd.to_datetime(stored['date']).dt.strftime('%Y-%m-%d'))
+    pos = stored_dates.get_indexer(dates)
+    new = pos < 0
+    old = pd.to_numeric(stored['close'], errors='coerce').to_numpy(dtype=float)[np.where(new, 0, pos)]
+    changed = ~new & ~np.isclose(closes, old, rtol=rtol, atol=0.0)
+    return new, changed
+
+
+def chunks(n: int, size: int = CHUNK_ROWS):
+    for start in range(0, n, size):
+        yield slice(start, min(start + size, n))
@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import base64
+import io
+
+import numpy as np
+import pandas as pd
+
+LEDGER_COLUMNS = [
+    'date', 'price', 'rolling_high', 'drawdown_pct', 'contribution', 'sip_buy',
+    'dip_base_buy', 'dip_trigger_buy', 'dip_cash', 'sip_value', 'dip_value',
+]
+
+
+def encode_ledger(ledger: pd.DataFrame) -> bytes:
+    """One compressed npz blob per ledger: int32 epoch days plus one float64 array per column.
+
+    npz members are compressed separately, so decode_ledger only inflates the
+    columns it is asked for.
+    """
+    days = pd.to_datetime(ledger['date']).to_numpy(dtype='datetime64[D]').astype(np.int32)
+    arrays = {'date': days}
+    for col in ledger.columns:
+        if col != 'date':
+            arrays[col] = ledger[col].to_numpy(dtype=float)
+    buf = io.BytesIO()
+    np.savez_compressed(buf, **arrays)
+    return buf.getvalue()
+
+
+def decode_ledger(
+    payload: bytes,
+    columns: list[str] | None = None,
+    start_date: str | None = None,
+    end_date: str | None = None,
+) -> pd.DataFrame:
+    """Ledger frame from an encode_ledger blob, limited to columns and an inclusive date range."""
+    with np.load(io.BytesIO(payload)) as npz:
+        available = [name for name in npz.files if name != 'date']
+        wanted = available if columns is None else [c for c in columns if c in available]
+        days = npz['date']
+        lo, hi = 0, len(days)
+        if start_date is not None:
+            lo = int(np.searchsorted(days, _epoch_day(start_date), side='left'))
+        if end_date is not None:
+            hi = int(np.searchsorted(days, _epoch_day(end_date), side='right'))
+        data = {'date': days[lo:hi].astype('datetime64[D]').astype(str)}
+        for col in wanted:
+            data[col] = npz[col][lo:hi]
+    return pd.DataFrame(data)
+
+
+def _epoch_day(value) -> int:
+    return int(np.datetime64(pd.Timestamp(value).date(), 'D').astype(np.int64))
+
+
+def to_text(payload: bytes) -> str:
+    """Base64 form for backends that store the blob in a text column (Supabase)."""
+    return base64.b64encode(payload).decode('ascii')
+
+
+def from_text(text: str) -> bytes:
+    return base64.b64decode(text)
@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import threading
+
+import numpy as np
+import pandas as pd
+
+from core.tracing import traced
+
+MAGIC = b'DSPRICE1'
+# magic, row count, then the catalog stamp as JSON, zero-padded
+HEADER_BYTES = 256
+
+
+def _stamp_json(stamp: dict) -> bytes:
+    return json.dumps({k: str(v) for k, v in sorted(stamp.items())}).encode('utf-8')
+
+
+def as_series(days: np.ndarray, closes: np.ndarray) -> pd.Series:
+    """Close series over epoch days, as normalize_price_series would return it; closes are not copied."""
+    index = pd.DatetimeIndex(np.asarray(days).astype('datetime64[D]').astype('datetime64[ns]'))
+    return pd.Series(closes, index=index, copy=False)
+
+
+class PriceStore:
+    """Memory-mapped binary copies of cached price series, one file per series.
+
+    A file holds a 256-byte header (magic, row count, the series_catalog stamp
+    it was built from) followed by sorted, deduplicated int32 epoch days and,
+    8-byte aligned, float64 closes. Files are replaced atomically, so a reader
+    never sees half a write. The database stays the source of truth: open()
+    only returns arrays whose stamp matches the catalog row it is given, and
+    callers rebuild the file otherwise. The directory is created on the
+    first write.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.counts = {'hits': 0, 'stale': 0, 'writes': 0}
+
+    def path(self, index_id: str, series_type: str, source_id: str) -> str:
+        name = f'{index_id}__{series_type}__{source_id}'
+        digest = hashlib.blake2b(name.encode('utf-8'), digest_size=4).hexdigest()
+        return os.path.join(self.root, f"{re.sub(r'[^A-Za-z0-9_.-]', '_', name)}-{digest}.bin")
+
+    @traced()
+    def write(self, index_id: str, series_type: str, source_id: str, dates: np.ndarray, closes: np.ndarray, stamp: dict) -> str:
+        """Store 'YYYY-MM-DD' dates (sorted, unique, as price_columns returns them) and closes."""
+        days = np.asarray(dates, dtype='datetime64[D]').astype(np.int32)
+        closes = np.ascontiguousarray(closes, dtype=np.float64)
+        meta = _stamp_json(stamp)
+        if len(meta) > HEADER_BYTES - 16:
+            raise ValueError('Catalog stamp does not fit the price store header')
+        header = MAGIC + np.uint64(len(days)).tobytes() + meta
+        days_bytes = days.tobytes()
+        path = self.path(index_id, series_type, source_id)
+        os.makedirs(self.root, exist_ok=True)
+        tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(header.ljust(HEADER_BYTES, b'\0'))
+            f.write(days_bytes)
+            f.write(b'\0' * (-len(days_bytes) % 8))
+            f.write(closes.tobytes())
+        os.replace(tmp, path)
+        self.counts['writes'] += 1
+        return path
+
+    @traced()
+    def open(self, index_id: str, series_type: str, source_id: str, stamp: dict) -> tuple[np.ndarray, np.ndarray] | None:
+        """(days, closes) read-only memmaps, or None if the file is missing or built from another stamp."""
+        path = self.path(index_id, series_type, source_id)
+        try:
+            f = open(path, 'rb')
+        except OSError:
+            return None
+        # Header and both maps come from one handle, so a concurrent os.replace
+        # cannot pair this header with another file's data
+        with f:
+            header = f.read(HEADER_BYTES)
+            if len(header) < HEADER_BYTES or header[:8] != MAGIC or header[16:].rstrip(b'\0') != _stamp_json(stamp):
+                self.counts['stale'] += 1
+                return None
+            n = int(np.frombuffer(header[8:16], dtype=np.uint64)[0])
+            closes_at = HEADER_BYTES + 4 * n + (-4 * n % 8)
+            if os.fstat(f.fileno()).st_size < closes_at + 8 * n:
+                self.counts['stale'] += 1
+                return None
+            self.counts['hits'] += 1
+            if n == 0:
+                return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float64)
+            days = np.memmap(f, dtype=np.int32, mode='r', offset=HEADER_BYTES, shape=(n,))
+            closes = np.memmap(f, dtype=np.float64, mode='r', offset=closes_at, shape=(n,))
+        return days, closes
+
+    def discard(self, index_id: str, series_type: str, source_id: str):
+        try:
+            os.remove(self.path(index_id, series_type, source_id))
+        except OSError:
+            pass
+
+    def stats(self) -> dict:
+        try:
+            files = [n for n in os.listdir(self.root) if n.endswith('.bin')]
+        except FileNotFoundError:
+            files = []
+        size = sum(os.path.getsize(os.path.join(self.root, n)) for n in files)
+        return {'files': len(files), 'bytes': size, **self.counts}
@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import dataclasses
+import hashlib
+import json
+import pickle
+import threading
+import zlib
+from collections import OrderedDict
+
+import pandas as pd
+
+from core.engine import run_backtest
+from core.features import series_fingerprint
+from core.models import BacktestSummary
+from core.tracing import traced
+
+# Process-wide memory tier, shared by every Streamlit session and rerun
+_MEMORY: OrderedDict = OrderedDict()
+_MEMORY_LOCK = threading.Lock()
+_MEMORY_BYTES = 0
+_COUNTS = {'hits': 0, 'disk_hits': 0, 'misses': 0}
+_SERIES_VERSIONS: dict = {}
+
+
+def result_key(prices: pd.Series, **backtest_kwargs) -> str:
+    """Hash of the series content plus every run_backtest argument."""
+    params = {}
+    for k, v in sorted(backtest_kwargs.items()):
+        if isinstance(v, (list, tuple)):
+            v = [float(x) for x in v]
+        elif isinstance(v, bool) or v is None or isinstance(v, str):
+            pass
+        else:
+            v = float(v)
+        params[k] = v
+    blob = series_fingerprint(prices) + json.dumps(params, sort_keys=True)
+    return hashlib.sha256(blob.encode('utf-8')).hexdigest()
+
+
+def encode_result(summary: BacktestSummary, ledger: pd.DataFrame) -> bytes:
+    return zlib.compress(pickle.dumps((summary.__dict__, ledger), protocol=pickle.HIGHEST_PROTOCOL), 3)
+
+
+def decode_result(payload: bytes) -> tuple[BacktestSummary, pd.DataFrame]:
+    summary, ledger = pickle.loads(zlib.decompress(payload))
+    return BacktestSummary(**summary), ledger
+
+
+def _count(name: str):
+    with _MEMORY_LOCK:
+        _COUNTS[name] += 1
+
+
+def _frame_bytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+def series_version(index_id: str, series_type: str, source_id: str) -> int:
+    """Counter bumped whenever this process writes the series; lets callers key caches on it."""
+    return _SERIES_VERSIONS.get((index_id, series_type, source_id), 0)
+
+
+def forget_memory_results(index_id: str, series_type: str, source_id: str):
+    """Drop memory-tier entries for one series; called when its prices change."""
+    global _MEMORY_BYTES
+    tag = (index_id, series_type, source_id)
+    with _MEMORY_LOCK:
+        _SERIES_VERSIONS[tag] = _SERIES_VERSIONS.get(tag, 0) + 1
+        for key in [k for k, v in _MEMORY.items() if v[3] == tag]:
+            _MEMORY_BYTES -= _MEMORY.pop(key)[2]
+
+
+class ResultCache:
+    """Memoized run_backtest results.
+
+    Recent results live in a process-wide memory LRU; when the storage backend
+    supports it (LocalCache) they also spill to the backtest_results table,
+    which is evicted by total payload size. Keys hash the series content and all
+    run_backtest arguments, and upsert_prices drops a series' results from both
+    tiers. Callers get their own copy of the summary and ledger, so editing
+    one never changes the cached entry.
+    """
+
+    def __init__(self, cache=None, max_memory_bytes: int = 128 * 1024 * 1024, max_disk_bytes: int = 256 * 1024 * 1024):
+        self.cache = cache
+        self.max_memory_bytes = int(max_memory_bytes)
+        self.max_disk_bytes = int(max_disk_bytes)
+
+    @property
+    def _has_disk(self) -> bool:
+        return self.cache is not None and hasattr(self.cache, 'load_result')
+
+    def _remember(self, key: str, summary: BacktestSummary, ledger: pd.DataFrame, nbytes: int, tag: tuple):
+        global _MEMORY_BYTES
+        with _MEMORY_LOCK:
+            if key in _MEMORY:
+                _MEMORY_BYTES -= _MEMORY.pop(key)[2]
+            _MEMORY[key] = (summary, ledger, nbytes, tag)
+            _MEMORY_BYTES += nbytes
+            while _MEMORY_BYTES > self.max_memory_bytes and len(_MEMORY) > 1:
+                _, evicted = _MEMORY.popitem(last=False)
+                _MEMORY_BYTES -= evicted[2]
+
+    @traced()
+    def run(
+        self,
+        prices: pd.Series,
+        index_id: str,
+        series_type: str,
+        source_id: str,
+        **backtest_kwargs,
+    ) -> tuple[BacktestSummary, pd.DataFrame]:
+        """run_backtest(prices, **backtest_kwargs), served from cache when possible."""
+        key = result_key(prices, **backtest_kwargs)
+        tag = (index_id, series_type, source_id)
+
+        with _MEMORY_LOCK:
+            hit = _MEMORY.get(key)
+            if hit is not None:
+                _MEMORY.move_to_end(key)
+        if hit is not None:
+            _count('hits')
+            return dataclasses.replace(hit[0]), hit[1].copy()
+
+        if self._has_disk:
+            payload = self.cache.load_result(key)
+            if payload is not None:
+                try:
+                    summary, ledger = decode_result(payload)
+                except Exception:
+                    summary = None
+                if summary is not None:
+                    _count('disk_hits')
+                    self._remember(key, summary, ledger, _frame_bytes(ledger), tag)
+                    return dataclasses.replace(summary), ledger.copy()
+
+        _count('misses')
+        summary, ledger = run_backtest(prices, **backtest_kwargs)
+        self._remember(key, summary, ledger, _frame_bytes(ledger), tag)
+        if self._has_disk:
+            self.cache.save_result(key, index_id, series_type, source_id, encode_result(summary, ledger), self.max_disk_bytes)
+        return dataclasses.replace(summary), ledger.copy()
+
+    def stats(self) -> dict:
+        with _MEMORY_LOCK:
+            return {'memory_entries': len(_MEMORY), 'memory_bytes': _MEMORY_BYTES, **_COUNTS}
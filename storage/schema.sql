@@ -13,6 +13,28 @@ CREATE TABLE IF NOT EXISTS prices (
 CREATE INDEX IF NOT EXISTS idx_prices_lookup
   ON prices(index_id, series_type, date);
 
+-- One row per cached series, kept current by LocalCache.upsert_prices
+CREATE TABLE IF NOT EXISTS series_catalog (
+  index_id        TEXT NOT NULL,
+  series_type     TEXT NOT NULL,
+  source_id       TEXT NOT NULL,
+  n_rows          INTEGER NOT NULL,
+  first_date      TEXT NOT NULL,
+  last_date       TEXT NOT NULL,
+  last_updated_at TEXT NOT NULL,
+  -- Bumped on every write, so readers notice a close-only rewrite within one
+  -- second of updated_at
+  version         INTEGER NOT NULL DEFAULT 1,
+  PRIMARY KEY (index_id, series_type, source_id)
+);
+
+-- Backfill caches created before series_catalog existed
+INSERT INTO series_catalog(index_id, series_type, source_id, n_rows, first_date, last_date, last_updated_at)
+SELECT index_id, series_type, source_id, COUNT(*), MIN(date), MAX(date), MAX(updated_at)
+FROM prices
+WHERE NOT EXISTS (SELECT 1 FROM series_catalog)
+GROUP BY index_id, series_type, source_id;
+
 CREATE TABLE IF NOT EXISTS runs (
   run_id       TEXT PRIMARY KEY,
   created_at   TEXT NOT NULL,
@@ -43,3 +65,40 @@ CREATE TABLE IF NOT EXISTS ledgers (
 
 CREATE INDEX IF NOT EXISTS idx_ledgers_run
   ON ledgers(run_id, date);
+
+-- One compressed columnar blob per run (storage/ledger_codec.py); runs saved
+-- before this table existed keep their rows in ledgers
+CREATE TABLE IF NOT EXISTS ledger_blobs (
+  run_id    TEXT PRIMARY KEY,
+  n_rows    INTEGER NOT NULL,
+  start_date TEXT,
+  end_date  TEXT,
+  payload   BLOB NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS backtest_results (
+  result_key   TEXT PRIMARY KEY,
+  index_id     TEXT NOT NULL,
+  series_type  TEXT NOT NULL,
+  source_id    TEXT NOT NULL,
+  created_at   TEXT NOT NULL,
+  last_used_at TEXT NOT NULL,
+  size_bytes   INTEGER NOT NULL,
+  payload      BLOB NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_backtest_results_series
+  ON backtest_results(index_id, series_type, source_id);
+
+-- Remote (Supabase) catalog stamp each series was last mirrored at, when
+-- this database is the local tier of storage.tiered_cache.TieredCache
+CREATE TABLE IF NOT EXISTS mirror_sync (
+  index_id          TEXT NOT NULL,
+  series_type       TEXT NOT NULL,
+  source_id         TEXT NOT NULL,
+  remote_rows       INTEGER NOT NULL,
+  remote_updated_at TEXT NOT NULL,
+  remote_version    INTEGER NOT NULL DEFAULT 0,
+  synced_at         TEXT NOT NULL,
+  PRIMARY KEY (index_id, series_type, source_id)
+);
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+PRAGMAS = (
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA mmap_size=268435456',
+    'PRAGMA cache_size=-65536',
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA busy_timeout=5000',
+)
+
+_POOLS: dict = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def _is_busy(exc: sqlite3.OperationalError) -> bool:
+    msg = str(exc).lower()
+    return 'locked' in msg or 'busy' in msg
+
+
+class SQLitePool:
+    """Thread-safe SQLite connections for one database file.
+
+    The database runs in WAL mode, so readers never block the writer or each
+    other. Readers borrow one of up to `size` pooled connections. All writes in
+    the process go through one writer connection behind a lock, each in a
+    BEGIN IMMEDIATE transaction that is retried with backoff while another
+    process holds the write lock.
+    """
+
+    def __init__(self, db_path: str, size: int = 4, write_retries: int = 8):
+        self.db_path = db_path
+        self.size = int(size)
+        self.write_retries = int(write_retries)
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._writer = None
+        self.schemas_applied: set = set()
+
+    def _open(self) -> sqlite3.Connection:
+        con = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None, timeout=5.0)
+        con.execute('PRAGMA journal_mode=WAL')
+        for pragma in PRAGMAS:
+            con.execute(pragma)
+        return con
+
+    @contextmanager
+    def read(self):
+        """Borrow a pooled connection (autocommit); waits if all are in use."""
+        try:
+            con = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                grow = self._created < self.size
+                if grow:
+                    self._created += 1
+            if grow:
+                try:
+                    con = self._open()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                con = self._idle.get()
+        try:
+            yield con
+        finally:
+            if con.in_transaction:
+                con.rollback()
+            self._idle.put(con)
+
+    @contextmanager
+    def write(self):
+        """Serialized write transaction; commits on success, rolls back on error."""
+        with self._write_lock:
+            if self._writer is None:
+                self._writer = self._open()
+            con = self._writer
+            delay = 0.05
+            for attempt in range(self.write_retries + 1):
+                try:
+                    con.execute('BEGIN IMMEDIATE')
+                    break
+                except sqlite3.OperationalError as exc:
+                    if not _is_busy(exc) or attempt == self.write_retries:
+                        raise
+                    time.sleep(delay)
+                    delay = min(delay * 2.0, 2.0)
+            try:
+                yield con
+            except BaseException:
+                con.rollback()
+                raise
+            con.commit()
+
+    def close(self):
+        with self._write_lock, self._lock:
+            while True:
+                try:
+                    self._idle.get_nowait().close()
+                except queue.Empty:
+                    break
+            self._created = 0
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+
+
+def get_pool(db_path: str) -> SQLitePool:
+    """Process-wide pool for db_path, shared across Streamlit sessions and reruns."""
+    key = os.path.realpath(db_path)
+    with _POOLS_LOCK:
+        pool = _POOLS.get(key)
+        if pool is None:
+            pool = _POOLS[key] = SQLitePool(db_path)
+        return pool
@@ -7,6 +7,12 @@ from datetime import datetime, timezone
 import pandas as pd
 from supabase import create_client, Client
 
+from core.tracing import traced
+from storage.ingest import UpsertStats, chunks, diff_prices, price_columns
+from storage.ledger_codec import LEDGER_COLUMNS, decode_ledger, encode_ledger, from_text, to_text
+from storage.result_cache import forget_memory_results
+from storage.supabase_pager import PostgrestSource, fetch_columns
+
 
 def utc_now_iso() -> str:
     return datetime.now(timezone.utc).replace(microsecond=0).isoformat()
@@ -25,53 +31,81 @@ class SupabaseCache:
         """
         pass
 
-    def upsert_prices(self, index_id: str, series_type: str, source_id: str, df: pd.DataFrame):
-        dfx = df.copy()
-        dfx['date'] = pd.to_datetime(dfx['date']).dt.date.astype(str)
-        dfx = dfx.sort_values('date')
-        
-        rows = [
-            {
-                'index_id': index_id,
-                'series_type': series_type,
-                'source_id': source_id,
-                'date': r['date'],
-                'close': float(r['close']),
-                'updated_at': utc_now_iso(),
-            }
-            for _, r in dfx.iterrows()
-        ]
-        
-        # Supabase upsert (on conflict do update)
-        self.client.table('prices').upsert(rows, on_conflict='index_id,series_type,source_id,date').execute()
-
+    def _prices_source(self, index_id: str, series_type: str, source_id: str, start=None, end=None) -> PostgrestSource:
+        eq = {'index_id': index_id, 'series_type': series_type, 'source_id': source_id}
+        return PostgrestSource(self.client, 'prices', eq, start, end)
+
+    @traced()
+    def upsert_prices(self, index_id: str, series_type: str, source_id: str, df: pd.DataFrame) -> UpsertStats:
+        """Write only new or changed dates; returns inserted/updated/unchanged counts."""
+        dates, closes = price_columns(df)
+        if len(dates) == 0:
+            return UpsertStats()
+        stored = fetch_columns(self._prices_source(index_id, series_type, source_id, dates[0], dates[-1]), ['close'])
+        new, changed = diff_prices(dates, closes, stored)
+        stats = UpsertStats(int(new.sum()), int(changed.sum()), int(len(dates) - new.sum() - changed.sum()))
+        if not stats.written:
+            return stats
+
+        write = new | changed
+        dates, closes = dates[write].tolist(), closes[write].tolist()
+        now = utc_now_iso()
+        # Supabase upsert (on conflict do update), one request per chunk
+        for part in chunks(len(dates), 1000):
+            rows = [
+                {
+                    'index_id': index_id,
+                    'series_type': series_type,
+                    'source_id': source_id,
+                    'date': d,
+                    'close': c,
+                    'updated_at': now,
+                }
+                for d, c in zip(dates[part], closes[part])
+            ]
+            self.client.table('prices').upsert(rows, on_conflict='index_id,series_type,source_id,date').execute()
+        forget_memory_results(index_id, series_type, source_id)
+        return stats
+
+    @traced()
     def load_prices(self, index_id: str, series_type: str, source_id: str) -> pd.DataFrame:
-        response = (
-            self.client.table('prices')
-            .select('date, close')
-            .eq('index_id', index_id)
-            .eq('series_type', series_type)
-            .eq('source_id', source_id)
-            .order('date')
-            .execute()
-        )
-        return pd.DataFrame(response.data)
+        # Keyset-paged, concurrent reads; one select would hit PostgREST's row cap
+        return fetch_columns(self._prices_source(index_id, series_type, source_id), ['close'])
+
+    @traced()
+    def load_prices_since(self, index_id: str, series_type: str, source_id: str, updated_after: str) -> pd.DataFrame:
+        """Rows written at or after updated_after; lets a local mirror catch up without a full pull."""
+        source = self._prices_source(index_id, series_type, source_id)
+        source.updated_after = updated_after
+        return fetch_columns(source, ['close'])
 
     def list_sources_for_index(self, index_id: str, series_type: str) -> list[str]:
-        # Case-insensitive query with ILIKE
+        # Exact, case-insensitive match on the (small) catalog; ILIKE would treat
+        # '_' in ids like NIFTY_IT as a wildcard
+        cat = self.list_catalog()
+        rows = cat[
+            (cat['index_id'].str.lower() == index_id.lower())
+            & (cat['series_type'].str.lower() == series_type.lower())
+        ]
+        return sorted(rows['source_id'].dropna().unique().tolist())
+
+    @traced()
+    def list_catalog(self) -> pd.DataFrame:
+        """Every cached series with row count, first/last date, last update and write version, in one request."""
+        cols = ['index_id', 'series_type', 'source_id', 'n_rows', 'first_date', 'last_date', 'last_updated_at', 'version']
         response = (
-            self.client.table('prices')
-            .select('source_id')
-            .ilike('index_id', f'%{index_id}%')  # Case-insensitive
-            .ilike('series_type', f'%{series_type}%')
+            self.client.table('series_catalog')
+            .select(', '.join(cols))
+            .order('index_id')
+            .order('series_type')
+            .order('source_id')
             .execute()
         )
-        
-        sources = list(set(r['source_id'] for r in response.data if r['source_id']))
-        return sorted(sources)
+        return pd.DataFrame(response.data, columns=cols)
 
 
 
+    @traced()
     def save_run(
         self,
         index_id: str,
@@ -99,30 +133,14 @@ class SupabaseCache:
             'summary_json': json.dumps(summary),
         }).execute()
         
-        # Insert ledger rows
-        ledger_rows = [
-            {
-                'run_id': run_id,
-                'date': r['date'],
-                'price': float(r['price']),
-                'rolling_high': float(r['rolling_high']),
-                'drawdown_pct': float(r['drawdown_pct']),
-                'contribution': float(r['contribution']),
-                'sip_buy': float(r['sip_buy']),
-                'dip_base_buy': float(r['dip_base_buy']),
-                'dip_trigger_buy': float(r['dip_trigger_buy']),
-                'dip_cash': float(r['dip_cash']),
-                'sip_value': float(r['sip_value']),
-                'dip_value': float(r['dip_value']),
-            }
-            for _, r in ledger.iterrows()
-        ]
-        
-        # Batch insert (Supabase allows up to 1000 rows per insert)
-        batch_size = 1000
-        for i in range(0, len(ledger_rows), batch_size):
-            batch = ledger_rows[i:i + batch_size]
-            self.client.table('ledgers').insert(batch).execute()
+        # Ledger as one compressed columnar blob
+        self.client.table('ledger_blobs').insert({
+            'run_id': run_id,
+            'n_rows': len(ledger),
+            'start_date': str(ledger['date'].iloc[0]) if len(ledger) else None,
+            'end_date': str(ledger['date'].iloc[-1]) if len(ledger) else None,
+            'payload': to_text(encode_ledger(ledger)),
+        }).execute()
         
         return run_id
 
@@ -137,12 +155,26 @@ class SupabaseCache:
             return json.loads(response.data[0]['summary_json'])
         return {}
 
-    def load_ledger(self, run_id: str) -> pd.DataFrame:
-        response = (
-            self.client.table('ledgers')
-            .select('date, price, rolling_high, drawdown_pct, contribution, sip_buy, dip_base_buy, dip_trigger_buy, dip_cash, sip_value, dip_value')
-            .eq('run_id', run_id)
-            .order('date')
-            .execute()
+    @traced()
+    def load_ledger(
+        self,
+        run_id: str,
+        columns: list[str] | None = None,
+        start_date: str | None = None,
+        end_date: str | None = None,
+    ) -> pd.DataFrame:
+        """Saved ledger, optionally only some columns and an inclusive date range."""
+        response = self.client.table('ledger_blobs').select('payload').eq('run_id', run_id).execute()
+        if response.data:
+            return decode_ledger(from_text(response.data[0]['payload']), columns, start_date, end_date)
+
+        # Runs saved in the old row-per-day format
+        cols = [c for c in LEDGER_COLUMNS if c != 'date' and (columns is None or c in columns)]
+        source = PostgrestSource(
+            self.client,
+            'ledgers',
+            {'run_id': run_id},
+            None if start_date is None else str(pd.Timestamp(start_date).date()),
+            None if end_date is None else str(pd.Timestamp(end_date).date()),
         )
-        return pd.DataFrame(response.data)
+        return fetch_columns(source, cols)
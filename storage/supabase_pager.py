@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# PostgREST's default max-rows; pages never ask for more
+PAGE_ROWS = 1000
+
+
+class PostgrestSource:
+    """Date-keyed reads of one filtered table through the supabase client.
+
+    start/end bound the dates (inclusive) on top of the equality filters, and
+    updated_after keeps only rows written at or after that timestamp (inclusive,
+    since updated_at has one-second resolution and rows can share the boundary
+    second). Every method
+    narrows the query to [lo, hi) on date; None means unbounded.
+    """
+
+    def __init__(
+        self,
+        client,
+        table: str,
+        eq: dict,
+        start: str | None = None,
+        end: str | None = None,
+        updated_after: str | None = None,
+    ):
+        self.client = client
+        self.table = table
+        self.eq = eq
+        self.start = start
+        self.end = end
+        self.updated_after = updated_after
+
+    def _query(self, columns: str, **select_kwargs):
+        query = self.client.table(self.table).select(columns, **select_kwargs)
+        for col, value in self.eq.items():
+            query = query.eq(col, value)
+        if self.start is not None:
+            query = query.gte('date', self.start)
+        if self.end is not None:
+            query = query.lte('date', self.end)
+        if self.updated_after is not None:
+            query = query.gte('updated_at', self.updated_after)
+        return query
+
+    def head(self, columns: list[str], limit: int) -> tuple[list[dict], int]:
+        """The first page and, from the same request, the total row count."""
+        res = self._query(', '.join(['date'] + columns), count='exact').order('date').limit(limit).execute()
+        return res.data, int(res.count or 0)
+
+    def bounds(self) -> tuple[str, str] | None:
+        first = self._query('date').order('date').limit(1).execute().data
+        if not first:
+            return None
+        last = self._query('date').order('date', desc=True).limit(1).execute().data
+        return first[0]['date'], last[0]['date']
+
+    def count(self, lo: str | None, hi: str | None) -> int:
+        query = self._query('date', count='exact', head=True)
+        if lo is not None:
+            query = query.gte('date', lo)
+        if hi is not None:
+            query = query.lt('date', hi)
+        return int(query.execute().count or 0)
+
+    def page(self, columns: list[str], lo: str | None, after: str | None, hi: str | None, limit: int) -> list[dict]:
+        query = self._query(', '.join(['date'] + columns))
+        if after is not None:
+            query = query.gt('date', after)
+        elif lo is not None:
+            query = query.gte('date', lo)
+        if hi is not None:
+            query = query.lt('date', hi)
+        return query.order('date').limit(limit).execute().data
+
+
+class FrameSource:
+    """In-memory stand-in for PostgrestSource, for exercising the pager without a server.
+
+    max_rows plays PostgREST's row cap; updated_after filters on an updated_at
+    column, which the frame must then have.
+    """
+
+    def __init__(self, df: pd.DataFrame, max_rows: int = PAGE_ROWS, updated_after: str | None = None):
+        self.df = df.sort_values('date', kind='stable').reset_index(drop=True)
+        self.max_rows = max_rows
+        self.updated_after = updated_after
+        self.requests = 0
+
+    def _rows(self) -> pd.DataFrame:
+        if self.updated_after is None:
+            return self.df
+        written = pd.to_datetime(self.df['updated_at'], utc=True)
+        return self.df[(written >= pd.to_datetime(self.updated_after, utc=True)).to_numpy()]
+
+    def _slice(self, lo, after, hi) -> pd.DataFrame:
+        self.requests += 1
+        df = self._rows()
+        dates = df['date']
+        mask = np.ones(len(dates), dtype=bool)
+        if after is not None:
+            mask &= (dates > after).to_numpy()
+        elif lo is not None:
+            mask &= (dates >= lo).to_numpy()
+        if hi is not None:
+            mask &= (dates < hi).to_numpy()
+        return df[mask]
+
+    def head(self, columns, limit) -> tuple[list[dict], int]:
+        rows = self._slice(None, None, None)
+        return rows.head(min(limit, self.max_rows))[['date'] + list(columns)].to_dict('records'), len(rows)
+
+    def bounds(self):
+        self.requests += 1
+        df = self._rows()
+        if df.empty:
+            return None
+        return df['date'].iloc[0], df['date'].iloc[-1]
+
+    def count(self, lo, hi) -> int:
+        return len(self._slice(lo, None, hi))
+
+    def page(self, columns, lo, after, hi, limit) -> list[dict]:
+        rows = self._slice(lo, after, hi).head(min(limit, self.max_rows))
+        return rows[['date'] + list(columns)].to_dict('records')
+
+
+def _split_dates(first: str, last: str, parts: int) -> list[str | None]:
+    """parts + 1 boundaries: None, evenly spaced calendar dates between first and last, None."""
+    lo, hi = pd.Timestamp(first), pd.Timestamp(last)
+    if parts <= 1 or hi <= lo:
+        return [None, None]
+    inner = pd.date_range(lo, hi, periods=parts + 1)[1:-1].strftime('%Y-%m-%d')
+    return [None, *sorted(set(inner)), None]
+
+
+def _next_day(day: str) -> str:
+    return (pd.Timestamp(day) + pd.Timedelta(days=1)).strftime('%Y-%m-%d')
+
+
+def fetch_columns(
+    source,
+    columns: list[str],
+    page_rows: int = PAGE_ROWS,
+    max_workers: int = 4,
+) -> pd.DataFrame:
+    """Read date + float columns through keyset pagination on date.
+
+    The first page is read together with the total row count; when it already
+    holds every row (most series), that one request is the whole read.
+    Otherwise the date range is split into up to max_workers calendar partitions. Each is
+    counted, so every partition owns a fixed slice of preallocated arrays, and
+    partitions page concurrently (date > last date seen) straight into their
+    slices. A page that may have been cut short leaves out its last date, so
+    the next page reads rows sharing a date together and none are skipped;
+    more rows on one date than fit a page is an error. If rows are written
+    concurrently and a count turns out stale, the pieces are stitched together
+    instead.
+    """
+    rows, total = source.head(columns, page_rows)
+    if not rows:
+        return pd.DataFrame({'date': pd.Series(dtype=str), **{c: pd.Series(dtype=float) for c in columns}})
+    if len(rows) >= total:
+        return pd.DataFrame({
+            'date': np.array([r['date'] for r in rows], dtype='U10'),
+            **{c: np.array([r[c] for r in rows], dtype=float) for c in columns},
+        })
+
+    bounds = source.bounds()
+    if bounds is None:
+        return pd.DataFrame({'date': pd.Series(dtype=str), **{c: pd.Series(dtype=float) for c in columns}})
+
+    edges = _split_dates(bounds[0], bounds[1], max_workers)
+    parts = list(zip(edges[:-1], edges[1:]))
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(parts)))) as pool:
+        counts = list(pool.map(lambda p: source.count(*p), parts))
+        offsets = np.r_[0, np.cumsum(counts)]
+        dates = np.empty(int(offsets[-1]), dtype='U10')
+        values = {c: np.empty(int(offsets[-1])) for c in columns}
+
+        def run(i: int):
+            lo, hi = parts[i]
+            start, stop = int(offsets[i]), int(offsets[i + 1])
+            pos, after, spill = start, None, []
+            while True:
+                rows = source.page(columns, lo, after, hi, page_rows)
+                if not rows:
+                    break
+                full = len(rows) >= page_rows
+                if full or pos + len(rows) < stop:
+                    last = rows[-1]['date']
+                    keep = len(rows)
+                    while keep and rows[keep - 1]['date'] == last:
+                        keep -= 1
+                    if keep:
+                        rows = rows[:keep]
+                    elif source.count(last, _next_day(last)) > len(rows):
+                        raise ValueError(f'More than {len(rows)} rows share the date {last}; cannot page by date')
+                take = min(len(rows), stop - pos)
+                if take:
+                    dates[pos:pos + take] = [r['date'] for r in rows[:take]]
+                    for c in columns:
+                        values[c][pos:pos + take] = [r[c] for r in rows[:take]]
+                    pos += take
+                spill.extend(rows[take:])
+                after = rows[-1]['date']
+                # A short page ends the partition unless the server capped it below page_rows
+                if not full and pos >= stop:
+                    break
+            return pos, spill
+
+        results = list(pool.map(run, range(len(parts))))
+
+    if all(pos == int(offsets[i + 1]) and not spill for i, (pos, spill) in enumerate(results)):
+        return pd.DataFrame({'date': dates, **values})
+    pieces = []
+    for i, (pos, spill) in enumerate(results):
+        part = slice(int(offsets[i]), pos)
+        pieces.append(pd.DataFrame({'date': dates[part], **{c: values[c][part] for c in columns}}))
+        if spill:
+            pieces.append(pd.DataFrame(spill, columns=['date'] + columns))
+    return pd.concat(pieces, ignore_index=True)
@@ -15,6 +15,79 @@ CREATE TABLE IF NOT EXISTS prices (
 CREATE INDEX IF NOT EXISTS idx_prices_lookup
   ON prices(index_id, series_type, date);
 
+-- Table: series_catalog (one row per cached series, maintained by the
+-- statement-level triggers below so readers never scan prices)
+CREATE TABLE IF NOT EXISTS series_catalog (
+  index_id        TEXT NOT NULL,
+  series_type     TEXT NOT NULL,
+  source_id       TEXT NOT NULL,
+  n_rows          INTEGER NOT NULL,
+  first_date      TEXT NOT NULL,
+  last_date       TEXT NOT NULL,
+  last_updated_at TIMESTAMPTZ NOT NULL,
+  -- Bumped on every write, so a mirror notices close-only changes that keep
+  -- n_rows and the second of last_updated_at
+  version         BIGINT NOT NULL DEFAULT 1,
+  PRIMARY KEY (index_id, series_type, source_id)
+);
+
+-- Recompute the catalog rows of the series a statement touched. A per-series
+-- advisory lock (held to commit) queues concurrent writers of one series, so
+-- each aggregate runs on a fresh snapshot that includes the previous writer's
+-- rows; the upsert never races another insert of the same key.
+CREATE OR REPLACE FUNCTION refresh_series_catalog() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+  PERFORM pg_advisory_xact_lock(hashtextextended(k.index_id || '|' || k.series_type || '|' || k.source_id, 0))
+  FROM (SELECT DISTINCT index_id, series_type, source_id FROM changed_rows ORDER BY 1, 2, 3) k;
+
+  INSERT INTO series_catalog(index_id, series_type, source_id, n_rows, first_date, last_date, last_updated_at)
+  SELECT p.index_id, p.series_type, p.source_id, COUNT(*), MIN(p.date), MAX(p.date), MAX(p.updated_at)
+  FROM prices p
+  JOIN (SELECT DISTINCT index_id, series_type, source_id FROM changed_rows) k
+    ON p.index_id = k.index_id AND p.series_type = k.series_type AND p.source_id = k.source_id
+  GROUP BY p.index_id, p.series_type, p.source_id
+  ON CONFLICT (index_id, series_type, source_id) DO UPDATE SET
+    n_rows = EXCLUDED.n_rows,
+    first_date = EXCLUDED.first_date,
+    last_date = EXCLUDED.last_date,
+    last_updated_at = EXCLUDED.last_updated_at,
+    version = series_catalog.version + 1;
+
+  -- Series whose last row was deleted
+  DELETE FROM series_catalog c
+  USING (SELECT DISTINCT index_id, series_type, source_id FROM changed_rows) k
+  WHERE c.index_id = k.index_id AND c.series_type = k.series_type AND c.source_id = k.source_id
+    AND NOT EXISTS (
+      SELECT 1 FROM prices p
+      WHERE p.index_id = k.index_id AND p.series_type = k.series_type AND p.source_id = k.source_id
+    );
+  RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS prices_catalog_insert ON prices;
+CREATE TRIGGER prices_catalog_insert AFTER INSERT ON prices
+  REFERENCING NEW TABLE AS changed_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION refresh_series_catalog();
+
+DROP TRIGGER IF EXISTS prices_catalog_update ON prices;
+CREATE TRIGGER prices_catalog_update AFTER UPDATE ON prices
+  REFERENCING NEW TABLE AS changed_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION refresh_series_catalog();
+
+DROP TRIGGER IF EXISTS prices_catalog_delete ON prices;
+CREATE TRIGGER prices_catalog_delete AFTER DELETE ON prices
+  REFERENCING OLD TABLE AS changed_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION refresh_series_catalog();
+
+-- Backfill series cached before series_catalog existed
+INSERT INTO series_catalog(index_id, series_type, source_id, n_rows, first_date, last_date, last_updated_at)
+SELECT index_id, series_type, source_id, COUNT(*), MIN(date), MAX(date), MAX(updated_at)
+FROM prices
+GROUP BY index_id, series_type, source_id
+ON CONFLICT (index_id, series_type, source_id) DO NOTHING;
+
 -- Table: runs (backtest run metadata)
 CREATE TABLE IF NOT EXISTS runs (
   run_id       TEXT PRIMARY KEY,
@@ -51,10 +124,22 @@ CREATE TABLE IF NOT EXISTS ledgers (
 CREATE INDEX IF NOT EXISTS idx_ledgers_run
   ON ledgers(run_id, date);
 
+-- Table: ledger_blobs (one compressed columnar ledger per run, base64 npz;
+-- runs saved before this table existed keep their rows in ledgers)
+CREATE TABLE IF NOT EXISTS ledger_blobs (
+  run_id     TEXT PRIMARY KEY REFERENCES runs(run_id) ON DELETE CASCADE,
+  n_rows     INTEGER NOT NULL,
+  start_date TEXT,
+  end_date   TEXT,
+  payload    TEXT NOT NULL
+);
+
 -- Optional: Enable Row Level Security (RLS) if you want per-user data isolation
 -- ALTER TABLE prices ENABLE ROW LEVEL SECURITY;
 -- ALTER TABLE runs ENABLE ROW LEVEL SECURITY;
 -- ALTER TABLE ledgers ENABLE ROW LEVEL SECURITY;
+-- ALTER TABLE ledger_blobs ENABLE ROW LEVEL SECURITY;
+-- ALTER TABLE series_catalog ENABLE ROW LEVEL SECURITY;
 
 -- Example RLS policy (adjust based on your auth setup):
 -- CREATE POLICY "Users can only see their own data"
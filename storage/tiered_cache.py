@@ -0,0 +1,212 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from core.tracing import traced
+from storage.cache import LocalCache, utc_now_iso
+from storage.price_store import as_series
+from storage.ingest import UpsertStats
+
+# Delta syncs re-read this much before the last synced updated_at, to cover
+# rows sharing its second and modest clock skew between writers
+SYNC_OVERLAP = pd.Timedelta(minutes=2)
+
+
+class TieredCache:
+    """Read-through cache in front of SupabaseCache: memory LRU -> SQLite mirror -> Supabase.
+
+    Price reads are checked against the remote series_catalog row (row count,
+    last updated_at and the per-series write version). That catalog is
+    fetched at most once per freshness_ttl seconds, so a rerun inside the TTL
+    makes no network calls. A series whose stamp moved is caught up in the
+    mirror with the rows written since the last sync (minus SYNC_OVERLAP).
+    If the row counts still disagree, or the version moved but the delta
+    changed nothing (a writer whose clock lags more than the overlap), the
+    mirror copy is replaced by a full pull, which also drops rows deleted
+    remotely. Downloads hold a lock per
+    series only, so sessions reading other series never wait on them.
+    Writes go to Supabase; the mirror catches up on the next read. Runs are
+    read and written remotely; memoized backtest results live in the mirror
+    only.
+    """
+
+    def __init__(
+        self,
+        remote,
+        mirror: LocalCache,
+        max_memory_bytes: int = 64 * 1024 * 1024,
+        freshness_ttl: float = 30.0,
+    ):
+        self.remote = remote
+        self.mirror = mirror
+        self.max_memory_bytes = int(max_memory_bytes)
+        self.freshness_ttl = float(freshness_ttl)
+        self._memory: OrderedDict = OrderedDict()
+        self._memory_bytes = 0
+        self._catalog = None
+        self._catalog_at = 0.0
+        self._lock = threading.Lock()
+        self._catalog_lock = threading.Lock()
+        self._series_locks: dict = {}
+        self.counts = {'memory_hits': 0, 'mirror_hits': 0, 'delta_syncs': 0, 'full_syncs': 0}
+
+    def init_db(self, schema_sql_path: str):
+        self.remote.init_db(schema_sql_path)
+        self.mirror.init_db(schema_sql_path)
+
+    def _series_lock(self, key: tuple) -> threading.Lock:
+        with self._lock:
+            return self._series_locks.setdefault(key, threading.Lock())
+
+    # ---- freshness ----
+
+    @traced()
+    def list_catalog(self, refresh: bool = False) -> pd.DataFrame:
+        with self._catalog_lock:
+            stale = time.monotonic() - self._catalog_at > self.freshness_ttl
+            if refresh or stale or self._catalog is None:
+                self._catalog = self.remote.list_catalog()
+                self._catalog_at = time.monotonic()
+            return self._catalog.copy()
+
+    def _remote_stamp(self, index_id: str, series_type: str, source_id: str) -> tuple[int, str, int] | None:
+        cat = self.list_catalog()
+        row = cat[(cat['index_id'] == index_id) & (cat['series_type'] == series_type) & (cat['source_id'] == source_id)]
+        if row.empty:
+            return None
+        return int(row['n_rows'].iloc[0]), str(row['last_updated_at'].iloc[0]), int(row['version'].iloc[0])
+
+    def _mirror_stamp(self, index_id: str, series_type: str, source_id: str) -> tuple[int, str, int] | None:
+        with self.mirror.connect() as con:
+            row = con.execute(
+                'SELECT remote_rows, remote_updated_at, remote_version FROM mirror_sync '
+                'WHERE index_id=? AND series_type=? AND source_id=?',
+                (index_id, series_type, source_id),
+            ).fetchone()
+        return (int(row[0]), str(row[1]), int(row[2])) if row else None
+
+    def _mirror_rows(self, index_id: str, series_type: str, source_id: str) -> int:
+        with self.mirror.connect() as con:
+            row = con.execute(
+                'SELECT n_rows FROM series_catalog WHERE index_id=? AND series_type=? AND source_id=?',
+                (index_id, series_type, source_id),
+            ).fetchone()
+        return int(row[0]) if row else 0
+
+    @traced()
+    def _sync(self, index_id: str, series_type: str, source_id: str, stamp: tuple[int, str, int]):
+        synced = self._mirror_stamp(index_id, series_type, source_id)
+        full_pull = synced is None
+        if synced is not None:
+            since = (pd.Timestamp(synced[1]) - SYNC_OVERLAP).isoformat()
+            delta = self.remote.load_prices_since(index_id, series_type, source_id, since)
+            written = self.mirror.upsert_prices(index_id, series_type, source_id, delta).written
+            self.counts['delta_syncs'] += 1
+            full_pull = (
+                (written == 0 and synced[2] != stamp[2])
+                or self._mirror_rows(index_id, series_type, source_id) != stamp[0]
+            )
+        if full_pull:
+            full = self.remote.load_prices(index_id, series_type, source_id)
+            self.mirror.replace_prices(index_id, series_type, source_id, full)
+            self.counts['full_syncs'] += 1
+        with self.mirror.write() as con:
+            con.execute(
+                'INSERT OR REPLACE INTO mirror_sync(index_id, series_type, source_id, remote_rows, remote_updated_at, '
+                'remote_version, synced_at) VALUES(?,?,?,?,?,?,?)',
+                (index_id, series_type, source_id, stamp[0], stamp[1], stamp[2], utc_now_iso()),
+            )
+
+    def _catch_up(self, key: tuple, stamp: tuple[int, str, int]):
+        if self._mirror_stamp(*key) == stamp:
+            self.counts['mirror_hits'] += 1
+        else:
+            self._sync(*key, stamp)
+
+    # ---- prices ----
+
+    @traced()
+    def load_prices(self, index_id: str, series_type: str, source_id: str) -> pd.DataFrame:
+        key = (index_id, series_type, source_id)
+        stamp = self._remote_stamp(*key)
+        if stamp is None:
+            return pd.DataFrame(columns=['date', 'close'])
+        with self._series_lock(key):
+            with self._lock:
+                hit = self._memory.get(key)
+                if hit is not None and hit[0] == stamp:
+                    self._memory.move_to_end(key)
+                    self.counts['memory_hits'] += 1
+                    return hit[1].copy()
+
+            self._catch_up(key, stamp)
+            df = self.mirror.load_prices(*key)
+
+        nbytes = int(df.memory_usage(index=True, deep=True).sum())
+        with self._lock:
+            if key in self._memory:
+                self._memory_bytes -= self._memory.pop(key)[2]
+            self._memory[key] = (stamp, df, nbytes)
+            self._memory_bytes += nbytes
+            while self._memory_bytes > self.max_memory_bytes and len(self._memory) > 1:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= evicted[2]
+        return df.copy()
+
+    @traced()
+    def load_price_series(self, index_id: str, series_type: str, source_id: str) -> pd.Series:
+        """Normalized close series from the mirror (and its price store), caught up with the remote first."""
+        key = (index_id, series_type, source_id)
+        stamp = self._remote_stamp(*key)
+        if stamp is None:
+            return as_series(np.empty(0, dtype=np.int32), np.empty(0))
+        with self._series_lock(key):
+            self._catch_up(key, stamp)
+        return self.mirror.load_price_series(*key)
+
+    @traced()
+    def upsert_prices(self, index_id: str, series_type: str, source_id: str, df: pd.DataFrame) -> UpsertStats:
+        stats = self.remote.upsert_prices(index_id, series_type, source_id, df)
+        if stats.written:
+            with self._catalog_lock:
+                self._catalog = None
+            with self._lock:
+                dropped = self._memory.pop((index_id, series_type, source_id), None)
+                if dropped is not None:
+                    self._memory_bytes -= dropped[2]
+        # The next read catches the mirror up from the remote catalog stamp
+        return stats
+
+    def list_sources_for_index(self, index_id: str, series_type: str) -> list[str]:
+        cat = self.list_catalog()
+        rows = cat[
+            (cat['index_id'].str.lower() == index_id.lower())
+            & (cat['series_type'].str.lower() == series_type.lower())
+        ]
+        return sorted(rows['source_id'].dropna().unique().tolist())
+
+    # ---- runs (remote) and memoized results (mirror) ----
+
+    def save_run(self, *args, **kwargs) -> str:
+        return self.remote.save_run(*args, **kwargs)
+
+    def load_run_summary(self, run_id: str) -> dict:
+        return self.remote.load_run_summary(run_id)
+
+    def load_ledger(self, run_id: str, columns=None, start_date=None, end_date=None) -> pd.DataFrame:
+        return self.remote.load_ledger(run_id, columns, start_date, end_date)
+
+    def load_result(self, result_key: str) -> bytes | None:
+        return self.mirror.load_result(result_key)
+
+    def save_result(self, *args, **kwargs):
+        return self.mirror.save_result(*args, **kwargs)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'memory_entries': len(self._memory), 'memory_bytes': self._memory_bytes, **self.counts}
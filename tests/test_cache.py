@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from storage.cache import LocalCache
+from storage.ledger_codec import LEDGER_COLUMNS
+
+SCHEMA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'storage', 'schema.sql')
+
+
+@pytest.fixture
+def cache(tmp_path):
+    c = LocalCache(str(tmp_path / 'cache.sqlite'), str(tmp_path / 'price_store'))
+    c.init_db(SCHEMA)
+    return c
+
+
+def _prices(closes) -> pd.DataFrame:
+    dates = pd.bdate_range('2024-01-01', periods=len(closes)).strftime('%Y-%m-%d')
+    return pd.DataFrame({'date': dates, 'close': [float(c) for c in closes]})
+
+
+def test_close_only_rewrite_in_the_same_second_rebuilds_the_price_store(cache):
+    cache.upsert_prices('NIFTY50', 'TRI', 'src', _prices(range(100, 110)))
+    assert cache.load_price_series('NIFTY50', 'TRI', 'src').iloc[-1] == 109.0
+    before = cache.list_catalog().iloc[0]
+
+    cache.upsert_prices('NIFTY50', 'TRI', 'src', _prices([*range(100, 109), 999]))
+
+    after = cache.list_catalog().iloc[0]
+    assert after['version'] == before['version'] + 1
+    assert cache.load_price_series('NIFTY50', 'TRI', 'src').iloc[-1] == 999.0
+    assert cache.load_prices('NIFTY50', 'TRI', 'src')['close'].iloc[-1] == 999.0
+
+
+def test_unchanged_upsert_keeps_the_version(cache):
+    cache.upsert_prices('NIFTY50', 'TRI', 'src', _prices(range(100, 110)))
+    version = cache.list_catalog()['version'].iloc[0]
+    cache.upsert_prices('NIFTY50', 'TRI', 'src', _prices(range(100, 110)))
+    assert cache.list_catalog()['version'].iloc[0] == version
+
+
+def _ledger(n: int = 60) -> pd.DataFrame:
+    rng = np.random.default_rng(5)
+    ledger = pd.DataFrame({'date': pd.bdate_range('2023-01-02', periods=n).strftime('%Y-%m-%d')})
+    for col in LEDGER_COLUMNS[1:]:
+        ledger[col] = rng.normal(100.0, 10.0, n)
+    return ledger
+
+
+def test_saved_ledger_loads_back_by_columns_and_dates(cache):
+    ledger = _ledger()
+    run_id = cache.save_run('NIFTY50', 'TRI', 'src', 'dip_sip', {}, {}, {}, ledger)
+
+    pd.testing.assert_frame_equal(cache.load_ledger(run_id), ledger, check_exact=True, check_dtype=False)
+    part = cache.load_ledger(run_id, ['dip_value', 'sip_value'], '2023-01-10', '2023-01-20')
+    expected = ledger[(ledger['date'] >= '2023-01-10') & (ledger['date'] <= '2023-01-20')]
+    pd.testing.assert_frame_equal(
+        part, expected[['date', 'dip_value', 'sip_value']].reset_index(drop=True), check_exact=True, check_dtype=False,
+    )
+
+
+def test_runs_saved_as_ledger_rows_stay_readable(cache):
+    ledger = _ledger()
+    with cache.write() as con:
+        con.executemany(
+            f"INSERT INTO ledgers(run_id, {', '.join(LEDGER_COLUMNS)}) VALUES(?{', ?' * len(LEDGER_COLUMNS)})",
+            [('old-run', *row) for row in ledger.itertuples(index=False)],
+        )
+
+    pd.testing.assert_frame_equal(cache.load_ledger('old-run'), ledger, check_exact=True, check_dtype=False)
+    part = cache.load_ledger('old-run', ['dip_cash'], '2023-02-01', None)
+    expected = ledger.loc[ledger['date'] >= '2023-02-01', ['date', 'dip_cash']].reset_index(drop=True)
+    pd.testing.assert_frame_equal(part, expected, check_exact=True, check_dtype=False)
+    assert cache.load_ledger('no-such-run').empty
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import dataclasses
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.calendar import make_contribution_dates
+from core.engine import _epoch_days, resume_backtest, run_backtest
+from core.models import EngineState
+from core.montecarlo import simulate_paths
+
+
+@pytest.fixture(scope='module')
+def prices():
+    rng = np.random.default_rng(11)
+    # Business days with holes, so some weeks and months lose their last day
+    idx = pd.bdate_range('2010-01-04', periods=1800)
+    idx = idx[rng.random(len(idx)) > 0.04]
+    return pd.Series(100 * np.exp(np.cumsum(rng.normal(0.0002, 0.014, len(idx)))), index=idx)
+
+
+@pytest.mark.parametrize('schedule', ['daily', 'weekly', 'monthly'])
+@pytest.mark.parametrize('allow_daily_dip_buys', [False, True])
+@pytest.mark.parametrize('base_fraction', [0.0, 0.3])
+def test_array_kernel_matches_reference(prices, schedule, allow_daily_dip_buys, base_fraction):
+    params = dict(
+        schedule=schedule,
+        amount_per_contrib=10000.0,
+        lookback_days=252,
+        base_fraction=base_fraction,
+        thresholds_pct=[5.0, 10.0, 20.0, 30.0],
+        deploy_fractions=[0.1, 0.2, 0.3, 0.4],
+        allow_daily_dip_buys=allow_daily_dip_buys,
+        transaction_cost_bps=10.0,
+        cash_rate_annual=0.06,
+    )
+    ref_summary, ref_ledger = run_backtest(prices, kernel='reference', **params)
+    arr_summary, arr_ledger = run_backtest(prices, kernel='array', **params)
+
+    pd.testing.assert_frame_equal(arr_ledger, ref_ledger, check_exact=True)
+    ref, arr = ref_summary.__dict__, arr_summary.__dict__
+    assert arr.keys() == ref.keys()
+    for field, value in ref.items():
+        if field.endswith('xirr'):
+            # Different solvers (per-flow vs batched terminal), so a few ulps apart
+            assert arr[field] == pytest.approx(value, rel=0, abs=1e-15), field
+        else:
+            assert arr[field] == value, field
+
+
+@pytest.mark.parametrize('schedule', ['daily', 'weekly', 'monthly'])
+@pytest.mark.parametrize('allow_daily_dip_buys', [False, True])
+@pytest.mark.parametrize('base_fraction', [0.0, 0.3])
+def test_one_monte_carlo_path_matches_run_backtest(prices, schedule, allow_daily_dip_buys, base_fraction):
+    params = dict(
+        lookback_days=252,
+        base_fraction=base_fraction,
+        thresholds_pct=[5.0, 10.0, 20.0, 30.0],
+        deploy_fractions=[0.1, 0.2, 0.3, 0.4],
+        allow_daily_dip_buys=allow_daily_dip_buys,
+        transaction_cost_bps=10.0,
+        cash_rate_annual=0.06,
+    )
+    summary, _ = run_backtest(prices, schedule=schedule, amount_per_contrib=10000.0, **params)
+    idx = pd.DatetimeIndex(prices.index)
+    out = simulate_paths(
+        prices.to_numpy(dtype=float)[:, None],
+        _epoch_days(idx),
+        idx.isin(make_contribution_dates(idx, schedule)),
+        10000.0,
+        **params,
+    )
+
+    assert out['sip_final'][0] == summary.sip_final
+    assert out['dip_final'][0] == summary.dip_final
+    assert out['dip_trades'][0] == summary.dip_trades
+    assert out['sip_xirr'][0] == pytest.approx(summary.sip_xirr, rel=0, abs=1e-15)
+    assert out['dip_xirr'][0] == pytest.approx(summary.dip_xirr, rel=0, abs=1e-15)
+
+
+def _split_points(prices: pd.Series, schedule: str, params: dict) -> dict[str, int]:
+    """Row counts to build the saved state from: mid-period, right after a re-arm, and a period start."""
+    _, ledger = run_backtest(prices, schedule=schedule, amount_per_contrib=10000.0, **params)
+    periods = pd.DatetimeIndex(prices.index).to_period({'daily': 'D', 'weekly': 'W', 'monthly': 'M'}[schedule])
+    starts = np.flatnonzero(periods[1:] != periods[:-1]) + 1
+    # A re-arm: back at the rolling high after dip buys were made in the drawdown
+    bought = np.flatnonzero(ledger['dip_trigger_buy'].to_numpy() > 0)
+    at_high = ledger['drawdown_pct'].to_numpy() >= -1e-12
+    rearm = next(i for i in np.flatnonzero(at_high) if i > bought[0])
+    points = {'period_start': int(starts[len(starts) // 2]), 'after_rearm': int(rearm) + 1}
+    if schedule != 'daily':
+        points['mid_period'] = int(starts[len(starts) // 3]) + 2
+    return points
+
+
+@pytest.mark.parametrize('schedule', ['daily', 'weekly', 'monthly'])
+@pytest.mark.parametrize('allow_daily_dip_buys', [False, True])
+def test_resume_matches_full_rerun(prices, schedule, allow_daily_dip_buys):
+    params = dict(
+        lookback_days=252,
+        base_fraction=0.2,
+        thresholds_pct=[5.0, 10.0, 20.0, 30.0],
+        deploy_fractions=[0.1, 0.2, 0.3, 0.4],
+        allow_daily_dip_buys=allow_daily_dip_buys,
+        transaction_cost_bps=10.0,
+        cash_rate_annual=0.06,
+    )
+    full_summary, full_ledger = run_backtest(prices, schedule=schedule, amount_per_contrib=10000.0, **params)
+
+    for name, split in _split_points(prices, schedule, params).items():
+        _, _, state = run_backtest(
+            prices.iloc[:split], schedule=schedule, amount_per_contrib=10000.0, return_state=True, **params,
+        )
+        # Through JSON, as the app stores it, then resumed twice: to the split + 40 rows and to the end
+        state = EngineState(**json.loads(json.dumps(dataclasses.asdict(state))))
+        _, _, state = resume_backtest(state, prices.iloc[:split + 40])
+        summary, ledger, _ = resume_backtest(state, prices)
+
+        tail = full_ledger.iloc[len(full_ledger) - len(ledger):].reset_index(drop=True)
+        pd.testing.assert_frame_equal(ledger, tail, check_exact=True, obj=name)
+        assert summary == full_summary, name
@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from providers.http_cache import HTTPCache
+
+
+class _Resource:
+    """What the stand-in server returns for one path, plus the requests it saw."""
+
+    def __init__(self, body: str, etag: str | None = None, last_modified: str | None = None, status: int = 200):
+        self.body = body
+        self.status = status
+        self.etag = etag
+        self.last_modified = last_modified
+        self.requests: list[dict] = []
+
+
+@pytest.fixture
+def server():
+    resources: dict[str, _Resource] = {}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            res = resources[self.path.split('?')[0]]
+            res.requests.append(dict(self.headers))
+            not_modified = (
+                (res.etag is not None and self.headers.get('If-None-Match') == res.etag)
+                or (res.etag is None and res.last_modified is not None
+                    and self.headers.get('If-Modified-Since') == res.last_modified)
+            )
+            if not_modified:
+                self.send_response(304)
+                self.end_headers()
+                return
+            payload = res.body.encode('utf-8')
+            self.send_response(res.status)
+            if res.etag is not None:
+                self.send_header('ETag', res.etag)
+            if res.last_modified is not None:
+                self.send_header('Last-Modified', res.last_modified)
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    base = f'http://127.0.0.1:{httpd.server_address[1]}'
+    try:
+        yield base, resources
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+@pytest.fixture
+def session():
+    with requests.Session() as s:
+        yield s
+
+
+def test_fresh_entry_is_served_without_a_request(server, session, tmp_path):
+    base, resources = server
+    resources['/a'] = _Resource('a,b\n1,2\n', etag='"v1"')
+    cache = HTTPCache(str(tmp_path))
+
+    first = cache.get(session, base + '/a', ttl=3600)
+    second = cache.get(session, base + '/a', ttl=3600)
+
+    assert (first.from_cache, second.from_cache) == (False, True)
+    assert second.text == 'a,b\n1,2\n'
+    assert len(resources['/a'].requests) == 1
+    assert cache.counts['hits'] == 1
+
+
+def test_expired_entry_revalidates_with_etag(server, session, tmp_path):
+    base, resources = server
+    resources['/a'] = _Resource('payload', etag='"v1"')
+    cache = HTTPCache(str(tmp_path))
+
+    cache.get(session, base + '/a', ttl=0)
+    again = cache.get(session, base + '/a', ttl=0)
+
+    assert again.from_cache and again.text == 'payload'
+    assert resources['/a'].requests[-1].get('If-None-Match') == '"v1"'
+    assert cache.counts['revalidated'] == 1
+
+
+def test_expired_entry_revalidates_with_last_modified(server, session, tmp_path):
+    base, resources = server
+    stamp = 'Wed, 01 Jan 2025 00:00:00 GMT'
+    resources['/a'] = _Resource('payload', last_modified=stamp)
+    cache = HTTPCache(str(tmp_path))
+
+    cache.get(session, base + '/a', ttl=0)
+    again = cache.get(session, base + '/a', ttl=0)
+
+    assert again.from_cache and again.text == 'payload'
+    assert resources['/a'].requests[-1].get('If-Modified-Since') == stamp
+    assert 'If-None-Match' not in resources['/a'].requests[-1]
+
+
+def test_ttl_expiry_refetches_and_new_body_replaces_entry(server, session, tmp_path):
+    base, resources = server
+    resources['/a'] = _Resource('old', etag='"v1"')
+    cache = HTTPCache(str(tmp_path))
+    cache.get(session, base + '/a', ttl=0)
+
+    resources['/a'].body, resources['/a'].etag = 'new body', '"v2"'
+    changed = cache.get(session, base + '/a', ttl=3600)
+    cached = cache.get(session, base + '/a', ttl=3600)
+
+    assert not changed.from_cache and changed.text == 'new body'
+    assert cached.from_cache and cached.text == 'new body'
+    assert len(resources['/a'].requests) == 2
+    assert cache.stats()['entries'] == 1
+
+
+def test_lru_eviction_by_size(server, session, tmp_path):
+    base, resources = server
+    for name in 'abc':
+        resources[f'/{name}'] = _Resource(name * 100)
+    cache = HTTPCache(str(tmp_path), max_bytes=250)
+
+    cache.get(session, base + '/a')
+    cache.get(session, base + '/b')
+    cache.get(session, base + '/a')  # a is now more recently used than b
+    cache.get(session, base + '/c')
+
+    assert cache.stats()['bytes'] == 200
+    assert cache.get(session, base + '/a').from_cache
+    assert not cache.get(session, base + '/b').from_cache
+    assert len(resources['/b'].requests) == 2
+
+
+def test_size_index_survives_a_new_instance(server, session, tmp_path):
+    base, resources = server
+    resources['/a'] = _Resource('x' * 100)
+    resources['/b'] = _Resource('y' * 100)
+    HTTPCache(str(tmp_path)).get(session, base + '/a')
+
+    cache = HTTPCache(str(tmp_path), max_bytes=150)
+    cache.get(session, base + '/b')
+
+    stats = cache.stats()
+    assert (stats['entries'], stats['bytes']) == (1, 100)
+    assert not [n for n in os.listdir(tmp_path) if n.endswith('.tmp')]
+
+
+def test_error_responses_are_not_stored(server, session, tmp_path):
+    base, resources = server
+    resources['/a'] = _Resource('busy', status=503)
+    cache = HTTPCache(str(tmp_path))
+
+    response = cache.get(session, base + '/a')
+
+    with pytest.raises(requests.HTTPError):
+        response.raise_for_status()
+    assert not cache.get(session, base + '/a').from_cache
+    assert cache.stats()['entries'] == 0
+
+
+def test_directory_is_created_on_first_store_and_never_when_read_only(server, session, tmp_path):
+    base, resources = server
+    resources['/a'] = _Resource('payload', etag='"v1"')
+    root = tmp_path / 'http_cache'
+
+    readonly = HTTPCache(str(root), read_only=True)
+    assert readonly.stats()['entries'] == 0
+    assert readonly.get(session, base + '/a').text == 'payload'
+    assert not root.exists()
+
+    HTTPCache(str(root)).get(session, base + '/a')
+    assert root.exists()
+    assert HTTPCache(str(root), read_only=True).get(session, base + '/a').from_cache
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.engine import run_backtest
+from storage.ledger_codec import decode_ledger, encode_ledger, from_text, to_text
+
+
+@pytest.fixture(scope='module')
+def ledger():
+    rng = np.random.default_rng(3)
+    idx = pd.bdate_range('2019-01-01', periods=300)
+    prices = pd.Series(100 * np.exp(np.cumsum(rng.normal(0, 0.012, len(idx)))), index=idx)
+    _, ledger = run_backtest(
+        prices,
+        schedule='weekly',
+        amount_per_contrib=5000.0,
+        lookback_days=60,
+        base_fraction=0.2,
+        thresholds_pct=[5.0, 10.0],
+        deploy_fractions=[0.4, 0.6],
+        allow_daily_dip_buys=True,
+        transaction_cost_bps=5.0,
+        cash_rate_annual=0.05,
+        running_xirr=True,
+    )
+    return ledger
+
+
+def test_round_trip_is_exact(ledger):
+    out = decode_ledger(encode_ledger(ledger))
+    pd.testing.assert_frame_equal(out, ledger, check_exact=True, check_dtype=False)
+    assert out.select_dtypes('number').dtypes.eq(np.float64).all()
+
+
+def test_column_subset_keeps_the_requested_order_and_skips_unknown_names(ledger):
+    out = decode_ledger(encode_ledger(ledger), columns=['dip_value', 'date', 'price', 'no_such_column'])
+    assert list(out.columns) == ['date', 'dip_value', 'price']
+    pd.testing.assert_frame_equal(out, ledger[['date', 'dip_value', 'price']], check_exact=True, check_dtype=False)
+
+
+@pytest.mark.parametrize('start, end', [
+    ('2019-03-01', '2019-06-30'),
+    ('2019-03-02', '2019-03-03'),  # a weekend: no rows
+    (None, '2019-02-15'),
+    ('2019-12-02', None),
+    ('2018-01-01', '2030-01-01'),
+])
+def test_date_range_is_inclusive(ledger, start, end):
+    out = decode_ledger(encode_ledger(ledger), ['sip_value'], start, end)
+    mask = np.ones(len(ledger), dtype=bool)
+    if start is not None:
+        mask &= (ledger['date'] >= start).to_numpy()
+    if end is not None:
+        mask &= (ledger['date'] <= end).to_numpy()
+    expected = ledger.loc[mask, ['date', 'sip_value']].reset_index(drop=True)
+    pd.testing.assert_frame_equal(out, expected, check_exact=True, check_dtype=False)
+
+
+def test_empty_ledger_round_trips(ledger):
+    out = decode_ledger(encode_ledger(ledger.iloc[:0]))
+    assert out.empty and list(out.columns) == list(ledger.columns)
+
+
+def test_text_form_round_trips(ledger):
+    payload = encode_ledger(ledger)
+    assert from_text(to_text(payload)) == payload
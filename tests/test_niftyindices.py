@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import time
+
+import pandas as pd
+import pytest
+
+from providers.http_cache import HTTPCache
+from providers.niftyindices import NiftyIndicesProvider
+
+
+@pytest.fixture
+def provider(tmp_path, monkeypatch):
+    """Provider whose chunk downloads come from a function instead of niftyindices.com."""
+    p = NiftyIndicesProvider(max_workers=4, chunk_days=365, http_cache=HTTPCache(str(tmp_path)))
+    p.calls = []
+
+    def download(index_name, start_date, end_date, series_type):
+        p.calls.append((index_name, start_date, end_date))
+        time.sleep(0.02 if index_name == 'NIFTY 50' else 0.0)
+        # The site's CSV layout; a range without trading days comes back as an empty body
+        dates = pd.bdate_range(start_date, end_date)
+        if dates.empty:
+            return p._parse_csv('')
+        lines = ['Date,Open,High,Low,Close'] + [f'{d:%d-%b-%Y},1,1,1,"1,{i:03d}.5"' for i, d in enumerate(dates)]
+        return p._parse_csv('\n'.join(lines) + '\n')
+
+    monkeypatch.setattr(p, '_download_chunk', download)
+    return p
+
+
+def test_fetch_many_reports_download_time_per_pair(provider):
+    results, errors, elapsed = provider.fetch_many([
+        ('NIFTY50', 'TRI', '2020-01-01', '2022-12-31'),
+        ('NIFTY_IT', 'TRI', '2024-01-01', '2024-03-31'),
+    ])
+
+    assert not errors and set(results) == set(elapsed) == {('NIFTY50', 'TRI'), ('NIFTY_IT', 'TRI')}
+    # Three year chunks of about 20 ms each, summed per pair
+    assert elapsed[('NIFTY50', 'TRI')] >= 0.06
+    assert elapsed[('NIFTY_IT', 'TRI')] < elapsed[('NIFTY50', 'TRI')]
+    assert results[('NIFTY_IT', 'TRI')].df['date'].iloc[0] == '2024-01-01'
+
+
+def test_a_chunk_without_trading_days_is_empty_not_a_failure(provider):
+    # 2023-01-06 + 365 days: the second chunk is the weekend of 6-7 Jan 2024
+    results, errors, _ = provider.fetch_many([('NIFTY50', 'TRI', '2023-01-06', '2024-01-07')])
+
+    assert not errors
+    assert ('NIFTY 50', '2024-01-06', '2024-01-07') in provider.calls
+    df = results[('NIFTY50', 'TRI')].df
+    assert df['date'].iloc[-1] == '2024-01-05'
+    assert df['close'].iloc[0] == 1000.5
+
+
+def test_empty_or_header_only_csv_parses_to_an_empty_frame(provider):
+    for text in ('', '\n', 'Date,Open,High,Low,Close\n'):
+        df = provider._parse_csv(text)
+        assert df.empty and list(df.columns) == ['date', 'close']
+
+
+def test_one_pair_with_two_ranges_is_rejected(provider):
+    with pytest.raises(ValueError, match='only one date range'):
+        provider.fetch_many([
+            ('NIFTY50', 'TRI', '2020-01-01', '2020-06-30'),
+            ('NIFTY50', 'TRI', '2021-01-01', '2021-06-30'),
+        ])
+    assert provider.calls == []
+
+
+def test_identical_repeats_are_fetched_once(provider):
+    job = ('NIFTY50', 'TRI', '2024-01-01', '2024-01-31')
+    results, errors, _ = provider.fetch_many([job, job])
+    assert not errors and len(provider.calls) == 1
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import core.portfolio as portfolio
+from core.portfolio import run_portfolio
+
+PARAMS = dict(
+    schedule='monthly',
+    amount_per_contrib=10000.0,
+    lookback_days=252,
+    base_fraction=0.2,
+    thresholds_pct=[5.0, 10.0, 20.0],
+    deploy_fractions=[0.2, 0.3, 0.5],
+    allow_daily_dip_buys=True,
+    transaction_cost_bps=5.0,
+    cash_rate_annual=0.05,
+)
+
+
+@pytest.fixture
+def prices():
+    rng = np.random.default_rng(7)
+    idx = pd.bdate_range('2012-01-02', periods=1500)
+    return {k: pd.Series(100 * np.exp(np.cumsum(rng.normal(0, 0.013, len(idx)))), index=idx) for k in 'ABC'}
+
+
+def test_pooled_cash_is_attributed_by_actual_draws(prices, monkeypatch):
+    seen = {}
+    pooled = portfolio._pooled_dip_legs
+
+    def spy(*args):
+        legs, cash = pooled(*args)
+        seen['legs'], seen['cash'] = legs, cash
+        return legs, cash
+
+    monkeypatch.setattr(portfolio, '_pooled_dip_legs', spy)
+    table, ledgers = run_portfolio(prices, {'A': 1, 'B': 2, 'C': 1}, cash_mode='pooled', **PARAMS)
+
+    shares = np.column_stack([leg['dip_cash'] for leg in seen['legs']])
+    np.testing.assert_allclose(shares.sum(axis=1), seen['cash'], rtol=1e-12, atol=1e-6)
+    # Not a fixed split of the bucket by weight: sleeves draw what their dips take
+    assert not np.allclose(shares[-1] / seen['cash'][-1], [0.25, 0.5, 0.25])
+    final = table.set_index('sleeve')
+    assert final.loc['portfolio', 'dip_cash'] == pytest.approx(seen['cash'][-1])
+    assert final.loc[['A', 'B', 'C'], 'dip_final'].sum() == pytest.approx(final.loc['portfolio', 'dip_final'])
+
+
+def test_one_pooled_sleeve_matches_separate(prices):
+    pooled, _ = run_portfolio({'A': prices['A']}, {'A': 1}, cash_mode='pooled', **PARAMS)
+    separate, _ = run_portfolio({'A': prices['A']}, {'A': 1}, cash_mode='separate', max_workers=1, **PARAMS)
+    pd.testing.assert_frame_equal(pooled, separate)
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from storage.result_cache import ResultCache
+
+PARAMS = dict(
+    schedule='monthly',
+    amount_per_contrib=10000.0,
+    lookback_days=60,
+    base_fraction=0.2,
+    thresholds_pct=[5.0, 10.0],
+    deploy_fractions=[0.4, 0.6],
+    allow_daily_dip_buys=False,
+    transaction_cost_bps=5.0,
+    cash_rate_annual=0.05,
+)
+
+
+@pytest.fixture
+def prices(request):
+    # A distinct series per test, so entries left in the process-wide tier by other tests never hit
+    rng = np.random.default_rng(zlib.crc32(request.node.name.encode('utf-8')))
+    idx = pd.bdate_range('2018-01-01', periods=400)
+    return pd.Series(100 * np.exp(np.cumsum(rng.normal(0, 0.01, len(idx)))), index=idx)
+
+
+def test_editing_a_returned_summary_does_not_change_the_cached_one(prices):
+    cache = ResultCache()
+    first, ledger = cache.run(prices, 'X', 'TRI', 'src', **PARAMS)
+    expected = dict(first.__dict__)
+
+    first.__dict__['dip_final'] = -1.0
+    ledger.loc[:, 'dip_value'] = 0.0
+
+    again, again_ledger = cache.run(prices, 'X', 'TRI', 'src', **PARAMS)
+    assert again.__dict__ == expected
+    assert again_ledger['dip_value'].iloc[-1] == pytest.approx(expected['dip_final'])
+
+
+def test_counters_add_up_under_concurrent_runs(prices):
+    cache = ResultCache()
+    before = cache.stats()
+    calls = 64
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda _: cache.run(prices, 'X', 'TRI', 'src', **PARAMS), range(calls)))
+    after = cache.stats()
+    served = sum(after[k] - before[k] for k in ('hits', 'disk_hits', 'misses'))
+    assert served == calls
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from storage.supabase_pager import FrameSource, fetch_columns
+
+
+def _prices(n: int, start: str = '2001-01-01') -> pd.DataFrame:
+    dates = pd.date_range(start, periods=n, freq='D').strftime('%Y-%m-%d')
+    return pd.DataFrame({'date': dates, 'close': np.arange(n, dtype=float) + 1.0})
+
+
+def _sorted(df: pd.DataFrame) -> pd.DataFrame:
+    return df.sort_values(['date', 'close'], kind='stable').reset_index(drop=True)
+
+
+@pytest.mark.parametrize('n', [0, 1, 9, 10, 11, 20, 30, 31])
+@pytest.mark.parametrize('workers', [1, 3])
+def test_pages_across_exact_page_size_boundaries(n, workers):
+    df = _prices(n)
+    out = fetch_columns(FrameSource(df), ['close'], page_rows=10, max_workers=workers)
+    pd.testing.assert_frame_equal(out.reset_index(drop=True), df, check_dtype=False)
+
+
+def test_server_row_cap_below_page_rows_still_reads_everything():
+    df = _prices(95)
+    source = FrameSource(df, max_rows=7)
+    out = fetch_columns(source, ['close'], page_rows=10, max_workers=2)
+    pd.testing.assert_frame_equal(out.reset_index(drop=True), df, check_dtype=False)
+
+
+@pytest.mark.parametrize('page_rows', [3, 4, 5, 7])
+@pytest.mark.parametrize('max_rows', [1000, 4])
+def test_rows_sharing_a_date_are_neither_skipped_nor_repeated(page_rows, max_rows):
+    # Runs of 1-3 equal dates, so page ends land inside runs as well as between them
+    dates = pd.date_range('2020-01-01', periods=12, freq='D').strftime('%Y-%m-%d')
+    repeats = [1, 3, 2, 1, 3, 3, 1, 2, 2, 1, 3, 1]
+    df = pd.DataFrame({'date': np.repeat(dates, repeats)})
+    df['close'] = np.arange(len(df), dtype=float)
+
+    out = fetch_columns(FrameSource(df, max_rows=max_rows), ['close'], page_rows=page_rows, max_workers=1)
+
+    pd.testing.assert_frame_equal(_sorted(out), _sorted(df), check_dtype=False)
+
+
+def test_more_rows_on_one_date_than_a_page_holds_is_an_error():
+    df = pd.DataFrame({'date': ['2020-01-01'] * 5 + ['2020-01-02'], 'close': np.arange(6.0)})
+    with pytest.raises(ValueError, match='share the date 2020-01-01'):
+        fetch_columns(FrameSource(df), ['close'], page_rows=4, max_workers=1)
+
+
+def test_updated_after_keeps_rows_written_at_or_after_the_stamp():
+    df = _prices(25)
+    df['updated_at'] = ['2024-05-01T10:00:00+00:00'] * 10 + ['2024-05-02T10:00:00+00:00'] * 15
+
+    source = FrameSource(df, updated_after='2024-05-02T10:00:00+00:00')
+    out = fetch_columns(source, ['close'], page_rows=4, max_workers=3)
+    pd.testing.assert_frame_equal(out.reset_index(drop=True), df.iloc[10:][['date', 'close']].reset_index(drop=True), check_dtype=False)
+
+    source.updated_after = '2024-05-03T00:00:00Z'
+    assert fetch_columns(source, ['close'], page_rows=4).empty
+
+
+def test_a_series_that_fits_one_page_takes_one_request():
+    df = _prices(250)
+    source = FrameSource(df)
+    out = fetch_columns(source, ['close'])
+    pd.testing.assert_frame_equal(out, df, check_dtype=False)
+    assert source.requests == 1
+
+
+def test_empty_source_takes_one_request():
+    source = FrameSource(_prices(0))
+    out = fetch_columns(source, ['close'])
+    assert out.empty and list(out.columns) == ['date', 'close']
+    assert source.requests == 1
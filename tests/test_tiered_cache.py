@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import os
+
+import pandas as pd
+import pytest
+
+from storage.cache import LocalCache
+from storage.tiered_cache import TieredCache
+
+SCHEMA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'storage', 'schema.sql')
+
+
+class FakeRemote(LocalCache):
+    """LocalCache with SupabaseCache's delta read, standing in for the remote."""
+
+    def load_prices_since(self, index_id, series_type, source_id, updated_after):
+        with self.connect() as con:
+            return pd.read_sql_query(
+                'SELECT date, close FROM prices WHERE index_id=? AND series_type=? AND source_id=? '
+                'AND updated_at >= ? ORDER BY date',
+                con,
+                params=(index_id, series_type, source_id, updated_after),
+            )
+
+
+@pytest.fixture
+def tiers(tmp_path):
+    remote = FakeRemote(str(tmp_path / 'remote.sqlite'))
+    mirror = LocalCache(str(tmp_path / 'mirror.sqlite'))
+    tiered = TieredCache(remote, mirror, freshness_ttl=0.0)
+    tiered.init_db(SCHEMA)
+    return remote, tiered
+
+
+def _prices(closes) -> pd.DataFrame:
+    dates = pd.bdate_range('2024-01-01', periods=len(closes)).strftime('%Y-%m-%d')
+    return pd.DataFrame({'date': dates, 'close': [float(c) for c in closes]})
+
+
+def test_edit_from_a_lagging_clock_falls_back_to_a_full_pull(tiers):
+    remote, tiered = tiers
+    remote.upsert_prices('NIFTY50', 'TRI', 'src', _prices(range(100, 110)))
+    assert tiered.load_prices('NIFTY50', 'TRI', 'src')['close'].iloc[-1] == 109.0
+
+    # A writer an hour behind: same row count, updated_at far before the last sync
+    with remote.write() as con:
+        con.execute(
+            "UPDATE prices SET close=999, updated_at='2000-01-01T00:00:00+00:00' WHERE date=?",
+            (_prices(range(10))['date'].iloc[-1],),
+        )
+        remote._refresh_catalog(con, 'NIFTY50', 'TRI', 'src')
+
+    df = tiered.load_prices('NIFTY50', 'TRI', 'src')
+    assert df['close'].iloc[-1] == 999.0
+    assert tiered.counts['full_syncs'] == 2
+
+
+def test_delta_sync_skips_the_full_pull(tiers):
+    remote, tiered = tiers
+    remote.upsert_prices('NIFTY50', 'TRI', 'src', _prices(range(100, 110)))
+    tiered.load_prices('NIFTY50', 'TRI', 'src')
+
+    remote.upsert_prices('NIFTY50', 'TRI', 'src', _prices([*range(100, 109), 555]))
+
+    assert tiered.load_prices('NIFTY50', 'TRI', 'src')['close'].iloc[-1] == 555.0
+    assert (tiered.counts['delta_syncs'], tiered.counts['full_syncs']) == (1, 1)